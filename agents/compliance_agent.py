@@ -1,9 +1,13 @@
-﻿from typing import Dict, List
+﻿import threading
+from typing import Dict, List, Optional
 from core.models import SystemState, ComplianceReport, SellerInfo, RiskLevel
 from tools.sentiment_tool import analyze_reviews
-from tools.verification_tool import verify_seller
+from tools.verification_tool import SellerVerificationClient, get_verification_client, verify_seller
 
 class ComplianceAuditorAgent:
+    def __init__(self, verification_client: Optional[SellerVerificationClient] = None):
+        self.verification_client = verification_client or get_verification_client()
+
     def run(self, state: SystemState) -> SystemState:
         if not state.market_data:
             state.errors.append("No market data")
@@ -16,8 +20,13 @@ class ComplianceAuditorAgent:
             key = f"{item.platform}:{item.seller}"
             sellers[key] = item
         
+        # Verdicts already in the state (reused from the cache) are kept as they are
+        known = state.compliance_checks or {}
         for key, item in sellers.items():
-            verification = verify_seller(item.seller, item.platform)
+            if key in known:
+                results[key] = known[key]
+                continue
+            verification = verify_seller(item.seller, item.platform, client=self.verification_client)
             
             seller_info = SellerInfo(
                 name=item.seller,
@@ -36,8 +45,19 @@ class ComplianceAuditorAgent:
         state.step = "compliance_check_complete"
         return state
 
+_agent: Optional[ComplianceAuditorAgent] = None
+_agent_lock = threading.Lock()
+
+def get_compliance_agent() -> ComplianceAuditorAgent:
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = ComplianceAuditorAgent()
+    return _agent
+
 def compliance_agent(state: dict) -> dict:
-    from core.models import SystemState
-    agent = ComplianceAuditorAgent()
-    result = agent.run(SystemState(**state))
-    return result.dict()
+    from core.graph import node_state, state_update
+    agent = get_compliance_agent()
+    result = agent.run(node_state(state))
+    return state_update(state, result, 'compliance_checks')
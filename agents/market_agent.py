@@ -1,18 +1,41 @@
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional
 from core.logging import get_logger
 from core.models import PricePoint, SystemState
-from tools.universal_scraper import search_products
+from tools.universal_scraper import UniversalEcommerceScraper, get_scraper
 
 logger = get_logger('market_agent')
 
+# Prefix of the state.errors entries that report a market skipped by its circuit breaker
+SKIPPED_PREFIX = 'Skipped '
+# Prefix of the entries for markets still searching when the response deadline hit
+PENDING_PREFIX = 'Pending '
+
 class MarketIntelligenceAgent:
+    def __init__(self, scraper: Optional[UniversalEcommerceScraper] = None):
+        self.scraper = scraper or get_scraper()
+
     def run(self, state: SystemState) -> SystemState:
         query = state.query
         preference = state.collected_data.get('preference', 'cheapest')
         platforms = state.collected_data.get('platforms', ['jumia'])
         
+        # Optional response budget: markets still searching at it are cached in the background
+        deadline_ms = state.collected_data.get('deadline_ms')
+        
         logger.info(f'Searching: {query}')
-        results = search_products(query, preference, platforms)
+        results = self.scraper.search_all(query, platforms, preference, deadline_ms=deadline_ms)
+        
+        # Markets behind an open circuit or failing health checks were not queried; tell the caller which
+        for platform in results.get('skipped_platforms', []):
+            stats = results['platform_stats'][platform]
+            if stats.get('reason') == 'unhealthy':
+                state.errors.append(f'{SKIPPED_PREFIX}{platform}: failing health checks')
+            else:
+                retry_after = stats.get('retry_after', 0)
+                state.errors.append(f'{SKIPPED_PREFIX}{platform}: temporarily unavailable (retry in {retry_after:.0f}s)')
+        for platform in results.get('pending_platforms', []):
+            state.errors.append(f'{PENDING_PREFIX}{platform}: still searching at the deadline')
         
         price_points = []
         for item in results.get('all_results', []):
@@ -31,8 +54,20 @@ class MarketIntelligenceAgent:
         state.step = 'market_data_collected'
         return state
 
+_agent: Optional[MarketIntelligenceAgent] = None
+_agent_lock = threading.Lock()
+
+def get_market_agent() -> MarketIntelligenceAgent:
+    """Long-lived agent shared by all runs (holds no per-request state)"""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = MarketIntelligenceAgent()
+    return _agent
+
 def market_agent(state: dict) -> dict:
-    from core.models import SystemState
-    agent = MarketIntelligenceAgent()
-    result = agent.run(SystemState(**state))
-    return result.dict()
+    from core.graph import node_state, state_update
+    agent = get_market_agent()
+    result = agent.run(node_state(state))
+    return state_update(state, result, 'market_data', 'step')
@@ -1,36 +1,61 @@
-﻿import pandas as pd
+﻿import threading
 import numpy as np
-from datetime import datetime, timedelta
-from prophet import Prophet
+from typing import Optional
 from core.models import PricePoint, PriceForecast, SystemState
+from tools.forecast_tool import PriceForecaster, get_forecaster
 
 class PriceStrategistAgent:
+    def __init__(self, forecaster: Optional[PriceForecaster] = None):
+        self.forecaster = forecaster or get_forecaster()
+
     def run(self, state: SystemState) -> SystemState:
         if not state.market_data:
             state.errors.append("No market data")
             return state
         
         prices = [p.price_kes for p in state.market_data]
-        current = np.mean(prices)
+        current = float(np.mean(prices))
+        
+        # One market-level observation per run, then answer from the forecast cache
+        observed_at = max(p.timestamp for p in state.market_data)
+        self.forecaster.record(state.query, [(observed_at, current)])
+        predicted = self.forecaster.forecast(state.query, current)
+        
+        if predicted['method'] == 'heuristic':
+            recommendation = "Wait for Friday deals"
+        elif predicted['predicted_7d'] < current * 0.97:
+            recommendation = "Wait - prices expected to drop"
+        else:
+            recommendation = "Buy now"
         
-        # Simple forecast
         forecast = PriceForecast(
             current_price=round(current, 2),
-            predicted_price_7d=round(current * 0.95, 2),
-            predicted_price_30d=round(current * 0.90, 2),
-            confidence_interval=(current * 0.9, current * 1.1),
-            trend="down",
-            recommendation="Wait for Friday deals",
-            best_buy_date=datetime.now() + timedelta(days=(4 - datetime.now().weekday()) % 7),
-            savings_potential=round(current * 0.12, 2)
+            predicted_price_7d=round(predicted['predicted_7d'], 2),
+            predicted_price_30d=round(predicted['predicted_30d'], 2),
+            confidence_interval=(predicted['lower'], predicted['upper']),
+            trend=predicted['trend'],
+            recommendation=recommendation,
+            best_buy_date=predicted['best_buy_date'],
+            savings_potential=round(predicted['savings_potential'], 2)
         )
         
         state.price_analysis = forecast
         state.step = "price_analysis_complete"
         return state
 
+_agent: Optional[PriceStrategistAgent] = None
+_agent_lock = threading.Lock()
+
+def get_price_agent() -> PriceStrategistAgent:
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = PriceStrategistAgent()
+    return _agent
+
 def price_agent(state: dict) -> dict:
-    from core.models import SystemState
-    agent = PriceStrategistAgent()
-    result = agent.run(SystemState(**state))
-    return result.dict()
+    from core.graph import node_state, state_update
+    agent = get_price_agent()
+    result = agent.run(node_state(state))
+    return state_update(state, result, 'price_analysis')
@@ -1,52 +1,190 @@
-﻿from typing import Dict
-from langgraph.graph import StateGraph, END
+﻿import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from core.graph import ANALYSIS_NODES, create_procurement_graph, initial_state, dump_state
+from core.procurement_cache import COMPONENTS, ProcurementCache, normalize_query
+from core.config import Settings
+from core.resilience import deadline
+from core.llm_usage import usage_scope
+from core.tracing import span, start_trace
 from core.logging import get_logger
-from core.models import SystemState
-from agents.market_agent import market_agent
+from agents.market_agent import PENDING_PREFIX, SKIPPED_PREFIX, market_agent
 from agents.price_agent import price_agent
 from agents.compliance_agent import compliance_agent
 
 logger = get_logger('supervisor')
 
 class SupervisorAgent:
-    def __init__(self):
+    def __init__(self, result_cache: Optional[ProcurementCache] = None):
         self.app = self._build_graph()
+        # Partial graphs that re-run only expired analysis components
+        self.analysis_apps = {
+            nodes: create_procurement_graph(market_agent, price_agent, compliance_agent, analysis_only=nodes)
+            for nodes in (('price',), ('compliance',), ANALYSIS_NODES)
+        }
+        self.result_cache = result_cache or ProcurementCache()
+        settings = Settings()
+        self.timeout_seconds = settings.timeout_seconds
+        self.deadline_ms = settings.response_deadline_ms or None
         logger.info('Supervisor initialized')
 
     def _build_graph(self):
-        workflow = StateGraph(dict)
-        workflow.add_node('market', market_agent)
-        workflow.add_node('price', price_agent)
-        workflow.add_node('compliance', compliance_agent)
-        workflow.set_entry_point('market')
-        workflow.add_edge('market', 'price')
-        workflow.add_edge('price', 'compliance')
-        workflow.add_edge('compliance', END)
-        return workflow.compile()
-
-    def run(self, query: str, category: str = 'general', catalog_path: str = None) -> Dict:
-        initial_state = {
-            'query': query,
-            'product_category': category,
-            'collected_data': {'catalog_path': catalog_path} if catalog_path else {},
-            'market_data': [],
-            'price_analysis': {},
-            'compliance_checks': {},
-            'final_recommendation': {},
-            'errors': [],
-            'retry_count': 0,
-            'step': 'initialized'
+        # market -> (price || compliance) -> join
+        return create_procurement_graph(market_agent, price_agent, compliance_agent)
+
+    def run(self, query: str, category: str = 'general', catalog_path: str = None,
+            fresh: bool = False, deadline_ms: Optional[int] = None) -> Dict:
+        """
+        Run the workflow for one item. Unexpired cached components are reused
+        and only the expired ones are recomputed; a market data miss re-runs
+        the whole graph, reusing unexpired per-seller compliance verdicts.
+        `fresh=True` ignores the cache (results are still stored).
+        Marketplace fetches and retries stop at the TIMEOUT_SECONDS budget.
+        With `deadline_ms` (default RESPONSE_DEADLINE_MS) the market search
+        answers with the markets finished by then; the rest are reported as
+        pending and cache their results in the background.
+        """
+        with start_trace('procurement', query=query, category=str(category)) as trace, \
+                usage_scope() as llm_usage, deadline(self.timeout_seconds):
+            result = self._run(query, category, catalog_path, fresh,
+                               deadline_ms if deadline_ms is not None else self.deadline_ms)
+            result['llm_usage'] = llm_usage.summary()
+        result['trace'] = trace.summary()
+        logger.info(
+            f"Workflow finished for: {query} in {result['trace']['total_ms']}ms "
+            f"(trace {trace.trace_id}, node timings ms: {result.get('node_timings', {})})"
+        )
+        return result
+
+    def _run(self, query: str, category: str, catalog_path: Optional[str], fresh: bool,
+             deadline_ms: Optional[int] = None) -> Dict:
+        collected_data = {'catalog_path': catalog_path} if catalog_path else {}
+        if deadline_ms:
+            collected_data['deadline_ms'] = deadline_ms
+        state = initial_state(query=query, product_category=category, collected_data=collected_data)
+        use_cache = catalog_path is None
+        with span('procurement_cache.load'):
+            cached = self.result_cache.load(query, category) if use_cache and not fresh else {}
+
+        status = {'errors': [], 'partial': False}
+        if 'market' in cached:
+            for component, value in cached.items():
+                state[COMPONENTS[component]] = value
+            status = self.result_cache.load_market_status(query, category)
+            state['errors'] = status['errors']
+            computed = tuple(name for name in ANALYSIS_NODES if name not in cached)
+            sellers = {f'{item.platform}:{item.seller}' for item in state['market_data']}
+        else:
+            computed = tuple(COMPONENTS)
+            # Sellers of the last run: their verdicts usually outlive its market data
+            sellers = cached.get('compliance', {}).keys()
+
+        # The compliance node keeps verdicts already in the state and only verifies the other sellers
+        reused = {}
+        if 'compliance' in computed and cached:
+            reused = self.result_cache.load_verdicts(sellers)
+            state['compliance_checks'] = reused
+
+        if 'market' in cached:
+            logger.info(f'Cached market data for: {query}, recomputing: {list(computed) or "nothing"}')
+            final = self.analysis_apps[computed].invoke(state) if computed else {**state, 'step': 'analysis_complete'}
+        else:
+            logger.info(f'Starting workflow for: {query} ({len(reused)} cached seller verdicts)')
+            final = self.app.invoke(state)
+
+        # Empty market data is not worth remembering; the next call should retry.
+        # Runs missing markets (skipped or still pending) are only kept briefly.
+        if use_cache and final.get('market_data'):
+            market_errors = [e for e in final.get('errors', []) if e.startswith((SKIPPED_PREFIX, PENDING_PREFIX))]
+            partial = status['partial'] or bool(market_errors)
+            with span('procurement_cache.store'):
+                self.result_cache.store(query, category, final, computed, partial=partial, market_errors=market_errors)
+                if 'compliance' in computed:
+                    self.result_cache.store_verdicts(
+                        {key: report for key, report in final['compliance_checks'].items() if key not in reused}
+                    )
+
+        result = dump_state(final)
+        result['cache'] = {c: 'miss' if c in computed else 'hit' for c in COMPONENTS}
+        return result
+
+    def iter_many(self, queries: Iterable[str], category: str = 'general',
+                  concurrency: int = 4) -> Iterator[Dict]:
+        """
+        Run a list of procurement items concurrently, yielding each item as it
+        finishes. Identical queries (case/whitespace-insensitive) run once and
+        share their result; marketplace fetches and seller verifications are
+        shared through the long-lived scraper and verification client.
+        """
+        groups: Dict[str, List[str]] = {}
+        for query in queries:
+            groups.setdefault(normalize_query(query), []).append(query)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='procurement') as executor:
+            futures = {
+                executor.submit(self.run, originals[0], category): originals
+                for originals in groups.values()
+            }
+            for future in as_completed(futures):
+                originals = futures[future]
+                try:
+                    item = {'result': future.result(), 'error': None}
+                except Exception as e:
+                    logger.error(f'Procurement failed for {originals[0]}: {e}')
+                    item = {'result': None, 'error': str(e)}
+                for query in originals:
+                    yield {'query': query, **item}
+
+    def run_many(self, queries: Iterable[str], category: str = 'general', concurrency: int = 4,
+                 on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Run a batch of items; `on_result` receives each item as soon as it finishes."""
+        queries = list(queries)
+        start = time.perf_counter()
+        results: Dict[str, Dict] = {}
+        failed = 0
+
+        for item in self.iter_many(queries, category, concurrency):
+            results[item['query']] = item
+            failed += item['error'] is not None
+            if on_result is not None:
+                on_result(item)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            'items': len(queries),
+            'unique_items': len({normalize_query(q) for q in queries}),
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 2),
+            'items_per_minute': round(len(queries) * 60 / elapsed, 1) if elapsed > 0 else None,
+            'results': results
         }
-        logger.info(f'Starting workflow for: {query}')
-        return self.app.invoke(initial_state)
+        logger.info(
+            f"Batch of {summary['items']} items ({summary['unique_items']} unique) finished in "
+            f"{summary['elapsed_seconds']}s: {summary['items_per_minute']} items/min, {failed} failed"
+        )
+        return summary
+
 
 _supervisor = None
+_supervisor_lock = threading.Lock()
 
 def get_supervisor():
     global _supervisor
     if _supervisor is None:
-        _supervisor = SupervisorAgent()
+        with _supervisor_lock:
+            if _supervisor is None:
+                _supervisor = SupervisorAgent()
     return _supervisor
 
-def run_procurement(query: str, category: str = 'general', catalog_path: str = None) -> Dict:
-    return get_supervisor().run(query, category, catalog_path)
+def run_procurement(query: str, category: str = 'general', catalog_path: str = None,
+                    fresh: bool = False, deadline_ms: Optional[int] = None) -> Dict:
+    return get_supervisor().run(query, category, catalog_path, fresh=fresh, deadline_ms=deadline_ms)
+
+def iter_procurement_many(queries: Iterable[str], category: str = 'general',
+                          concurrency: int = 4) -> Iterator[Dict]:
+    return get_supervisor().iter_many(queries, category, concurrency)
+
+def run_procurement_many(queries: Iterable[str], category: str = 'general', concurrency: int = 4,
+                         on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+    return get_supervisor().run_many(queries, category, concurrency, on_result)
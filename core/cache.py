@@ -1,3 +1,88 @@
+"""
+Persistent key-value cache shared by the tools.
+Values are stored as JSON in SQLite so entries survive restarts and are
+visible to every worker process on the host. The async methods run the
+SQLite calls in a worker thread so they never block the event loop.
+"""
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import threading
+from typing import Any, Optional
+
+from core.config import Settings
+
+
 class CacheManager:
-    async def get(self, key): return None
-    async def set(self, key, value, ttl=None): pass
+    """SQLite-backed cache with per-entry TTL and an async-friendly API."""
+
+    def __init__(self, path: Optional[str] = None, default_ttl: Optional[int] = None):
+        self.path = path or Settings().cache_db_path
+        self.default_ttl = default_ttl
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn.commit()
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(value)
+
+    def set_sync(self, key: str, value: Any, ttl: Optional[int] = None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.time() + ttl if ttl else None
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            self._conn.commit()
+
+    def delete_sync(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    async def get(self, key):
+        return await asyncio.to_thread(self.get_sync, key)
+
+    async def set(self, key, value, ttl=None):
+        await asyncio.to_thread(self.set_sync, key, value, ttl)
+
+    async def delete(self, key):
+        await asyncio.to_thread(self.delete_sync, key)
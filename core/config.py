@@ -1,2 +1,81 @@
+import os
+
+
 class Settings:
-    pass
+    """Runtime settings read from the environment."""
+
+    def __init__(self):
+        # Review classifier inference backend: "pytorch" or "onnx"
+        self.review_inference_backend = os.getenv("REVIEW_INFERENCE_BACKEND", "pytorch").lower()
+        self.review_model_name = os.getenv(
+            "REVIEW_MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english"
+        )
+        self.onnx_cache_dir = os.getenv("ONNX_CACHE_DIR", os.path.join(".cache", "onnx"))
+        self.onnx_quantize = os.getenv("ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+
+        # Persistent cache shared by tools (core.cache.CacheManager)
+        self.cache_db_path = os.getenv("CACHE_DB_PATH", os.path.join(".cache", "procurement_cache.sqlite3"))
+        self.review_cache_ttl = int(os.getenv("REVIEW_CACHE_TTL", str(30 * 24 * 3600)))
+
+        # Executor for CPU-bound review analysis: "thread" or "process"
+        self.review_executor = os.getenv("REVIEW_EXECUTOR", "thread").lower()
+        self.review_workers = int(os.getenv("REVIEW_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+        # Cross-seller near-duplicate review index (tools.review_dedup)
+        self.duplicate_detection = os.getenv("REVIEW_DUPLICATE_DETECTION", "true").lower() in ("1", "true", "yes")
+        self.duplicate_index_path = os.getenv("DUPLICATE_INDEX_PATH", os.path.join(".cache", "review_minhash.npz"))
+        self.duplicate_index_max_entries = int(os.getenv("DUPLICATE_INDEX_MAX_ENTRIES", "50000"))
+
+        # Procurement result cache: per-component TTLs in seconds
+        self.procurement_market_ttl = int(os.getenv("PROCUREMENT_MARKET_TTL", "900"))
+        self.procurement_price_ttl = int(os.getenv("PROCUREMENT_PRICE_TTL", "3600"))
+        self.procurement_compliance_ttl = int(os.getenv("PROCUREMENT_COMPLIANCE_TTL", str(24 * 3600)))
+        # Cap for runs where some markets were skipped or still pending
+        self.procurement_partial_ttl = int(os.getenv("PROCUREMENT_PARTIAL_TTL", "60"))
+
+        # Price forecasting pool (tools.forecast_tool): "process" or "thread"
+        self.forecast_executor = os.getenv("FORECAST_EXECUTOR", "process").lower()
+        self.forecast_workers = int(os.getenv("FORECAST_WORKERS", "2"))
+
+        # Append-only price history (core.price_history)
+        self.price_history_path = os.getenv("PRICE_HISTORY_PATH", os.path.join(".cache", "price_history.sqlite3"))
+
+        # Gemini client: concurrent calls and response cache for low-temperature prompts
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.llm_cache_ttl = int(os.getenv("LLM_CACHE_TTL", "3600"))
+        self.llm_cache_max_temperature = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+
+        # Prometheus /metrics endpoint (core.monitoring); 0 disables it
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+
+        # Run tracing (core.tracing): JSONL export, plus OTLP/HTTP when an endpoint is set
+        self.trace_enabled = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.trace_file = os.getenv("TRACE_FILE", os.path.join("logs", "traces.jsonl"))
+        # Fraction of runs exported; the JSONL file rolls over at TRACE_FILE_MAX_MB keeping TRACE_FILE_BACKUPS old files
+        self.trace_sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+        self.trace_file_max_mb = float(os.getenv("TRACE_FILE_MAX_MB", "100"))
+        self.trace_file_backups = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+        self.otlp_endpoint = os.getenv("OTLP_ENDPOINT", "")
+
+        # Shared pool for marketplace searches, used by every concurrent search_all (run_many batches included)
+        self.search_pool_workers = int(os.getenv("SEARCH_POOL_WORKERS", "16"))
+
+        # Per-host circuit breakers for marketplace fetches (core.resilience)
+        self.circuit_failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.circuit_reset_seconds = int(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+
+        # Time budget for one procurement run; HTTP timeouts and retries inside it are bounded by it
+        self.timeout_seconds = float(os.getenv("TIMEOUT_SECONDS", "30"))
+        # Answer with the markets finished after this many ms; the rest keep filling the cache (0 = wait for all)
+        self.response_deadline_ms = int(os.getenv("RESPONSE_DEADLINE_MS", "0"))
+
+        # Hedged marketplace fetches (core.hedging): backup request after the host's p95
+        self.hedge_requests = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+        self.hedge_budget_ratio = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+        # Background health checks (core.resilience.HealthMonitor); interval 0 disables the scheduler.
+        # Routing for markets failing their probe: "skip", "deprioritize" or "off"
+        self.health_check_interval = float(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+        self.health_check_timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+        self.health_routing = os.getenv("HEALTH_ROUTING", "skip").lower()
@@ -1,2 +1,29 @@
 class MLModelError(Exception):
     pass
+
+
+class ExternalServiceError(Exception):
+    """A marketplace or third-party API call failed."""
+    pass
+
+
+class ConfigurationError(Exception):
+    pass
+
+
+class CircuitOpenError(ExternalServiceError):
+    """Raised without calling out when a host's circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        super().__init__(f"Circuit breaker OPEN for {name} (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before `what` could run."""
+
+    def __init__(self, what: str, budget: float):
+        super().__init__(f"Deadline of {budget:.1f}s exceeded before {what}")
+        self.what = what
+        self.budget = budget
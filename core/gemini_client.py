@@ -1,77 +1,233 @@
 """
 Google Gemini integration for the procurement system.
 Handles all LLM interactions with retry logic and safety.
+
+Low-temperature calls are effectively deterministic, so their responses are
+cached by prompt hash with a TTL. Async calls share a bounded semaphore so
+batches (``generate_many``) never exceed the configured API concurrency.
 """
 import os
-from typing import Optional, Dict, Any, List
-import google.generativeai as genai
-from tenacity import retry, stop_after_attempt, wait_exponential
+import json
+import asyncio
+import hashlib
+import weakref
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Union
+from tenacity import AsyncRetrying, Retrying, stop_after_attempt, wait_exponential
+from core.cache import CacheManager
+from core.config import Settings
+from core.llm_usage import CallTimer, response_token_counts
 from core.logging import get_logger
+from core.resilience import stop_at_deadline
 from core.safety import SafetyGuardrails
+from core.tracing import traced
+
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
 
 logger = get_logger("gemini")
 
+MAX_OUTPUT_TOKENS = 2048
+
 
 class GeminiClient:
     """Wrapper for Google Gemini API with resilience features."""
-    
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[Any] = None,
+        model_name: str = 'gemini-pro',
+        cache: Optional[CacheManager] = None,
+        max_concurrency: Optional[int] = None,
+        max_attempts: int = 3
+    ):
+        settings = Settings()
+        self.model_name = model_name
+        if model is None:
+            self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+            if not self.api_key:
+                raise ValueError("GOOGLE_API_KEY not found in environment")
+            if not GENAI_AVAILABLE:
+                raise ImportError("google-generativeai is not installed")
+            genai.configure(api_key=self.api_key)
+            model = genai.GenerativeModel(model_name)
+        self.model = model
+
+        self.cache = cache or CacheManager()
+        self.cache_ttl = settings.llm_cache_ttl
+        self.cache_max_temperature = settings.llm_cache_max_temperature
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.max_attempts = max_attempts
+        # One semaphore per event loop (asyncio primitives are loop-bound)
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
         logger.info("Gemini client initialized")
-    
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        reraise=True
-    )
-    def generate(self, prompt: str, temperature: float = 0.3) -> str:
-        """Generate text with retry logic."""
-        try:
-            safe_prompt = SafetyGuardrails.sanitize_input(prompt)
-            
-            response = self.model.generate_content(
-                safe_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
-                    max_output_tokens=2048,
-                )
+
+    # -- caching -----------------------------------------------------------------
+
+    def cache_key(self, prompt: str, temperature: float) -> str:
+        digest = hashlib.sha256(f"{self.model_name}|{temperature}|{MAX_OUTPUT_TOKENS}|{prompt}".encode("utf-8"))
+        return f"llm:{digest.hexdigest()}"
+
+    def _cacheable(self, temperature: float) -> bool:
+        return self.cache_ttl > 0 and temperature <= self.cache_max_temperature
+
+    def _cached(self, prompt: str, temperature: float) -> Optional[str]:
+        if not self._cacheable(temperature):
+            return None
+        return self.cache.get_sync(self.cache_key(prompt, temperature))
+
+    def _remember(self, prompt: str, temperature: float, text: str):
+        if self._cacheable(temperature):
+            self.cache.set_sync(self.cache_key(prompt, temperature), text, ttl=self.cache_ttl)
+
+    async def _cached_async(self, prompt: str, temperature: float) -> Optional[str]:
+        if not self._cacheable(temperature):
+            return None
+        return await self.cache.get(self.cache_key(prompt, temperature))
+
+    async def _remember_async(self, prompt: str, temperature: float, text: str):
+        if self._cacheable(temperature):
+            await self.cache.set(self.cache_key(prompt, temperature), text, ttl=self.cache_ttl)
+
+    # -- model calls -------------------------------------------------------------
+
+    def _retry_policy(self) -> Dict[str, Any]:
+        return {
+            'stop': stop_after_attempt(self.max_attempts) | stop_at_deadline,
+            'wait': wait_exponential(multiplier=0.5, min=0.5, max=4),
+            'reraise': True,
+        }
+
+    @staticmethod
+    def _generation_config(temperature: float) -> Dict[str, Any]:
+        return {'temperature': temperature, 'max_output_tokens': MAX_OUTPUT_TOKENS}
+
+    @staticmethod
+    def _text(response: Any) -> str:
+        if response.text:
+            return response.text
+        raise ValueError("Empty response from Gemini")
+
+    def _call_model(self, prompt: str, temperature: float) -> Tuple[str, Any]:
+        response = self.model.generate_content(prompt, generation_config=self._generation_config(temperature))
+        return self._text(response), response
+
+    async def _call_model_async(self, prompt: str, temperature: float) -> Tuple[str, Any]:
+        if hasattr(self.model, 'generate_content_async'):
+            response = await self.model.generate_content_async(
+                prompt, generation_config=self._generation_config(temperature)
             )
-            
-            if response.text:
-                logger.debug("Gemini generation successful")
-                return response.text
-            else:
-                raise ValueError("Empty response from Gemini")
-                
+            return self._text(response), response
+        return await asyncio.to_thread(self._call_model, prompt, temperature)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @traced('llm.generate')
+    def generate(self, prompt: str, temperature: float = 0.3, caller: Optional[str] = None) -> str:
+        """Generate text with retry logic. Usage is attributed to `caller` (or the current llm_caller)."""
+        timer = CallTimer(self.model_name, caller)
+        safe_prompt = SafetyGuardrails.sanitize_input(prompt)
+        cached = self._cached(safe_prompt, temperature)
+        if cached is not None:
+            logger.debug("Gemini cache hit")
+            timer.finish(cache_hit=True)
+            return cached
+
+        attempts = 0
+        try:
+            for attempt in Retrying(**self._retry_policy()):
+                with attempt:
+                    attempts += 1
+                    text, response = self._call_model(safe_prompt, temperature)
+        except Exception as e:
+            logger.error(f"Gemini generation failed: {str(e)}")
+            timer.finish(retries=attempts - 1, error=type(e).__name__)
+            raise
+
+        logger.debug("Gemini generation successful")
+        self._finish(timer, safe_prompt, text, response, attempts)
+        self._remember(safe_prompt, temperature, text)
+        return text
+
+    @staticmethod
+    def _finish(timer: CallTimer, prompt: str, text: str, response: Any, attempts: int):
+        prompt_tokens, response_tokens = response_token_counts(response, prompt, text)
+        timer.finish(prompt_tokens=prompt_tokens, response_tokens=response_tokens, retries=attempts - 1)
+
+    @traced('llm.generate')
+    async def generate_async(self, prompt: str, temperature: float = 0.3, caller: Optional[str] = None) -> str:
+        """Async generate; at most `max_concurrency` calls are in flight per event loop."""
+        timer = CallTimer(self.model_name, caller)
+        safe_prompt = SafetyGuardrails.sanitize_input(prompt)
+        cached = await self._cached_async(safe_prompt, temperature)
+        if cached is not None:
+            logger.debug("Gemini cache hit")
+            timer.finish(cache_hit=True)
+            return cached
+
+        attempts = 0
+        try:
+            async with self._semaphore():
+                async for attempt in AsyncRetrying(**self._retry_policy()):
+                    with attempt:
+                        attempts += 1
+                        text, response = await self._call_model_async(safe_prompt, temperature)
         except Exception as e:
             logger.error(f"Gemini generation failed: {str(e)}")
+            timer.finish(retries=attempts - 1, error=type(e).__name__)
             raise
-    
-    def analyze_price_trend(self, price_history: List[Dict]) -> Dict[str, Any]:
+
+        logger.debug("Gemini generation successful")
+        self._finish(timer, safe_prompt, text, response, attempts)
+        await self._remember_async(safe_prompt, temperature, text)
+        return text
+
+    async def generate_many(
+        self,
+        prompts: Sequence[str],
+        temperature: float = 0.3,
+        return_exceptions: bool = False,
+        caller: Optional[str] = None
+    ) -> List[Union[str, BaseException]]:
+        """
+        Generate for a batch of prompts concurrently (bounded by the semaphore).
+        Identical prompts in the batch are sent once. Results keep input order.
+        """
+        unique = list(dict.fromkeys(prompts))
+        results = await asyncio.gather(
+            *(self.generate_async(p, temperature, caller) for p in unique),
+            return_exceptions=return_exceptions
+        )
+        by_prompt = dict(zip(unique, results))
+        return [by_prompt[p] for p in prompts]
+
+    def analyze_price_trend(self, price_history: List[Dict], caller: str = 'price_trend') -> Dict[str, Any]:
         """Use Gemini to analyze price trends and provide insights."""
-        prompt = f\"\"\"
+        prompt = f"""
         Analyze the following price history and provide insights:
         {price_history}
-        
+
         Provide:
         1. Trend direction (up/down/stable)
         2. Confidence level (0-1)
         3. Recommendation (buy/wait/avoid)
         4. Expected price change in 7 days
-        
+
         Return as JSON.
-        \"\"\"
-        
+        """
+
         try:
-            response = self.generate(prompt, temperature=0.2)
-            import json
-            if "`json" in response:
-                response = response.split("`json")[1].split("`")[0]
+            response = self.generate(prompt, temperature=0.2, caller=caller)
+            if "```json" in response:
+                response = response.split("```json")[1].split("```")[0]
             return json.loads(response)
         except Exception as e:
             logger.error(f"Failed to parse price analysis: {e}")
@@ -1,16 +1,153 @@
-﻿from langgraph.graph import StateGraph, END
-
-def create_procurement_graph():
-    from agents.market_agent import market_agent
-    from agents.price_agent import price_agent
-    from agents.compliance_agent import compliance_agent
-    
-    workflow = StateGraph(dict)
-    workflow.add_node("market", market_agent)
-    workflow.add_node("price", price_agent)
-    workflow.add_node("compliance", compliance_agent)
-    workflow.set_entry_point("market")
-    workflow.add_edge("market", "price")
-    workflow.add_edge("price", "compliance")
-    workflow.add_edge("compliance", END)
+﻿"""
+LangGraph workflow for the procurement pipeline.
+
+Market collection runs first; price analysis and compliance checks only read
+``market_data`` and write disjoint fields, so they fan out in parallel and
+meet again at a join node. End-to-end latency is market + max(price, compliance).
+
+State is validated once when a run starts (``SystemState``) and dumped once
+when it ends. In between, nodes pass model instances through untouched and
+return partial updates, so market data is never re-validated or copied per node.
+"""
+import time
+import operator
+import functools
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from core.llm_usage import llm_caller
+from core.monitoring import MetricsCollector
+from core.tracing import span
+
+metrics = MetricsCollector()
+
+
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer for dict channels written by parallel nodes."""
+    return {**(left or {}), **(right or {})}
+
+
+class ProcurementState(TypedDict, total=False):
+    query: str
+    product_category: Optional[str]
+    collected_data: Dict[str, Any]
+    market_data: List[Any]
+    price_analysis: Any
+    compliance_checks: Dict[str, Any]
+    final_recommendation: Any
+    errors: Annotated[List[str], operator.add]
+    retry_count: int
+    step: str
+    node_timings: Annotated[Dict[str, float], merge_dicts]
+
+
+def node_state(state: Dict) -> Any:
+    """
+    SystemState view over the graph state for an agent, built without
+    validation. Inputs were validated at the boundary; the errors list is
+    copied so agents can append to it without touching shared state.
+    """
+    from core.models import SystemState
+    fields = {k: state[k] for k in SystemState.model_fields if k in state}
+    fields['errors'] = list(state.get('errors') or [])
+    return SystemState.model_construct(**fields)
+
+
+def state_update(before: Dict, after: Any, *fields: str) -> Dict:
+    """
+    Partial update for a node: only the fields it owns (as model instances)
+    plus any errors it appended. Parallel branches must not both write plain
+    (non-reducer) keys.
+    """
+    update = {f: getattr(after, f) for f in fields}
+    new_errors = after.errors[len(before.get('errors') or []):]
+    if new_errors:
+        update['errors'] = new_errors
+    return update
+
+
+def initial_state(**fields: Any) -> Dict:
+    """Validate run inputs and turn them into graph state (models kept as instances)."""
+    from core.models import SystemState
+    state = dict(SystemState(**fields))
+    state['node_timings'] = {}
+    return state
+
+
+def dump_state(state: Dict) -> Dict:
+    """Serialize final graph state to plain dicts for callers."""
+    from core.models import SystemState
+    fields = {k: state[k] for k in SystemState.model_fields if k in state}
+    result = SystemState.model_construct(**fields).model_dump()
+    result['node_timings'] = dict(state.get('node_timings') or {})
+    return result
+
+
+def timed_node(name: str, node: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+    """
+    Wrap a node so its wall time (ms) is recorded in state['node_timings'],
+    it runs inside a ``node.<name>`` trace span, and any LLM calls it makes
+    are attributed to it.
+    """
+    @functools.wraps(node)
+    def wrapper(state: Dict) -> Dict:
+        start = time.perf_counter()
+        with llm_caller(name), span(f'node.{name}'):
+            update = dict(node(state) or {})
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        metrics.histogram('graph.node_ms', elapsed_ms, tags={'node': name})
+        update['node_timings'] = {name: elapsed_ms}
+        return update
+    return wrapper
+
+
+def join_analysis(state: Dict) -> Dict:
+    """Join point after the parallel price/compliance branches."""
+    return {'step': 'analysis_complete'}
+
+
+ANALYSIS_NODES = ("price", "compliance")
+
+
+def create_procurement_graph(
+    market: Optional[Callable] = None,
+    price: Optional[Callable] = None,
+    compliance: Optional[Callable] = None,
+    analysis_only: Optional[Tuple[str, ...]] = None
+):
+    """
+    Build the procurement workflow. With ``analysis_only`` the market node is
+    left out and only the named analysis nodes run (in parallel) on market
+    data already present in the state.
+    """
+    if market is None:
+        from agents.market_agent import market_agent as market
+    if price is None:
+        from agents.price_agent import price_agent as price
+    if compliance is None:
+        from agents.compliance_agent import compliance_agent as compliance
+
+    analysis = {"price": price, "compliance": compliance}
+    selected = [name for name in ANALYSIS_NODES if analysis_only is None or name in analysis_only]
+    if not selected:
+        raise ValueError("analysis_only must name at least one of: " + ", ".join(ANALYSIS_NODES))
+
+    workflow = StateGraph(ProcurementState)
+    for name in selected:
+        workflow.add_node(name, timed_node(name, analysis[name]))
+    workflow.add_node("join", join_analysis)
+
+    # Fan out after market collection (or straight from the start when market
+    # data is supplied), fan back in at the join node
+    if analysis_only is None:
+        workflow.add_node("market", timed_node("market", market))
+        workflow.set_entry_point("market")
+        source = "market"
+    else:
+        source = START
+    for name in selected:
+        workflow.add_edge(source, name)
+    workflow.add_edge(selected, "join")
+    workflow.add_edge("join", END)
     return workflow.compile()
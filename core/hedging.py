@@ -0,0 +1,148 @@
+"""
+Hedged marketplace requests.
+
+A fetch that has not answered by its host's observed p95 latency gets a
+second, independent attempt (fresh connection, rotated User-Agent) and the
+first response to arrive wins. Hedges draw from one process-wide token
+bucket: every request earns a fraction of a hedge (HEDGE_BUDGET_RATIO), so
+extra load stays bounded at that fraction even when a host is slow for
+everyone. Enabled with HEDGE_REQUESTS=true; latencies are tracked either way.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from core.config import Settings
+from core.logging import get_logger
+from core.monitoring import MetricsCollector
+from core.tracing import submit_in_context
+
+logger = get_logger('hedging')
+metrics = MetricsCollector()
+
+T = TypeVar('T')
+
+
+class LatencyTracker:
+    """Rolling window of response times per host, with a cached p95."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._p95: Dict[str, Optional[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._p95.pop(host, None)
+
+    def p95(self, host: str) -> Optional[float]:
+        """95th percentile in seconds, or None until `min_samples` responses were seen"""
+        with self._lock:
+            if host in self._p95:
+                return self._p95[host]
+            samples = sorted(self._samples.get(host, ()))
+            value = samples[int(0.95 * (len(samples) - 1))] if len(samples) >= self.min_samples else None
+            self._p95[host] = value
+            return value
+
+
+class HedgeBudget:
+    """Token bucket shared by all hosts: each request earns `ratio` of a hedge, at most `burst` are saved."""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, round(self.tokens + self.ratio, 9))
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Hedger:
+    """Runs a request and, if it is slower than the host's p95, races a backup against it."""
+
+    def __init__(self, enabled: bool = False, budget_ratio: float = 0.1, min_samples: int = 20,
+                 max_workers: int = 32):
+        self.enabled = enabled
+        self.latency = LatencyTracker(min_samples=min_samples)
+        self.budget = HedgeBudget(budget_ratio)
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> 'Hedger':
+        settings = Settings()
+        return cls(settings.hedge_requests, settings.hedge_budget_ratio, settings.hedge_min_samples)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+        return self._pool
+
+    def _timed(self, host: str, request: Callable[[], T]) -> T:
+        started = time.monotonic()
+        result = request()
+        self.latency.record(host, time.monotonic() - started)
+        return result
+
+    def call(self, host: str, primary: Callable[[], T], backup: Callable[[], T]) -> T:
+        """
+        Result of `primary`, or of `backup` if that finishes first after being
+        started at the host's p95. The losing request is left to finish (and
+        is discarded); an error only surfaces once both attempts have failed.
+        """
+        if not self.enabled:
+            return self._timed(host, primary)
+        self.budget.deposit()
+        delay = self.latency.p95(host)
+        if delay is None:
+            return self._timed(host, primary)
+
+        pool = self._executor()
+        first = submit_in_context(pool, self._timed, host, primary)
+        wait([first], timeout=delay)
+        if first.done() or not self.budget.withdraw():
+            return first.result()
+
+        metrics.increment('hedge.issued', tags={'host': host})
+        logger.debug('Hedging request to {} after {:.0f}ms', host, delay * 1000)
+        second = submit_in_context(pool, self._timed, host, backup)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        metrics.increment('hedge.won', tags={'host': host})
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+
+hedger = Hedger.from_settings()
+
+
+def hedged(host: str, primary: Callable[[], T], backup: Callable[[], T]) -> T:
+    """Send `primary` through the process-wide hedger (a plain call unless HEDGE_REQUESTS is on)"""
+    return hedger.call(host, primary, backup)
@@ -0,0 +1,148 @@
+"""
+LLM usage accounting.
+
+Every Gemini call is recorded with token counts, latency, retries, cache
+hits and the caller that made it. Records go to the metrics collector and,
+when a run is active (``usage_scope``), to a per-run recorder whose summary
+is attached to the procurement result. Run and caller are tracked with
+context variables, so attribution follows the work into graph node threads.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.monitoring import MetricsCollector
+
+_current_usage: ContextVar[Optional['UsageRecorder']] = ContextVar('llm_usage', default=None)
+_current_caller: ContextVar[str] = ContextVar('llm_caller', default='unknown')
+
+metrics = MetricsCollector()
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (~4 characters per token) when the API reports none"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def response_token_counts(response: Any, prompt: str, text: str) -> tuple:
+    """(prompt_tokens, response_tokens) from usage metadata, falling back to estimates"""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    response_tokens = getattr(usage, 'candidates_token_count', None)
+    return (
+        prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+        response_tokens if response_tokens is not None else estimate_tokens(text),
+    )
+
+
+@dataclass
+class LLMCall:
+    caller: str
+    model: str
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    latency_ms: float = 0.0
+    retries: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+
+class UsageRecorder:
+    """Collects the LLM calls made during one procurement run."""
+
+    def __init__(self):
+        self.calls: List[LLMCall] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: LLMCall):
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+
+        def totals(group: List[LLMCall]) -> Dict[str, Any]:
+            return {
+                'calls': len(group),
+                'prompt_tokens': sum(c.prompt_tokens for c in group),
+                'response_tokens': sum(c.response_tokens for c in group),
+                'latency_ms': round(sum(c.latency_ms for c in group), 2),
+                'retries': sum(c.retries for c in group),
+                'cache_hits': sum(c.cache_hit for c in group),
+                'errors': sum(c.error is not None for c in group),
+            }
+
+        by_caller: Dict[str, List[LLMCall]] = {}
+        for call in calls:
+            by_caller.setdefault(call.caller, []).append(call)
+        return {
+            **totals(calls),
+            'by_caller': {caller: totals(group) for caller, group in by_caller.items()},
+        }
+
+
+@contextmanager
+def usage_scope() -> Iterator[UsageRecorder]:
+    """Record every LLM call made inside the block (and in threads it hands work to)"""
+    recorder = UsageRecorder()
+    token = _current_usage.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_usage.reset(token)
+
+
+@contextmanager
+def llm_caller(name: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to `name` (an agent or tool)"""
+    token = _current_caller.set(name)
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+def current_caller() -> str:
+    return _current_caller.get()
+
+
+def record_call(call: LLMCall):
+    """Publish one call to metrics and the active run, if any"""
+    tags = {'caller': call.caller, 'model': call.model}
+    metrics.increment('llm.calls', tags=tags)
+    if call.cache_hit:
+        metrics.increment('llm.cache_hits', tags=tags)
+    if call.retries:
+        metrics.increment('llm.retries', value=call.retries, tags=tags)
+    if call.error:
+        metrics.increment('llm.errors', tags=tags)
+    metrics.increment('llm.prompt_tokens', value=call.prompt_tokens, tags=tags)
+    metrics.increment('llm.response_tokens', value=call.response_tokens, tags=tags)
+    metrics.histogram('llm.latency_ms', call.latency_ms, tags=tags)
+
+    recorder = _current_usage.get()
+    if recorder is not None:
+        recorder.add(call)
+
+
+class CallTimer:
+    """Measures one LLM call; `finish` builds and records its LLMCall"""
+
+    def __init__(self, model: str, caller: Optional[str] = None):
+        self.model = model
+        self.caller = caller or current_caller()
+        self.start = time.perf_counter()
+
+    def finish(self, **fields: Any) -> LLMCall:
+        call = LLMCall(
+            caller=self.caller,
+            model=self.model,
+            latency_ms=round((time.perf_counter() - self.start) * 1000, 2),
+            **fields
+        )
+        record_call(call)
+        return call
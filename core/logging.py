@@ -1,21 +1,45 @@
 """
 Centralized logging configuration for the procurement system.
 Uses Loguru for structured logging with rotation and retention.
+
+Sink I/O (console, rotating file, JSON events) runs on a dedicated writer
+thread fed by a bounded queue, so agent and scraper threads only pay for an
+enqueue. When the queue is full, messages below ERROR are dropped and
+counted (the writer reports how many); ERROR and above wait for room.
+Set LOG_ASYNC=false to write synchronously, e.g. when debugging a crash.
+
+Messages may be passed with loguru-style ``{}`` arguments; they are only
+formatted by the writer, and calls below every sink's level return before
+doing any work. ``LogSampler`` thins out high-volume events per key and logs
+periodic counts instead.
 """
 import sys
-import json
+import time
+import queue
+import atexit
+import threading
 from pathlib import Path
 from loguru import logger
-from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 import os
 
+LEVEL_NO = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", "DEBUG")
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Variable values in tracebacks are slow to render and can leak secrets: development only
+LOG_DIAGNOSE = os.getenv(
+    "LOG_DIAGNOSE", str(os.getenv("ENVIRONMENT", "development") == "development")
+).lower() in ("1", "true", "yes")
+
 # Remove default handler
 logger.remove()
 
 # Create logs directory
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+log_dir = Path(os.getenv("LOG_DIR", "logs"))
+log_dir.mkdir(parents=True, exist_ok=True)
 
 # Format for structured logging
 LOG_FORMAT = (
@@ -29,10 +53,10 @@ LOG_FORMAT = (
 logger.add(
     sys.stdout,
     format=LOG_FORMAT,
-    level=os.getenv("LOG_LEVEL", "INFO"),
+    level=LOG_LEVEL,
     colorize=True,
     backtrace=True,
-    diagnose=True
+    diagnose=LOG_DIAGNOSE
 )
 
 # File handler with rotation
@@ -42,8 +66,9 @@ logger.add(
     retention="30 days",
     compression="zip",
     format=LOG_FORMAT,
-    level="DEBUG",
-    encoding="utf-8"
+    level=LOG_FILE_LEVEL,
+    encoding="utf-8",
+    diagnose=LOG_DIAGNOSE
 )
 
 # JSON structured log for analysis
@@ -52,40 +77,238 @@ logger.add(
     serialize=True,
     rotation="100 MB",
     retention="30 days",
-    level="INFO"
+    level="INFO",
+    diagnose=LOG_DIAGNOSE
 )
 
+# Lowest level any sink above accepts; AgentLogger calls below it are no-ops
+MIN_LEVEL_NO = min(LEVEL_NO.get(level.upper(), 0) for level in (LOG_LEVEL, LOG_FILE_LEVEL, "INFO"))
+
+# (bound logger, level, message, format args, epoch time, caller module, function, line)
+LogEntry = Tuple[Any, str, str, tuple, float, str, str, int]
+
+
+class LogPipeline:
+    """Bounded queue drained by one writer thread that replays log calls into loguru."""
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, put_timeout: float = 1.0):
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.errors = 0
+        self._reported = 0
+        self._queue: "queue.Queue[Optional[LogEntry]]" = queue.Queue(maxsize=maxsize)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def submit(self, entry: LogEntry):
+        if self._writer is None:
+            self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if entry[1] in ("ERROR", "CRITICAL"):
+                try:
+                    self._queue.put(entry, timeout=self.put_timeout)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+    def flush(self):
+        """Block until every queued message has been written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout=5)
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                self._emit(entry)
+                if self.dropped != self._reported:
+                    dropped, self._reported = self.dropped - self._reported, self.dropped
+                    logger.warning(f"Log queue full: dropped {dropped} messages ({self.dropped} total)")
+            except Exception as e:
+                # The sinks may be what failed, so this goes straight to stderr
+                self.errors += 1
+                print(f"Log writer failed to emit a message ({self.errors} total): {e!r}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _emit(entry: LogEntry):
+        bound, level, message, args, ts, name, function, line = entry
+
+        def restore_origin(record):
+            record["time"] = type(record["time"]).fromtimestamp(ts, record["time"].tzinfo)
+            record["name"] = name
+            record["module"] = name.rpartition(".")[2]
+            record["function"] = function
+            record["line"] = line
+
+        bound.patch(restore_origin).log(level, message, *args)
+
+
+_pipeline: Optional[LogPipeline] = LogPipeline() if LOG_ASYNC else None
+if _pipeline is not None:
+    atexit.register(_pipeline.close)
+
+
+def flush_logs():
+    """Wait for queued log messages to reach their sinks"""
+    if _pipeline is not None:
+        _pipeline.flush()
+
 
 class AgentLogger:
     """Context-aware logger for agents."""
-    
+
     def __init__(self, agent_name: str):
         self.agent_name = agent_name
         self.context: Dict[str, Any] = {}
-    
+        self._bound = logger.bind(agent=agent_name)
+
     def bind(self, **kwargs):
         """Add context to all subsequent logs."""
         self.context.update(kwargs)
+        self._bound = logger.bind(**{**self.context, "agent": self.agent_name})
         return self
-    
-    def _log(self, level: str, message: str, **kwargs):
-        extra = {**self.context, **kwargs, "agent": self.agent_name}
-        logger.bind(**extra).log(level, message)
-    
-    def debug(self, message: str, **kwargs):
-        self._log("DEBUG", message, **kwargs)
-    
-    def info(self, message: str, **kwargs):
-        self._log("INFO", message, **kwargs)
-    
-    def warning(self, message: str, **kwargs):
-        self._log("WARNING", message, **kwargs)
-    
-    def error(self, message: str, **kwargs):
-        self._log("ERROR", message, **kwargs)
-    
-    def critical(self, message: str, **kwargs):
-        self._log("CRITICAL", message, **kwargs)
+
+    @staticmethod
+    def is_enabled(level: str) -> bool:
+        """False when no sink would accept `level`; guard expensive message building with it"""
+        return LEVEL_NO.get(level, 0) >= MIN_LEVEL_NO
+
+    def _log(self, level: str, message: str, args: tuple = (), extra: Optional[Dict[str, Any]] = None,
+             depth: int = 2):
+        if LEVEL_NO.get(level, 0) < MIN_LEVEL_NO:
+            return
+        bound = self._bound
+        if extra:
+            bound = logger.bind(**{**self.context, **extra, "agent": self.agent_name})
+        if _pipeline is None:
+            bound.opt(depth=depth).log(level, message, *args)
+            return
+        caller = sys._getframe(depth)
+        _pipeline.submit((
+            bound, level, message, args, time.time(),
+            caller.f_globals.get("__name__", "?"), caller.f_code.co_name, caller.f_lineno
+        ))
+
+    def debug(self, message: str, *args: Any, **kwargs):
+        self._log("DEBUG", message, args, kwargs)
+
+    def info(self, message: str, *args: Any, **kwargs):
+        self._log("INFO", message, args, kwargs)
+
+    def warning(self, message: str, *args: Any, **kwargs):
+        self._log("WARNING", message, args, kwargs)
+
+    def error(self, message: str, *args: Any, **kwargs):
+        self._log("ERROR", message, args, kwargs)
+
+    def critical(self, message: str, *args: Any, **kwargs):
+        self._log("CRITICAL", message, args, kwargs)
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """'universal_scraper.cache_hit=0.01,world_scraper.search=0.1' -> {key: rate}"""
+    rates = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            rates[key.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            pass
+    return rates
+
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_SAMPLE_SUMMARY_SECONDS = float(os.getenv("LOG_SAMPLE_SUMMARY_SECONDS", "60"))
+
+
+class LogSampler:
+    """
+    Per-key sampled logging for high-volume events.
+
+    An event key with rate r logs 1 in round(1/r) occurrences (rate 0 logs
+    none); every `interval` seconds the counts of thinned-out keys are
+    logged as one summary line. Rates come from `defaults`, overridden by
+    LOG_SAMPLE_RATES entries named ``<logger name>.<key>``.
+    """
+
+    def __init__(self, log: AgentLogger, defaults: Optional[Dict[str, float]] = None,
+                 interval: Optional[float] = None, rates: Optional[Dict[str, float]] = None):
+        self.log = log
+        prefix = f"{log.agent_name}."
+        configured = LOG_SAMPLE_RATES if rates is None else rates
+        self.rates = {
+            **(defaults or {}),
+            **{key[len(prefix):]: rate for key, rate in configured.items() if key.startswith(prefix)},
+        }
+        self.interval = interval if interval is not None else LOG_SAMPLE_SUMMARY_SECONDS
+        self._every = {key: round(1 / rate) if rate > 0 else 0 for key, rate in self.rates.items()}
+        self._totals: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+        self._logged: Dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def event(self, key: str, level: str, message: str, *args: Any, _depth: int = 2, **kwargs):
+        if LEVEL_NO.get(level, 0) < MIN_LEVEL_NO:
+            return
+        every = self._every.get(key, 1)
+        with self._lock:
+            n = self._totals.get(key, 0)
+            self._totals[key] = n + 1
+            self._seen[key] = self._seen.get(key, 0) + 1
+            emit = every == 1 or (every > 1 and n % every == 0)
+            if emit:
+                self._logged[key] = self._logged.get(key, 0) + 1
+            due = time.monotonic() - self._window_start >= self.interval
+        if emit:
+            self.log._log(level, message, args, kwargs, depth=_depth)
+        if due:
+            self.summarize()
+
+    def summarize(self):
+        """Log how many events each sampled key saw since the last summary"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            seen, logged = self._seen, self._logged
+            self._seen, self._logged, self._window_start = {}, {}, now
+        for key in sorted(seen):
+            if seen[key] != logged.get(key, 0):
+                self.log._log(
+                    "INFO", "{:,} {} events in last {:.0f}s ({:,} logged)",
+                    (seen[key], key, elapsed, logged.get(key, 0)), depth=1
+                )
+
+    def debug(self, key: str, message: str, *args: Any, **kwargs):
+        self.event(key, "DEBUG", message, *args, _depth=3, **kwargs)
+
+    def info(self, key: str, message: str, *args: Any, **kwargs):
+        self.event(key, "INFO", message, *args, _depth=3, **kwargs)
+
+    def warning(self, key: str, message: str, *args: Any, **kwargs):
+        self.event(key, "WARNING", message, *args, _depth=3, **kwargs)
 
 
 def get_logger(agent_name: str = "system") -> AgentLogger:
@@ -93,4 +316,4 @@ def get_logger(agent_name: str = "system") -> AgentLogger:
     return AgentLogger(agent_name)
 
 
-__all__ = ['logger', 'get_logger', 'AgentLogger']
+__all__ = ['logger', 'get_logger', 'AgentLogger', 'LogPipeline', 'LogSampler', 'flush_logs']
@@ -1,4 +1,298 @@
+"""
+In-process metrics: counters, fixed-bucket histograms and tagged gauges.
+
+Hot paths only touch the calling thread's own shard (a plain dict reached
+through a thread-local), so increments take no lock and never contend.
+Readers merge the shards when a snapshot or the Prometheus text exposition
+is requested. Shards of threads that have exited are folded into one
+retired shard, so short-lived pool threads don't accumulate. Every
+``MetricsCollector()`` writes to the shared default registry unless it is
+given its own.
+"""
+import re
+import json
+import threading
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Upper bounds of the default histogram buckets (milliseconds for latencies)
+DEFAULT_BUCKETS: Tuple[float, ...] = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+TagKey = Tuple[Tuple[str, Any], ...]
+SeriesKey = Tuple[str, TagKey]
+Shard = Tuple[Dict[SeriesKey, float], Dict[SeriesKey, List[float]]]
+
+_NAME_RE = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _tag_key(tags: Optional[Mapping[str, Any]]) -> TagKey:
+    return tuple(sorted(tags.items())) if tags else ()
+
+
+class MetricsRegistry:
+    """Storage behind MetricsCollector: per-thread counter/histogram shards plus gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (owning thread, shard); the thread is weakly held so exited threads can be reaped
+        self._shards: List[Tuple[weakref.ref, Shard]] = []
+        self._retired: Shard = ({}, {})
+        self._gauges: Dict[SeriesKey, float] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def _shard(self) -> Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = ({}, {})
+            with self._lock:
+                self._reap()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def _reap(self):
+        """Fold shards of exited threads into the retired shard (caller holds the lock)"""
+        live = []
+        retired_counters, retired_histograms = self._retired
+        for owner, shard in self._shards:
+            thread = owner()
+            if thread is not None and thread.is_alive():
+                live.append((owner, shard))
+                continue
+            counters, histograms = shard
+            for key, value in counters.items():
+                retired_counters[key] = retired_counters.get(key, 0) + value
+            for key, hist in histograms.items():
+                total = retired_histograms.get(key)
+                if total is None:
+                    retired_histograms[key] = list(hist)
+                else:
+                    for i, v in enumerate(hist):
+                        total[i] += v
+        self._shards = live
+
+    def _all_shards(self) -> List[Shard]:
+        """Retired totals (copied, so a concurrent reap can't count a shard twice) plus live shards"""
+        with self._lock:
+            self._reap()
+            counters, histograms = self._retired
+            retired = (counters.copy(), {key: list(hist) for key, hist in histograms.items()})
+            return [retired] + [shard for _, shard in self._shards]
+
+    # -- configuration (writes are on MetricsCollector) -----------------------
+
+    def declare_histogram(self, name: str, buckets: Sequence[float]) -> Tuple[float, ...]:
+        """Fix a histogram's bucket bounds; the first declaration wins"""
+        with self._lock:
+            return self._buckets.setdefault(name, tuple(sorted(float(b) for b in buckets)))
+
+    # -- reading -----------------------------------------------------------------
+
+    def counters(self) -> Dict[SeriesKey, float]:
+        shards = self._all_shards()
+        merged: Dict[SeriesKey, float] = {}
+        for counters, _ in shards:
+            for key, value in counters.copy().items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def histograms(self) -> Dict[SeriesKey, Dict[str, Any]]:
+        """Series -> {'buckets': [(upper_bound, cumulative_count), ...], 'count', 'sum'}"""
+        shards = self._all_shards()
+        with self._lock:
+            bucket_bounds = dict(self._buckets)
+        merged: Dict[SeriesKey, List[float]] = {}
+        for _, histograms in shards:
+            for key, hist in histograms.copy().items():
+                hist = list(hist)
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = hist
+                else:
+                    for i, v in enumerate(hist):
+                        total[i] += v
+
+        result = {}
+        for key, hist in merged.items():
+            bounds = bucket_bounds[key[0]] + (float('inf'),)
+            cumulative, running = [], 0
+            for bound, count in zip(bounds, hist[:-1]):
+                running += count
+                cumulative.append((bound, running))
+            result[key] = {'buckets': cumulative, 'count': running, 'sum': hist[-1]}
+        return result
+
+    def gauges(self) -> Dict[SeriesKey, float]:
+        return self._gauges.copy()
+
+    def reset(self):
+        with self._lock:
+            for counters, histograms in [self._retired] + [shard for _, shard in self._shards]:
+                counters.clear()
+                histograms.clear()
+            self._gauges.clear()
+
+
+default_registry = MetricsRegistry()
+
+
 class MetricsCollector:
-    def increment(self, *args, **kwargs): pass
-    def histogram(self, *args, **kwargs): pass
-    def gauge(self, *args, **kwargs): pass
+    """
+    Records counters, histograms and gauges into a (by default shared) registry.
+
+    Writes go straight to the calling thread's shard: one thread-local lookup
+    and one dict update, no lock.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or default_registry
+        self._local = self.registry._local
+
+    def increment(self, name: str, value: float = 1, tags: Optional[Mapping[str, Any]] = None):
+        key = (name, tuple(sorted(tags.items()))) if tags else (name, ())
+        try:
+            counters = self._local.shard[0]
+        except AttributeError:
+            counters = self.registry._shard()[0]
+        counters[key] = counters.get(key, 0) + value
+
+    def histogram(self, name: str, value: float, tags: Optional[Mapping[str, Any]] = None,
+                  buckets: Optional[Sequence[float]] = None):
+        bounds = self.registry._buckets.get(name)
+        if bounds is None:
+            bounds = self.registry.declare_histogram(name, buckets or DEFAULT_BUCKETS)
+        key = (name, tuple(sorted(tags.items()))) if tags else (name, ())
+        try:
+            histograms = self._local.shard[1]
+        except AttributeError:
+            histograms = self.registry._shard()[1]
+        hist = histograms.get(key)
+        if hist is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            hist = histograms[key] = [0] * (len(bounds) + 1) + [0.0]
+        hist[bisect_left(bounds, value)] += 1
+        hist[-1] += value
+
+    def gauge(self, name: str, value: float, tags: Optional[Mapping[str, Any]] = None):
+        self.registry._gauges[(name, _tag_key(tags))] = value
+
+    def record_metric(self, name: str, value: float, tags: Optional[Mapping[str, Any]] = None):
+        """Record a sampled value (sizes, counts per call) as a histogram observation"""
+        self.histogram(name, value, tags)
+
+    def get_counter(self, name: str, tags: Optional[Mapping[str, Any]] = None) -> float:
+        """Counter value for one tag set, or summed over all tag sets when tags is None"""
+        counters = self.registry.counters()
+        if tags is not None:
+            return counters.get((name, _tag_key(tags)), 0)
+        return sum(v for (n, _), v in counters.items() if n == name)
+
+    def get_histogram(self, name: str, tags: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self.registry.histograms().get((name, _tag_key(tags)))
+
+    def get_gauge(self, name: str, tags: Optional[Mapping[str, Any]] = None) -> Optional[float]:
+        return self.registry.gauges().get((name, _tag_key(tags)))
+
+    def to_prometheus(self) -> str:
+        return render_prometheus(self.registry)
+
+
+# -- Prometheus exposition -----------------------------------------------------
+
+def _metric_name(name: str) -> str:
+    name = _NAME_RE.sub('_', name)
+    return f'_{name}' if name[:1].isdigit() else name
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(tags: TagKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [(_metric_name(k), str(v)) for k, v in tags] + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """Prometheus text format (version 0.0.4) for every series in the registry"""
+    registry = registry or default_registry
+    lines: List[str] = []
+
+    def emit(kind: str, series: Dict[SeriesKey, Any], render):
+        by_name: Dict[str, List[Tuple[TagKey, Any]]] = {}
+        for (name, tags), value in series.items():
+            by_name.setdefault(name, []).append((tags, value))
+        for name in sorted(by_name):
+            metric = _metric_name(name)
+            lines.append(f'# TYPE {metric} {kind}')
+            for tags, value in sorted(by_name[name], key=lambda item: repr(item[0])):
+                render(metric, tags, value)
+
+    def counter(metric, tags, value):
+        lines.append(f'{metric}_total{_labels(tags)} {_number(value)}')
+
+    def gauge(metric, tags, value):
+        lines.append(f'{metric}{_labels(tags)} {_number(value)}')
+
+    def histogram(metric, tags, data):
+        for bound, count in data['buckets']:
+            lines.append(f'{metric}_bucket{_labels(tags, (("le", _number(bound)),))} {count}')
+        lines.append(f'{metric}_sum{_labels(tags)} {_number(data["sum"])}')
+        lines.append(f'{metric}_count{_labels(tags)} {data["count"]}')
+
+    emit('counter', registry.counters(), counter)
+    emit('gauge', registry.gauges(), gauge)
+    emit('histogram', registry.histograms(), histogram)
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = default_registry
+    health: Optional[Callable[[], Dict[str, Any]]] = None
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            self._send(render_prometheus(self.registry), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/health' and self.health is not None:
+            self._send(json.dumps(self.health(), default=str), 'application/json')
+        else:
+            self.send_error(404)
+
+    def _send(self, text: str, content_type: str):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', registry: Optional[MetricsRegistry] = None,
+                         health: Optional[Callable[[], Dict[str, Any]]] = None) -> ThreadingHTTPServer:
+    """
+    Serve /metrics (and /health, as JSON from `health()`, when given) from a
+    daemon thread; call .shutdown() on the result to stop it
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {
+        'registry': registry or default_registry,
+        'health': staticmethod(health) if health else None,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
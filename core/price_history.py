@@ -0,0 +1,280 @@
+"""
+Append-only price history store.
+
+Every scraped price is kept in SQLite, partitioned into one table per month
+(``prices_YYYYMM``) with an index on (product, marketplace, ts), so range
+queries only touch the months they cover and old months can be archived by
+dropping a table. Scrapers hand records to a background writer thread that
+flushes them in batches, keeping inserts off the request path.
+"""
+import os
+import re
+import queue
+import atexit
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+from core.config import Settings
+from core.logging import get_logger
+
+logger = get_logger('price_history')
+
+Timestamp = Union[datetime, str, float, int, None]
+
+_TABLE_RE = re.compile(r'^prices_(\d{6})$')
+
+
+def normalize_product(name: str) -> str:
+    """History key for a product: lowercase words without punctuation"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name.lower()).split())
+
+
+def _to_epoch(ts: Timestamp) -> float:
+    if ts is None:
+        return datetime.now().timestamp()
+    if isinstance(ts, datetime):
+        return ts.timestamp()
+    if isinstance(ts, str):
+        return datetime.fromisoformat(ts).timestamp()
+    return float(ts)
+
+
+def _month(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch).strftime('%Y%m')
+
+
+@dataclass
+class PriceRecord:
+    product: str
+    marketplace: str
+    price: float
+    ts: float
+    seller: str = ''
+    currency: str = 'KES'
+
+    @classmethod
+    def create(cls, product: str, marketplace: str, price: float, ts: Timestamp = None,
+               seller: Optional[str] = None, currency: Optional[str] = None) -> 'PriceRecord':
+        return cls(
+            product=normalize_product(product),
+            marketplace=marketplace.lower(),
+            price=float(price),
+            ts=_to_epoch(ts),
+            seller=seller or '',
+            currency=currency or 'KES'
+        )
+
+
+class PriceHistoryStore:
+    """Month-partitioned SQLite price history with a batched background writer."""
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 500,
+                 flush_interval: float = 2.0, max_queue: int = 100000):
+        self.path = path or Settings().price_history_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._queue: "queue.Queue[Optional[PriceRecord]]" = queue.Queue(maxsize=max_queue)
+        self._tables: set = set()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._read_conn = self._connect()
+        self.dropped = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # -- writing -----------------------------------------------------------------
+
+    def append(self, records: Iterable[PriceRecord]) -> int:
+        """Queue records for the background writer; returns how many were accepted"""
+        self._ensure_writer()
+        accepted = dropped = 0
+        for record in records:
+            if record.price <= 0:
+                continue
+            try:
+                self._queue.put_nowait(record)
+                accepted += 1
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            self.dropped += dropped
+            logger.warning(f'Price history queue full, dropped {dropped} records ({self.dropped} total)')
+        return accepted
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout=10)
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='price-history-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [r for r in batch if r is not None]
+            stop = len(records) != len(batch)
+            try:
+                if records:
+                    self._write(conn, records)
+            except sqlite3.Error as e:
+                logger.error(f'Price history write failed ({len(records)} records): {e}')
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _ensure_table(self, conn: sqlite3.Connection, month: str):
+        if month in self._tables:
+            return
+        table = f'prices_{month}'
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'ts REAL NOT NULL, product TEXT NOT NULL, marketplace TEXT NOT NULL, '
+            'seller TEXT NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL)'
+        )
+        # Re-scrapes of a cached result carry the same timestamp and are ignored
+        conn.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table} '
+            f'ON {table} (product, marketplace, ts, seller, price)'
+        )
+        self._tables.add(month)
+
+    def _write(self, conn: sqlite3.Connection, records: List[PriceRecord]):
+        by_month = {}
+        for r in records:
+            by_month.setdefault(_month(r.ts), []).append(
+                (r.ts, r.product, r.marketplace, r.seller, r.price, r.currency)
+            )
+        with conn:
+            for month, rows in by_month.items():
+                self._ensure_table(conn, month)
+                conn.executemany(
+                    f'INSERT OR IGNORE INTO prices_{month} '
+                    '(ts, product, marketplace, seller, price, currency) VALUES (?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    # -- reading -----------------------------------------------------------------
+
+    def _months(self, start: float, end: float) -> List[str]:
+        with self._read_lock:
+            names = [row[0] for row in self._read_conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'prices_%'"
+            )]
+        first, last = _month(start), _month(end)
+        return sorted(
+            m.group(1) for m in map(_TABLE_RE.match, names)
+            if m and first <= m.group(1) <= last
+        )
+
+    def _range_sql(self, select: str, product: str, marketplace: Optional[str],
+                   start: Timestamp, end: Timestamp, suffix: str = '') -> Tuple[str, List[Any]]:
+        start_ts = _to_epoch(start) if start is not None else 0.0
+        end_ts = _to_epoch(end)
+        where = 'product = ? AND ts >= ? AND ts <= ?'
+        base_params: List[Any] = [normalize_product(product), start_ts, end_ts]
+        if marketplace:
+            where += ' AND marketplace = ?'
+            base_params.append(marketplace.lower())
+
+        parts, params = [], []
+        for month in self._months(start_ts, end_ts):
+            parts.append(f'SELECT ts, marketplace, seller, price FROM prices_{month} WHERE {where}')
+            params.extend(base_params)
+        if not parts:
+            return '', []
+        return f'SELECT {select} FROM ({" UNION ALL ".join(parts)}) {suffix}', params
+
+    def query(self, product: str, marketplace: Optional[str] = None,
+              start: Timestamp = None, end: Timestamp = None) -> List[Tuple[float, str, str, float]]:
+        """(ts, marketplace, seller, price) rows for a product in a time range, oldest first"""
+        sql, params = self._range_sql('*', product, marketplace, start, end, 'ORDER BY ts')
+        if not sql:
+            return []
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def downsample(self, product: str, marketplace: Optional[str] = None,
+                   start: Timestamp = None, end: Timestamp = None,
+                   bucket_seconds: int = 86400) -> List[Tuple[float, float, float, float, int]]:
+        """(bucket_start, min, mean, max, count) per time bucket, for charts and forecasting"""
+        bucket = int(bucket_seconds)
+        sql, params = self._range_sql(
+            f'CAST(ts / {bucket} AS INTEGER) * {bucket} AS bucket, MIN(price), AVG(price), MAX(price), COUNT(*)',
+            product, marketplace, start, end, 'GROUP BY bucket ORDER BY bucket'
+        )
+        if not sql:
+            return []
+        with self._read_lock:
+            return [tuple(row) for row in self._read_conn.execute(sql, params).fetchall()]
+
+
+_store: Optional[PriceHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_history() -> PriceHistoryStore:
+    """Process-wide store at Settings.price_history_path (flushed on exit)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceHistoryStore()
+                atexit.register(_store.close)
+    return _store
+
+
+def record_prices(query: str, products: Iterable[Any], marketplace_attr: str = 'marketplace',
+                  seller_attr: str = 'seller') -> int:
+    """Queue scraped products (anything with price/currency/scraped_at attributes) for storage"""
+    try:
+        records = [
+            PriceRecord.create(
+                query,
+                getattr(p, marketplace_attr),
+                p.price,
+                ts=getattr(p, 'scraped_at', None),
+                seller=getattr(p, seller_attr, None),
+                currency=getattr(p, 'currency', None)
+            )
+            for p in products if p.price
+        ]
+        return get_price_history().append(records)
+    except Exception as e:
+        logger.warning(f'Could not record price history for {query}: {e}')
+        return 0
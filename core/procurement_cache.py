@@ -0,0 +1,111 @@
+"""
+Component-level cache for procurement results.
+
+A run is made of three components with different lifetimes: market data
+(prices move within minutes), the price forecast and compliance verdicts
+(sellers rarely change status). Each is cached separately under its own TTL
+so a repeated query only recomputes what has expired. Results missing some
+markets are kept for at most PROCUREMENT_PARTIAL_TTL seconds; the market
+errors are kept with the market data so a cache hit reports them again.
+Compliance verdicts are also cached per seller, so a market refresh only
+verifies sellers whose verdict has expired.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.cache import CacheManager
+from core.config import Settings
+from core.logging import get_logger
+from core.models import ComplianceReport, SystemState
+
+logger = get_logger('procurement_cache')
+
+# Component name -> SystemState field it caches
+COMPONENTS = {
+    'market': 'market_data',
+    'price': 'price_analysis',
+    'compliance': 'compliance_checks',
+}
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+
+class ProcurementCache:
+    """Per-component TTL cache for procurement runs, keyed by query and category."""
+
+    def __init__(self, cache: Optional[CacheManager] = None, ttls: Optional[Dict[str, int]] = None):
+        settings = Settings()
+        self.cache = cache or CacheManager()
+        self.ttls = {
+            'market': settings.procurement_market_ttl,
+            'price': settings.procurement_price_ttl,
+            'compliance': settings.procurement_compliance_ttl,
+            **(ttls or {}),
+        }
+        self.partial_ttl = settings.procurement_partial_ttl
+
+    def _key(self, component: str, query: str, category: Any) -> str:
+        category = getattr(category, 'value', category) or 'general'
+        return f"procurement:{component}:{category}:{normalize_query(query)}"
+
+    def _verdict_key(self, seller_key: str) -> str:
+        return f"procurement:verdict:{seller_key}"
+
+    def load(self, query: str, category: Any) -> Dict[str, Any]:
+        """Unexpired components for a query, as validated model values."""
+        found = {}
+        for component, field in COMPONENTS.items():
+            payload = self.cache.get_sync(self._key(component, query, category))
+            if payload is None:
+                continue
+            try:
+                found[component] = getattr(SystemState.model_validate({field: payload}), field)
+            except Exception as e:
+                logger.warning(f'Dropping unreadable cached {component} for {query}: {e}')
+        return found
+
+    def load_market_status(self, query: str, category: Any) -> Dict[str, Any]:
+        """Errors and partial flag of the run that produced the cached market data"""
+        status = self.cache.get_sync(self._key('market_status', query, category)) or {}
+        return {'errors': list(status.get('errors', [])), 'partial': bool(status.get('partial'))}
+
+    def load_verdicts(self, seller_keys: Iterable[str]) -> Dict[str, ComplianceReport]:
+        """Unexpired compliance verdicts for `seller_keys` (platform:seller, as in compliance_checks)"""
+        found = {}
+        for key in seller_keys:
+            payload = self.cache.get_sync(self._verdict_key(key))
+            if payload is None:
+                continue
+            try:
+                found[key] = ComplianceReport.model_validate(payload)
+            except Exception as e:
+                logger.warning(f'Dropping unreadable cached verdict for {key}: {e}')
+        return found
+
+    def store(self, query: str, category: Any, state: Dict[str, Any], components: Iterable[str],
+              partial: bool = False, market_errors: Optional[List[str]] = None):
+        """
+        Cache `components` of a finished run; `partial` runs (markets skipped
+        or pending) expire early. `market_errors` are kept with the market data.
+        """
+        for component in components:
+            field = COMPONENTS[component]
+            payload = SystemState.model_construct(**{field: state[field]}).model_dump(
+                mode='json', include={field}
+            )[field]
+            ttl = min(self.ttls[component], self.partial_ttl) if partial else self.ttls[component]
+            self.cache.set_sync(self._key(component, query, category), payload, ttl=ttl)
+            if component == 'market':
+                status = {'errors': list(market_errors or []), 'partial': partial}
+                self.cache.set_sync(self._key('market_status', query, category), status, ttl=ttl)
+
+    def store_verdicts(self, verdicts: Dict[str, Any]):
+        """Cache compliance verdicts per seller under the compliance TTL"""
+        for key, report in verdicts.items():
+            payload = ComplianceReport.model_validate(report).model_dump(mode='json')
+            self.cache.set_sync(self._verdict_key(key), payload, ttl=self.ttls['compliance'])
+
+    def invalidate(self, query: str, category: Any):
+        for component in (*COMPONENTS, 'market_status'):
+            self.cache.delete_sync(self._key(component, query, category))
@@ -1,57 +1,259 @@
 """
 Resilience and monitoring for the procurement system.
 Includes retry logic, timeout handling, and circuit breakers.
+
+Timeouts are deadlines rather than signals: ``deadline(seconds)`` sets a
+per-request budget in a context variable, which follows the request into
+LangGraph node threads, asyncio tasks and executor workers fed through
+``core.tracing.submit_in_context``. HTTP timeouts, retry waits and sleeps
+read the remaining budget, so work stops cooperatively once it is spent
+instead of holding a worker.
 """
 import time
+import asyncio
 import functools
-from typing import Any, Callable, Optional
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_not_exception_type
+from core.config import Settings
+from core.exceptions import CircuitOpenError, DeadlineExceeded
 from core.logging import get_logger
 
 logger = get_logger("resilience")
 
 class CircuitBreaker:
-    """Circuit breaker to prevent cascading failures."""
+    """
+    Circuit breaker to prevent cascading failures.
+
+    Thread-safe, and safe to use from event loops (no call blocks). A
+    closed circuit admits requests without taking the lock; an open one
+    rejects them until `timeout` seconds after the last failure, then lets
+    a single probe through (HALF_OPEN) whose outcome closes or reopens it.
+    """
     
-    def __init__(self, failure_threshold: int = 5, timeout: int = 60):
+    def __init__(self, failure_threshold: int = 5, timeout: int = 60, name: Optional[str] = None):
         self.failure_threshold = failure_threshold
         self.timeout = timeout
+        self.name = name
         self.failures = 0
         self.last_failure_time = None
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
     
-    def call(self, func: Callable, *args, **kwargs) -> Any:
-        if self.state == "OPEN":
-            if time.time() - self.last_failure_time > self.timeout:
+    def allow_request(self) -> bool:
+        if self.state == "CLOSED":
+            return True
+        with self._lock:
+            now = time.time()
+            if self.state == "OPEN":
+                if now - (self.last_failure_time or 0) < self.timeout:
+                    return False
                 self.state = "HALF_OPEN"
-                logger.info(f"Circuit breaker entering HALF_OPEN state")
-            else:
-                raise Exception(f"Circuit breaker OPEN for {func.__name__}")
-        
-        try:
-            result = func(*args, **kwargs)
-            if self.state == "HALF_OPEN":
-                self.state = "CLOSED"
-                self.failures = 0
-                logger.info(f"Circuit breaker CLOSED for {func.__name__}")
-            return result
-        except Exception as e:
+                logger.info(f"Circuit breaker entering HALF_OPEN state for {self.name}")
+            elif self.state == "CLOSED":
+                return True
+            # One probe at a time; a probe that never reported back expires
+            if self._probe_started is not None and now - self._probe_started < self.timeout:
+                return False
+            self._probe_started = now
+            return True
+    
+    def retry_after(self) -> float:
+        """Seconds until an open circuit admits a probe (0 when closed)"""
+        if self.state == "CLOSED":
+            return 0.0
+        return max(0.0, (self.last_failure_time or 0) + self.timeout - time.time())
+    
+    def check(self, name: Optional[str] = None):
+        """Raise CircuitOpenError if the circuit rejects the request"""
+        if not self.allow_request():
+            raise CircuitOpenError(name or self.name or "unknown", self.retry_after())
+    
+    def record_success(self):
+        if self.state == "CLOSED" and self.failures == 0:
+            return
+        with self._lock:
+            if self.state != "CLOSED":
+                logger.info(f"Circuit breaker CLOSED for {self.name}")
+            self.state = "CLOSED"
+            self.failures = 0
+            self._probe_started = None
+    
+    def record_failure(self, error: Optional[BaseException] = None):
+        with self._lock:
             self.failures += 1
             self.last_failure_time = time.time()
-            
-            if self.failures >= self.failure_threshold:
+            self._probe_started = None
+            if self.state == "HALF_OPEN" or self.failures >= self.failure_threshold:
+                if self.state != "OPEN":
+                    logger.error(f"Circuit breaker OPEN for {self.name}", error=str(error))
                 self.state = "OPEN"
-                logger.error(f"Circuit breaker OPEN for {func.__name__}", error=str(e))
+    
+    def record_status(self, status_code: int):
+        """Count an HTTP response: 5xx and 429 mean the host is unhealthy, anything else that it answered"""
+        if status_code >= 500 or status_code == 429:
+            self.record_failure(RuntimeError(f"HTTP {status_code}"))
+        else:
+            self.record_success()
+    
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        self.check(self.name or func.__name__)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
             raise
+        self.record_success()
+        return result
+    
+    async def call_async(self, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        self.check(self.name or func.__name__)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+
+class CircuitBreakerRegistry:
+    """One breaker per name (marketplace host), created on first use."""
+    
+    def __init__(self, failure_threshold: Optional[int] = None, timeout: Optional[int] = None):
+        settings = Settings()
+        self.failure_threshold = failure_threshold or settings.circuit_failure_threshold
+        self.timeout = timeout or settings.circuit_reset_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.get(name)
+                if breaker is None:
+                    breaker = self.breakers[name] = CircuitBreaker(self.failure_threshold, self.timeout, name=name)
+        return breaker
+    
+    def for_url(self, url: str) -> CircuitBreaker:
+        return self.get(host_of(url))
+    
+    def open_circuits(self) -> Dict[str, float]:
+        """Hosts currently rejecting requests, with seconds until their next probe"""
+        return {
+            name: round(breaker.retry_after(), 1)
+            for name, breaker in list(self.breakers.items())
+            if breaker.state != "CLOSED"
+        }
+
+
+def host_of(url: str) -> str:
+    host = urlparse(url).hostname or url
+    return host[4:] if host.startswith("www.") else host
+
+
+class Deadline:
+    """Absolute time budget for one request, shared by everything it calls."""
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+    
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+    
+    def check(self, what: str = "the next step"):
+        if self.expired:
+            raise DeadlineExceeded(what, self.seconds)
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run the block under a budget of `seconds`; an enclosing, earlier deadline still wins"""
+    current = _current_deadline.get()
+    if not seconds or seconds <= 0:
+        yield current
+        return
+    new = Deadline(seconds)
+    if current is not None and current.expires_at <= new.expires_at:
+        new = current
+    token = _current_deadline.set(new)
+    try:
+        yield new
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left in the current budget, capped at `default`; `default` when there is no deadline"""
+    current = _current_deadline.get()
+    if current is None:
+        return default
+    remaining = current.remaining()
+    return remaining if default is None else min(default, remaining)
+
+
+def check_deadline(what: str = "the next step"):
+    """Raise DeadlineExceeded if the current request is out of time"""
+    current = _current_deadline.get()
+    if current is not None:
+        current.check(what)
+
+
+def request_timeout(default: float, what: str = "request") -> float:
+    """HTTP timeout for a call: `default`, shortened to the time the request has left"""
+    current = _current_deadline.get()
+    if current is None:
+        return default
+    current.check(what)
+    return min(default, current.remaining())
+
+
+def deadline_sleep(seconds: float, what: str = "retry"):
+    """time.sleep that refuses to sleep past the deadline (there would be no time left for `what`)"""
+    current = _current_deadline.get()
+    if current is not None and current.remaining() <= seconds:
+        raise DeadlineExceeded(what, current.seconds)
+    time.sleep(seconds)
+
+
+def stop_at_deadline(retry_state) -> bool:
+    """tenacity stop condition: give up when the next wait would run past the deadline"""
+    current = _current_deadline.get()
+    if current is None:
+        return False
+    upcoming = getattr(retry_state, 'upcoming_sleep', None)
+    if upcoming is None:
+        # tenacity < 8.4 checks stop before computing the wait: ask the wait strategy directly
+        upcoming = retry_state.retry_object.wait(retry_state)
+    return current.remaining() <= (upcoming or 0)
 
 
 def with_retry(max_attempts: int = 3, backoff_seconds: int = 2):
-    """Decorator for retry logic with exponential backoff."""
+    """Decorator for retry logic with exponential backoff (bounded by the current deadline)."""
     def decorator(func):
         @retry(
-            stop=stop_after_attempt(max_attempts),
+            stop=stop_after_attempt(max_attempts) | stop_at_deadline,
             wait=wait_exponential(multiplier=backoff_seconds, min=1, max=30),
-            retry=retry_if_exception_type((ConnectionError, TimeoutError)),
+            retry=(retry_if_exception_type((ConnectionError, TimeoutError))
+                   & retry_if_not_exception_type(DeadlineExceeded)),
             reraise=True
         )
         @functools.wraps(func)
@@ -67,25 +269,24 @@ def with_retry(max_attempts: int = 3, backoff_seconds: int = 2):
 
 
 def with_timeout(seconds: int = 30):
-    """Decorator to enforce timeout on function execution."""
+    """
+    Decorator to run a function under a deadline of `seconds`.
+    
+    Works in any thread and on any platform. Cancellation is cooperative: the
+    HTTP calls, retries and sleeps inside observe the deadline and raise
+    DeadlineExceeded (a TimeoutError) once it has passed.
+    """
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with deadline(seconds):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError(f"{func.__name__} exceeded {seconds}s timeout")
-            
-            # Set timeout (Unix-like systems)
-            try:
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(seconds)
-                result = func(*args, **kwargs)
-                signal.alarm(0)
-                return result
-            except AttributeError:
-                # Windows fallback - no timeout enforcement
-                logger.warning(f"Timeout not supported on this platform for {func.__name__}")
+            with deadline(seconds):
                 return func(*args, **kwargs)
         return wrapper
     return decorator
@@ -112,36 +313,130 @@ class LoopGuard:
 
 
 class HealthMonitor:
-    """Monitor system health and component status."""
+    """
+    Monitor system health and component status.
+
+    Checks run concurrently, each bounded by `check_timeout`, and their
+    results are cached. `start()` refreshes them from a background thread so
+    that callers on the request path (marketplace routing, the /health
+    endpoint) read the last known status instead of waiting on a probe.
+    """
     
-    def __init__(self):
+    def __init__(self, check_timeout: Optional[float] = None, max_workers: int = 8):
         self.component_status = {}
         self.last_check = {}
+        self.results: Dict[str, dict] = {}
+        self.check_timeout = check_timeout or Settings().health_check_timeout
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._scheduler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
     
     def register_component(self, name: str, check_func: Callable):
         """Register a component with its health check function."""
         self.component_status[name] = check_func
     
-    def check_health(self) -> dict:
-        """Run health checks on all components."""
-        results = {}
-        for name, check_func in self.component_status.items():
-            try:
-                status = check_func()
-                results[name] = {"status": "healthy" if status else "unhealthy", "timestamp": time.time()}
-                self.last_check[name] = time.time()
-            except Exception as e:
-                results[name] = {"status": "error", "error": str(e), "timestamp": time.time()}
-                logger.error(f"Health check failed for {name}", error=str(e))
-        return results
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="health-check")
+        return self._pool
+    
+    def _run_check(self, name: str, check_func: Callable) -> dict:
+        started = time.perf_counter()
+        try:
+            result = {"status": "healthy" if check_func() else "unhealthy"}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+            logger.warning(f"Health check failed for {name}", error=str(e))
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["timestamp"] = time.time()
+        return result
+    
+    def check_health(self, max_age: Optional[float] = None) -> dict:
+        """Run health checks on all components concurrently; results younger than `max_age` seconds are reused."""
+        now = time.time()
+        with self._lock:
+            cached = dict(self.results)
+        due = {
+            name: check_func for name, check_func in list(self.component_status.items())
+            if max_age is None or name not in cached or now - cached[name]["timestamp"] > max_age
+        }
+        if due:
+            pool = self._executor()
+            futures = {name: pool.submit(self._run_check, name, check_func) for name, check_func in due.items()}
+            done, _ = wait(futures.values(), timeout=self.check_timeout)
+            with self._lock:
+                for name, future in futures.items():
+                    if future in done:
+                        self.results[name] = future.result()
+                    else:
+                        self.results[name] = {
+                            "status": "error", "error": f"timed out after {self.check_timeout}s",
+                            "latency_ms": round(self.check_timeout * 1000, 1), "timestamp": time.time()
+                        }
+                    self.last_check[name] = self.results[name]["timestamp"]
+        with self._lock:
+            return {name: dict(result) for name, result in self.results.items() if name in self.component_status}
+    
+    def is_healthy(self, name: str) -> Optional[bool]:
+        """Last known status of a component: None until it has been checked"""
+        result = self.results.get(name)
+        if result is None:
+            return None
+        return result["status"] == "healthy"
+    
+    def summary(self) -> dict:
+        """Cached statuses for the /health endpoint: overall 'ok' or 'degraded' plus each component"""
+        with self._lock:
+            components = {name: dict(result) for name, result in self.results.items()}
+        degraded = any(result["status"] != "healthy" for result in components.values())
+        return {"status": "degraded" if degraded else "ok", "components": components}
+    
+    def start(self, interval: float):
+        """Re-run every check each `interval` seconds from a daemon thread (first run immediately)"""
+        if self._scheduler is not None and self._scheduler.is_alive():
+            return
+        self._stop.clear()
+        
+        def loop():
+            while True:
+                try:
+                    self.check_health()
+                except Exception as e:
+                    logger.error("Scheduled health check failed", error=str(e))
+                if self._stop.wait(interval):
+                    return
+        
+        self._scheduler = threading.Thread(target=loop, name="health-scheduler", daemon=True)
+        self._scheduler.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join(timeout=self.check_timeout + 1)
+            self._scheduler = None
+
+
+def http_probe(session: Any, url: str, timeout: float = 5.0) -> Callable[[], bool]:
+    """Health check that HEADs `url` through a pooled requests session; 5xx and 429 count as unhealthy"""
+    def check() -> bool:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        return response.status_code < 500 and response.status_code != 429
+    return check
 
 
 # Global instances
 health_monitor = HealthMonitor()
-circuit_breakers = {}
+circuit_registry = CircuitBreakerRegistry()
+circuit_breakers = circuit_registry.breakers
 
 def get_circuit_breaker(name: str) -> CircuitBreaker:
     """Get or create a circuit breaker for a component."""
-    if name not in circuit_breakers:
-        circuit_breakers[name] = CircuitBreaker()
-    return circuit_breakers[name]
+    return circuit_registry.get(name)
+
+def breaker_for_url(url: str) -> CircuitBreaker:
+    """Circuit breaker shared by every request to the URL's host."""
+    return circuit_registry.for_url(url)
@@ -8,6 +8,23 @@ from core.logging import get_logger
 
 logger = get_logger("safety")
 
+_REGEX_SYNTAX = set('\\.^$*+?{}[]()|')
+
+
+def _first_char_lookahead(patterns: List[str]) -> str:
+    """Lookahead on the patterns' first characters, or '' unless each starts with a literal one"""
+    if not all(p and p[0] not in _REGEX_SYNTAX and p[1:2] not in ('?', '*', '{') for p in patterns):
+        return ''
+    return f"(?=[{re.escape(''.join(sorted({p[0] for p in patterns})))}])"
+
+
+def _named_alternation(patterns: Dict[str, str], prefix: str) -> str:
+    """One group per pattern, with `prefix` hoisted out of the branches if every pattern starts with it"""
+    shared = prefix if all(p.startswith(prefix) for p in patterns.values()) else ''
+    return shared + '(?:' + '|'.join(
+        '(?P<%s>%s)' % (name, pattern.removeprefix(shared)) for name, pattern in patterns.items()
+    ) + ')'
+
 
 class SafetyGuardrails:
     """Comprehensive safety checks for the system."""
@@ -32,20 +49,36 @@ class SafetyGuardrails:
         'phone_number': r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
         'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
     }
-    
+
+    # Each list above compiled into one alternation with a named group per
+    # pattern, so detection and redaction take a single scan of the text.
+    # When every pattern starts with a literal character, a lookahead on those
+    # characters lets the scan skip positions where no branch can start; when
+    # every sensitive pattern starts with \b, it is tested once for all branches.
+    _DANGEROUS_RE = re.compile(
+        _first_char_lookahead(DANGEROUS_PATTERNS) + '(?:'
+        + '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(DANGEROUS_PATTERNS)) + ')',
+        re.IGNORECASE
+    )
+    _SENSITIVE_RE = re.compile(_named_alternation(SENSITIVE_PATTERNS, r'\b'))
+    _REDACTIONS = {name: f'[{name.upper()}_REDACTED]' for name in SENSITIVE_PATTERNS}
+
     @classmethod
     def sanitize_input(cls, text: str) -> str:
         """Remove potentially dangerous content from input."""
         if not isinstance(text, str):
             return text
-            
-        sanitized = text
-        for pattern in cls.DANGEROUS_PATTERNS:
-            matches = re.findall(pattern, sanitized, re.IGNORECASE)
-            if matches:
-                logger.warning(f"Security: injection_attempt - Pattern: {pattern}")
-                sanitized = re.sub(pattern, '[REDACTED]', sanitized, flags=re.IGNORECASE)
-        
+
+        found = set()
+
+        def redact(match):
+            found.add(match.lastgroup)
+            return '[REDACTED]'
+
+        sanitized = cls._DANGEROUS_RE.sub(redact, text)
+        for group in sorted(found, key=lambda name: int(name[1:])):
+            logger.warning(f"Security: injection_attempt - Pattern: {cls.DANGEROUS_PATTERNS[int(group[1:])]}")
+
         # Limit length
         if len(sanitized) > 10000:
             logger.warning(f"Security: input_too_long - Length: {len(sanitized)}")
@@ -59,10 +92,8 @@ class SafetyGuardrails:
         if not isinstance(text, str):
             return text
             
-        redacted = text
-        for data_type, pattern in cls.SENSITIVE_PATTERNS.items():
-            redacted = re.sub(pattern, f'[{data_type.upper()}_REDACTED]', redacted)
-        return redacted
+        redactions = cls._REDACTIONS
+        return cls._SENSITIVE_RE.sub(lambda match: redactions[match.lastgroup], text)
     
     @classmethod
     def validate_price(cls, price: float, max_price: float = 10000000) -> bool:
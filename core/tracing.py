@@ -0,0 +1,272 @@
+"""
+Lightweight tracing for procurement runs.
+
+``start_trace`` opens a trace for one run; ``span`` (or ``@traced``) marks a
+stage inside it. The active trace and parent span live in context
+variables, so nested spans link up across LangGraph node threads and across
+executors that submit work through ``submit_in_context``. Outside a trace
+``span`` is a no-op, so library code can be instrumented unconditionally.
+
+When a trace ends its spans are appended to a JSONL file and, if an OTLP
+endpoint is configured, posted to it as OTLP/HTTP JSON from a background
+thread. TRACE_SAMPLE_RATE exports that share of traces (whole traces,
+chosen by trace id), and the file rolls over at TRACE_FILE_MAX_MB into
+TRACE_FILE_BACKUPS numbered copies, so it never grows without bound.
+``Trace.summary()`` gives the per-stage breakdown attached to procurement
+results.
+"""
+import os
+import json
+import time
+import secrets
+import asyncio
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.config import Settings
+from core.logging import get_logger
+
+logger = get_logger('tracing')
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_ms: float = 0.0
+    status: str = 'ok'
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """Spans collected for one run."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def collected(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    def summary(self) -> Dict[str, Any]:
+        """Total time and per-stage breakdown (count, total and max ms), slowest first"""
+        spans = self.collected()
+        stages: Dict[str, Dict[str, Any]] = {}
+        for s in spans:
+            stage = stages.setdefault(s.name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+            stage['count'] += 1
+            stage['total_ms'] += s.duration_ms
+            stage['max_ms'] = max(stage['max_ms'], s.duration_ms)
+            stage['errors'] += s.status == 'error'
+        for stage in stages.values():
+            stage['total_ms'] = round(stage['total_ms'], 2)
+        root = next((s for s in spans if s.parent_id is None), None)
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': root.duration_ms if root else 0.0,
+            'spans': len(spans),
+            'stages': dict(sorted(stages.items(), key=lambda kv: -kv[1]['total_ms'])),
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('trace', default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('span', default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; yields None outside a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+        attributes=attributes
+    )
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _current_span.reset(token)
+        trace.add(current)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of ``span`` for sync and async functions"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Open a trace with a root span; spans are exported when the block exits"""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(token)
+        export(trace)
+
+
+def submit_in_context(executor: Executor, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+    """executor.submit that carries the caller's trace (and other contextvars) into the worker"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# -- export --------------------------------------------------------------------
+
+_export_lock = threading.Lock()
+_otlp_executor: Optional[ThreadPoolExecutor] = None
+
+
+def sampled(trace_id: str, rate: float) -> bool:
+    """Deterministic per-trace sampling decision"""
+    return rate >= 1 or int(trace_id[:8], 16) < rate * 0x100000000
+
+
+def export(trace: Trace):
+    settings = Settings()
+    if not settings.trace_enabled or not sampled(trace.trace_id, settings.trace_sample_rate):
+        return
+    spans = trace.collected()
+    if settings.trace_file:
+        _write_jsonl(
+            settings.trace_file, spans,
+            int(settings.trace_file_max_mb * 1024 * 1024), settings.trace_file_backups
+        )
+    if settings.otlp_endpoint:
+        _otlp_pool().submit(_post_otlp, settings.otlp_endpoint, spans)
+
+
+def _rotate(path: str, backups: int):
+    """traces.jsonl -> traces.jsonl.1 -> ... -> .<backups>; the oldest is dropped"""
+    if backups <= 0:
+        os.remove(path)
+        return
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f'{path}.{i}'):
+            os.replace(f'{path}.{i}', f'{path}.{i + 1}')
+    os.replace(path, f'{path}.1')
+
+
+def _write_jsonl(path: str, spans: List[Span], max_bytes: int = 0, backups: int = 0):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        lines = ''.join(json.dumps(asdict(s), default=str) + '\n' for s in spans)
+        with _export_lock:
+            if max_bytes and os.path.exists(path) and os.path.getsize(path) + len(lines) > max_bytes:
+                _rotate(path, backups)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    except OSError as e:
+        logger.warning(f'Could not write trace to {path}: {e}')
+
+
+def _otlp_pool() -> ThreadPoolExecutor:
+    global _otlp_executor
+    if _otlp_executor is None:
+        with _export_lock:
+            if _otlp_executor is None:
+                _otlp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='otlp-export')
+    return _otlp_executor
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans: List[Span], service_name: str = 'procurement') -> Dict[str, Any]:
+    """OTLP/HTTP JSON payload (ExportTraceServiceRequest) for a list of spans"""
+    otlp_spans = []
+    for s in spans:
+        start_ns = int(s.start * 1e9)
+        otlp_span = {
+            'traceId': s.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 1,
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int(s.duration_ms * 1e6)),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+            'status': {'code': 2, 'message': s.error or ''} if s.status == 'error' else {'code': 1},
+        }
+        if s.parent_id:
+            otlp_span['parentSpanId'] = s.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'core.tracing'}, 'spans': otlp_spans}],
+        }]
+    }
+
+
+def _post_otlp(endpoint: str, spans: List[Span]):
+    import requests
+
+    try:
+        response = requests.post(f"{endpoint.rstrip('/')}/v1/traces", json=to_otlp(spans), timeout=5)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f'OTLP export failed: {e}')
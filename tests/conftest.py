@@ -1,10 +1,32 @@
 ﻿import pytest
 import os
 import sys
+import tempfile
 from unittest.mock import Mock, MagicMock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Log sinks are opened when core.logging is first imported: keep them out of logs/
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="procurement-test-logs-"))
+
+def pytest_configure(config):
+    # pytest.ini uses a [tool:pytest] section, which pytest only reads from setup.cfg
+    config.addinivalue_line("markers", "slow: Slow running tests")
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    """Keep trace exports from test runs out of logs/"""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACE_FILE", str(path))
+    return path
+
+@pytest.fixture(autouse=True)
+def state_paths(tmp_path, monkeypatch):
+    """Keep caches, price history and the duplicate index built by tests out of .cache/"""
+    monkeypatch.setenv("CACHE_DB_PATH", str(tmp_path / "procurement_cache.sqlite3"))
+    monkeypatch.setenv("PRICE_HISTORY_PATH", str(tmp_path / "price_history.sqlite3"))
+    monkeypatch.setenv("DUPLICATE_INDEX_PATH", str(tmp_path / "review_minhash.npz"))
+
 @pytest.fixture
 def mock_gemini_client():
     """Mock Gemini API client."""
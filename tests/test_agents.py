@@ -6,3 +6,235 @@ def test_price_agent():
     from agents.price_agent import PriceStrategistAgent
     agent = PriceStrategistAgent()
     assert agent is not None
+
+def test_graph_runs_price_and_compliance_in_parallel():
+    import threading
+    from core.graph import create_procurement_graph
+
+    # Each branch waits for the other to start: run one after the other, they would time out
+    started = {'price': threading.Event(), 'compliance': threading.Event()}
+    overlapped = {}
+
+    def branch(name, other):
+        started[name].set()
+        overlapped[name] = started[other].wait(timeout=2)
+
+    def market(state):
+        return {'market_data': [{'product_name': 'Maize', 'price': 100.0}], 'step': 'market_data_collected'}
+
+    def price(state):
+        branch('price', 'compliance')
+        return {'price_analysis': {'points': len(state['market_data'])}, 'errors': ['price warning']}
+
+    def compliance(state):
+        branch('compliance', 'price')
+        return {'compliance_checks': {'seller': 'ok'}, 'errors': ['compliance warning']}
+
+    app = create_procurement_graph(market, price, compliance)
+    result = app.invoke({'query': 'maize', 'errors': [], 'node_timings': {}})
+
+    assert overlapped == {'price': True, 'compliance': True}
+    assert result['price_analysis'] == {'points': 1}
+    assert result['compliance_checks'] == {'seller': 'ok'}
+    assert sorted(result['errors']) == ['compliance warning', 'price warning']
+    assert set(result['node_timings']) == {'market', 'price', 'compliance'}
+    assert result['step'] == 'analysis_complete'
+
+def test_market_agent_uses_shared_injected_scraper():
+    from agents.market_agent import MarketIntelligenceAgent, get_market_agent
+    from core.graph import initial_state, node_state
+
+    class StubScraper:
+        def __init__(self):
+            self.calls = []
+
+        def search_all(self, query, platforms=None, preference='cheapest', deadline_ms=None):
+            self.calls.append(query)
+            return {'all_results': [{'platform': 'jumia', 'seller': 'Acme Ltd', 'price': 1500.0}]}
+
+    scraper = StubScraper()
+    agent = MarketIntelligenceAgent(scraper=scraper)
+    result = agent.run(node_state(initial_state(query='maize')))
+    assert scraper.calls == ['maize']
+    assert result.market_data[0].price_kes == 1500.0
+    assert get_market_agent() is get_market_agent()
+
+def test_run_many_dedupes_and_streams_results():
+    from agents.supervisor import SupervisorAgent
+
+    supervisor = SupervisorAgent()
+    calls = []
+
+    def fake_run(query, category='general', catalog_path=None):
+        calls.append(query)
+        if query == 'broken':
+            raise RuntimeError('scrape failed')
+        return {'query': query}
+
+    supervisor.run = fake_run
+    streamed = []
+    summary = supervisor.run_many(['Maize seeds', 'maize  SEEDS', 'fertilizer', 'broken'],
+                                  concurrency=2, on_result=streamed.append)
+
+    assert sorted(calls) == ['Maize seeds', 'broken', 'fertilizer']
+    assert len(streamed) == 4
+    assert summary['unique_items'] == 3
+    assert summary['failed'] == 1
+    assert summary['results']['maize  SEEDS']['result'] == {'query': 'Maize seeds'}
+    assert summary['items_per_minute'] > 0
+
+def test_procurement_cache_reruns_only_expired_components(tmp_path):
+    from agents.supervisor import SupervisorAgent
+    from core.cache import CacheManager
+    from core.graph import create_procurement_graph
+    from core.models import PriceForecast, PricePoint
+    from core.procurement_cache import ProcurementCache
+
+    calls = []
+
+    def node(name, update):
+        def run(state):
+            calls.append(name)
+            return update
+        return run
+
+    cache = ProcurementCache(CacheManager(str(tmp_path / 'cache.sqlite3')))
+    supervisor = SupervisorAgent(result_cache=cache)
+    market = node('market', {'market_data': [PricePoint(seller='Acme Ltd', price_kes=100.0)]})
+    price = node('price', {'price_analysis': PriceForecast(current_price=100.0)})
+    compliance = node('compliance', {'compliance_checks': {}})
+    supervisor.app = create_procurement_graph(market, price, compliance)
+    supervisor.analysis_apps = {
+        nodes: create_procurement_graph(market, price, compliance, analysis_only=nodes)
+        for nodes in (('price',), ('compliance',), ('price', 'compliance'))
+    }
+
+    first = supervisor.run('HP laptop', 'electronics')
+    assert first['cache'] == {'market': 'miss', 'price': 'miss', 'compliance': 'miss'}
+    assert first['llm_usage']['calls'] == 0
+    assert {'node.market', 'node.price', 'node.compliance'} <= set(first['trace']['stages'])
+
+    calls.clear()
+    cache.cache.delete_sync(cache._key('price', 'hp  laptop', 'electronics'))
+    second = supervisor.run('hp  laptop', 'electronics')
+    assert calls == ['price']
+    assert second['cache'] == {'market': 'hit', 'price': 'miss', 'compliance': 'hit'}
+    assert second['market_data'][0]['price_kes'] == 100.0
+
+    calls.clear()
+    supervisor.run('hp laptop', 'electronics', fresh=True)
+    assert sorted(calls) == ['compliance', 'market', 'price']
+
+def test_partial_market_results_are_cached_briefly(tmp_path):
+    from agents.market_agent import SKIPPED_PREFIX
+    from agents.supervisor import SupervisorAgent
+    from core.cache import CacheManager
+    from core.graph import create_procurement_graph
+    from core.models import PriceForecast, PricePoint
+    from core.procurement_cache import ProcurementCache
+
+    errors = [f'{SKIPPED_PREFIX}kilimall: failing health checks']
+
+    def market(state):
+        return {'market_data': [PricePoint(seller='Acme Ltd', price_kes=100.0)], 'errors': list(errors)}
+
+    cache = ProcurementCache(CacheManager(str(tmp_path / 'cache.sqlite3')))
+    ttls = []
+    set_sync = cache.cache.set_sync
+    cache.cache.set_sync = lambda key, value, ttl=None: (ttls.append(ttl), set_sync(key, value, ttl))
+    supervisor = SupervisorAgent(result_cache=cache)
+    supervisor.app = create_procurement_graph(
+        market, lambda s: {'price_analysis': PriceForecast(current_price=100.0)}, lambda s: {'compliance_checks': {}}
+    )
+
+    supervisor.run('HP laptop', 'electronics')
+    assert ttls and max(ttls) == cache.partial_ttl
+
+    # A cache hit still reports the markets the cached run was missing
+    hit = supervisor.run('HP laptop', 'electronics')
+    assert hit['cache']['market'] == 'hit'
+    assert hit['errors'] == errors
+
+    ttls.clear()
+    errors.clear()
+    supervisor.run('HP laptop', 'electronics', fresh=True)
+    assert sorted(ttls) == sorted([*cache.ttls.values(), cache.ttls['market']])
+    assert supervisor.run('HP laptop', 'electronics')['errors'] == []
+
+def test_market_refresh_reuses_cached_seller_verdicts(tmp_path):
+    from agents.compliance_agent import ComplianceAuditorAgent
+    from agents.supervisor import SupervisorAgent
+    from core.cache import CacheManager
+    from core.graph import create_procurement_graph, node_state, state_update
+    from core.models import PriceForecast, PricePoint
+    from core.procurement_cache import ProcurementCache
+    from tools.verification_tool import SellerVerificationClient
+
+    sellers = ['Acme Ltd', 'Bora Traders']
+    verified = []
+    client = SellerVerificationClient()
+    client.cached_result = lambda seller_name, platform: None
+    verify_business = client.verify_business
+    client.verify_business = lambda seller_name: (verified.append(seller_name), verify_business(seller_name))[1]
+    agent = ComplianceAuditorAgent(client)
+
+    def market(state):
+        return {'market_data': [PricePoint(seller=seller, price_kes=100.0) for seller in sellers]}
+
+    def compliance(state):
+        return state_update(state, agent.run(node_state(state)), 'compliance_checks')
+
+    cache = ProcurementCache(CacheManager(str(tmp_path / 'cache.sqlite3')))
+    supervisor = SupervisorAgent(result_cache=cache)
+    supervisor.app = create_procurement_graph(
+        market, lambda s: {'price_analysis': PriceForecast(current_price=100.0)}, compliance
+    )
+
+    supervisor.run('HP laptop', 'electronics')
+    assert sorted(verified) == ['Acme Ltd', 'Bora Traders']
+
+    # Market data expires long before the verdicts: only the new seller is verified
+    verified.clear()
+    sellers.append('Chui Supplies')
+    cache.cache.delete_sync(cache._key('market', 'HP laptop', 'electronics'))
+    result = supervisor.run('HP laptop', 'electronics')
+    assert result['cache']['market'] == 'miss'
+    assert verified == ['Chui Supplies']
+    assert len(result['compliance_checks']) == 3
+
+def test_supervisor_threads_response_deadline_to_market_search(tmp_path, monkeypatch):
+    import agents.market_agent as market_module
+    from agents.market_agent import PENDING_PREFIX, MarketIntelligenceAgent
+    from agents.supervisor import SupervisorAgent
+    from core.cache import CacheManager
+    from core.graph import create_procurement_graph
+    from core.models import PriceForecast
+    from core.procurement_cache import ProcurementCache
+
+    deadlines = []
+
+    class StubScraper:
+        def search_all(self, query, platforms=None, preference='cheapest', deadline_ms=None):
+            deadlines.append(deadline_ms)
+            return {
+                'all_results': [{'platform': 'jumia', 'seller': 'Acme Ltd', 'price': 1500.0}],
+                'platform_stats': {'jumia': {'status': 'success'}, 'kilimall': {'status': 'pending'}},
+                'pending_platforms': ['kilimall'],
+            }
+
+    monkeypatch.setattr(market_module, '_agent', MarketIntelligenceAgent(scraper=StubScraper()))
+    supervisor = SupervisorAgent(result_cache=ProcurementCache(CacheManager(str(tmp_path / 'cache.sqlite3'))))
+    supervisor.app = create_procurement_graph(
+        market_module.market_agent,
+        lambda s: {'price_analysis': PriceForecast(current_price=1500.0)},
+        lambda s: {'compliance_checks': {}}
+    )
+
+    result = supervisor.run('maize', deadline_ms=250)
+    assert deadlines == [250]
+    assert result['collected_data']['deadline_ms'] == 250
+    assert f'{PENDING_PREFIX}kilimall: still searching at the deadline' in result['errors']
+
+    supervisor.deadline_ms = 400  # RESPONSE_DEADLINE_MS
+    supervisor.run('maize', fresh=True)
+    assert deadlines == [250, 400]
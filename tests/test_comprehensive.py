@@ -58,6 +58,26 @@ class TestSafetyGuardrails:
         result = SafetyGuardrails.sanitize_input(long_input)
         assert len(result) <= 10000
 
+    def test_sanitize_input_redacts_every_pattern_in_one_pass(self):
+        malicious = "javascript:void(0) <img onerror=eval(1)> select name from users; document.cookie"
+        result = SafetyGuardrails.sanitize_input(malicious)
+        for fragment in ("javascript:", "onerror=", "eval(", "select name from", "document.cookie"):
+            assert fragment not in result
+        assert SafetyGuardrails.sanitize_input("Samsung Galaxy A54 128GB") == "Samsung Galaxy A54 128GB"
+
+    def test_redact_sensitive_data_labels_each_type(self):
+        text = "Card 1234 5678 9012 3456, call 555-123-4567 or mail jane@example.co.ke"
+        result = SafetyGuardrails.redact_sensitive_data(text)
+        assert result == "Card [CREDIT_CARD_REDACTED], call [PHONE_NUMBER_REDACTED] or mail [EMAIL_REDACTED]"
+
+    def test_combined_patterns_fall_back_when_assumptions_break(self):
+        import re
+        from core.safety import _first_char_lookahead, _named_alternation
+        assert _first_char_lookahead([r'drop\s+table', r'[<>]script']) == ''
+        assert _first_char_lookahead([r'drop\s+table', r'x?eval']) == ''
+        pattern = re.compile(_named_alternation({'ip': r'\d+\.\d+\.\d+\.\d+', 'word': r'\bsecret\b'}, r'\b'))
+        assert pattern.search('from 10.0.0.1').lastgroup == 'ip'
+
 
 class TestOutputFilter:
     """Unit tests for output filtering."""
@@ -140,6 +160,53 @@ class TestCircuitBreaker:
         
         with pytest.raises(Exception, match="Circuit breaker OPEN"):
             cb.call(any_func)
+    
+    def test_half_open_admits_a_single_probe(self):
+        import threading
+        cb = CircuitBreaker(failure_threshold=1, timeout=0.05)
+        cb.record_failure()
+        assert not cb.allow_request()
+        time.sleep(0.06)
+        
+        admitted = []
+        threads = [threading.Thread(target=lambda: admitted.append(cb.allow_request())) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert admitted.count(True) == 1
+        assert cb.state == "HALF_OPEN"
+        cb.record_status(503)
+        assert cb.state == "OPEN"
+        time.sleep(0.06)
+        assert cb.allow_request()
+        cb.record_status(404)
+        assert cb.state == "CLOSED" and cb.failures == 0
+    
+    def test_open_circuit_fails_fast(self):
+        from core.exceptions import CircuitOpenError
+        cb = CircuitBreaker(failure_threshold=1, timeout=60, name="jumia.co.ke")
+        cb.record_failure()
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            with pytest.raises(CircuitOpenError) as exc:
+                cb.check()
+        assert (time.perf_counter() - start) / 1000 < 1e-4
+        assert exc.value.name == "jumia.co.ke"
+        assert 59 < exc.value.retry_after <= 60
+    
+    def test_registry_shares_one_breaker_per_host(self):
+        from core.resilience import CircuitBreakerRegistry
+        registry = CircuitBreakerRegistry(failure_threshold=2, timeout=60)
+        jumia = registry.for_url("https://www.jumia.co.ke/catalog/?q=maize")
+        
+        assert registry.for_url("https://jumia.co.ke/phones/") is jumia
+        assert registry.for_url("https://www.kilimall.co.ke/search") is not jumia
+        jumia.record_failure()
+        jumia.record_failure()
+        assert set(registry.open_circuits()) == {"jumia.co.ke"}
 
 
 class TestLoopGuard:
@@ -166,6 +233,206 @@ class TestLoopGuard:
 
 # ============= INTEGRATION TESTS =============
 
+class TestDeadline:
+    """Unit tests for deadline propagation."""
+    
+    def test_stop_at_deadline_without_upcoming_sleep(self):
+        from types import SimpleNamespace
+        from core.resilience import deadline, stop_at_deadline
+        
+        # tenacity < 8.4 has no RetryCallState.upcoming_sleep when stop is checked
+        def state(wait_seconds):
+            return SimpleNamespace(retry_object=SimpleNamespace(wait=lambda retry_state: wait_seconds))
+        
+        assert stop_at_deadline(state(10)) is False
+        with deadline(5):
+            assert stop_at_deadline(state(10)) is True
+            assert stop_at_deadline(state(1)) is False
+    
+    def test_world_scraper_retries_stop_at_deadline(self):
+        import requests
+        from core.exceptions import DeadlineExceeded
+        from core.resilience import deadline
+        from tools.world_scraper import retry_with_backoff
+        
+        @retry_with_backoff(max_retries=3, base_delay=1.0)
+        def flaky():
+            raise requests.ConnectionError("reset")
+        
+        start = time.time()
+        with deadline(0.5):
+            with pytest.raises(DeadlineExceeded):
+                flaky()
+        assert time.time() - start < 0.5
+    
+    def test_with_timeout_works_in_worker_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from core.exceptions import DeadlineExceeded
+        from core.resilience import with_timeout, deadline_sleep
+        
+        @with_timeout(seconds=0.2)
+        def slow_retries():
+            for _ in range(10):
+                deadline_sleep(0.05)
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(DeadlineExceeded):
+                executor.submit(slow_retries).result()
+        assert time.time() - start < 0.5
+    
+    def test_nested_deadline_keeps_the_earlier_one(self):
+        from core.resilience import deadline, remaining_time, request_timeout
+        
+        assert remaining_time() is None
+        assert request_timeout(15) == 15
+        with deadline(1):
+            with deadline(60):
+                assert remaining_time() <= 1
+                assert request_timeout(15) <= 1
+            assert remaining_time(0.5) == 0.5
+    
+    def test_search_all_returns_at_deadline(self):
+        from core.resilience import deadline
+        from tools.universal_scraper import UniversalEcommerceScraper
+        
+        scraper = UniversalEcommerceScraper()
+        scraper.search_jumia = lambda query: time.sleep(2) or []
+        scraper.search_kilimall = lambda query: []
+        
+        start = time.time()
+        with deadline(0.3):
+            results = scraper.search_all(f"deadline test {start}", ["jumia", "kilimall"])
+        
+        assert time.time() - start < 1
+        assert results["platform_stats"]["jumia"]["status"] == "pending"
+        assert results["platform_stats"]["kilimall"]["status"] == "success"
+    
+    def test_search_all_deadline_ms_returns_partial_results(self):
+        import threading
+        from tools.universal_scraper import UniversalEcommerceScraper
+        
+        finished = threading.Event()
+        
+        def slow_search(query):
+            time.sleep(0.4)
+            finished.set()
+            return []
+        
+        scraper = UniversalEcommerceScraper()
+        scraper.search_jumia = slow_search
+        scraper.search_kilimall = lambda query: []
+        
+        start = time.time()
+        results = scraper.search_all(f"partial test {start}", ["jumia", "kilimall"], deadline_ms=100)
+        
+        assert time.time() - start < 0.35
+        assert results["pending_platforms"] == ["jumia"]
+        assert results["platform_stats"]["kilimall"]["status"] == "success"
+        # The late search is not cancelled: it finishes (and caches) in the background
+        assert finished.wait(2)
+    
+    def test_world_search_all_marks_pending_markets(self, monkeypatch):
+        import streamlit
+        from tools.world_scraper import WorldScraper
+        
+        # Older streamlit attribute the scraper probes for UI feedback
+        monkeypatch.setattr(streamlit, "_is_running_with_streamlit", False, raising=False)
+        scraper = WorldScraper(use_cache=False)
+        scraper.search_market = lambda market, query, skipped=None: time.sleep(0.4) or [] if market == "Jumia" else []
+        
+        start = time.time()
+        assert scraper.search_all("maize seeds", ["Jumia", "Kilimall"], deadline_ms=100) == []
+        assert time.time() - start < 0.35
+        
+        results = scraper.search_with_stats("maize seeds", ["Jumia", "Kilimall"], deadline_ms=100)
+        assert results["products"] == []
+        assert results["platform_stats"]["Jumia"]["status"] == "pending"
+        assert results["platform_stats"]["Kilimall"]["status"] == "success"
+
+
+class TestHealthMonitor:
+    """Unit tests for concurrent, cached health checks and health-based routing."""
+    
+    def test_checks_run_concurrently_and_are_cached(self):
+        from core.resilience import HealthMonitor
+        monitor = HealthMonitor(check_timeout=1)
+        calls = []
+        
+        def probe(ok):
+            def check():
+                calls.append(ok)
+                time.sleep(0.2)
+                return ok
+            return check
+        
+        for i in range(4):
+            monitor.register_component(f"market{i}", probe(i != 3))
+        
+        start = time.time()
+        results = monitor.check_health()
+        assert time.time() - start < 0.6
+        assert [results[f"market{i}"]["status"] for i in range(4)] == ["healthy"] * 3 + ["unhealthy"]
+        assert monitor.is_healthy("market3") is False
+        assert monitor.is_healthy("unknown") is None
+        
+        monitor.check_health(max_age=60)
+        assert len(calls) == 4
+        assert monitor.summary()["status"] == "degraded"
+    
+    def test_slow_check_times_out(self):
+        from core.resilience import HealthMonitor
+        monitor = HealthMonitor(check_timeout=0.1)
+        monitor.register_component("slow", lambda: time.sleep(0.5) or True)
+        
+        result = monitor.check_health()["slow"]
+        assert result["status"] == "error" and "timed out" in result["error"]
+        assert result["latency_ms"] == 100.0
+    
+    def test_world_scraper_probes_every_market_host(self):
+        from core.resilience import HealthMonitor
+        from tools.world_scraper import WorldScraper
+        monitor = HealthMonitor()
+        WorldScraper(use_cache=False).register_health_probes(monitor)
+        assert set(monitor.component_status) == set(WorldScraper.MARKET_HOSTS.values())
+    
+    def test_scheduler_refreshes_in_background(self):
+        from core.resilience import HealthMonitor
+        monitor = HealthMonitor(check_timeout=1)
+        calls = []
+        monitor.register_component("jumia.co.ke", lambda: calls.append(1) or True)
+        
+        monitor.start(0.05)
+        time.sleep(0.2)
+        monitor.stop()
+        
+        assert len(calls) >= 2
+        assert monitor.is_healthy("jumia.co.ke") is True
+    
+    def test_search_all_skips_unhealthy_markets(self, monkeypatch):
+        from core.resilience import HealthMonitor
+        from tools import universal_scraper
+        
+        monitor = HealthMonitor(check_timeout=1)
+        monitor.register_component("jumia.co.ke", lambda: False)
+        monitor.check_health()
+        monkeypatch.setattr(universal_scraper, "health_monitor", monitor)
+        
+        scraper = universal_scraper.UniversalEcommerceScraper()
+        searched = []
+        scraper.search_jumia = lambda query: searched.append("jumia") or []
+        scraper.search_kilimall = lambda query: searched.append("kilimall") or []
+        
+        results = scraper.search_all(f"health test {time.time()}", ["jumia", "kilimall"])
+        assert searched == ["kilimall"]
+        assert results["platform_stats"]["jumia"] == {"count": 0, "status": "skipped", "reason": "unhealthy"}
+        
+        scraper.health_routing = "deprioritize"
+        searched.clear()
+        scraper.search_all(f"health test {time.time()}", ["jumia", "kilimall"])
+        assert sorted(searched) == ["jumia", "kilimall"]
+
+
 class TestAgentIntegration:
     """Integration tests for agent communication."""
     
@@ -267,6 +534,30 @@ class TestPerformance:
         
         duration = time.time() - start
         assert duration < 1.0  # Should complete in under 1 second
+
+    @pytest.mark.slow
+    def test_sanitization_long_input_benchmark(self):
+        import re
+        import time
+
+        long_input = ("Wholesale maize seeds 50kg bag, contact 555-123-4567 " * 200)[:10000]
+        n = 50
+
+        start = time.perf_counter()
+        for _ in range(n):
+            text = long_input
+            for pattern in SafetyGuardrails.DANGEROUS_PATTERNS:
+                text = re.sub(pattern, '[REDACTED]', text, flags=re.IGNORECASE)
+            for data_type, pattern in SafetyGuardrails.SENSITIVE_PATTERNS.items():
+                text = re.sub(pattern, f'[{data_type.upper()}_REDACTED]', text)
+        per_pattern = (time.perf_counter() - start) / n
+
+        start = time.perf_counter()
+        for _ in range(n):
+            SafetyGuardrails.redact_sensitive_data(SafetyGuardrails.sanitize_input(long_input))
+        combined = (time.perf_counter() - start) / n
+
+        assert combined < per_pattern
     
     def test_tax_calculation_performance(self):
         import time
@@ -279,6 +570,29 @@ class TestPerformance:
         duration = time.time() - start
         assert duration < 2.0  # Should complete in under 2 seconds
 
+    def test_graph_node_state_overhead(self):
+        import time
+        from core.graph import initial_state, node_state, state_update
+        from core.models import PricePoint
+
+        state = initial_state(query='maize seeds')
+        state['market_data'] = [
+            PricePoint(platform='Jumia', seller=f'seller{i}', price_kes=100.0 + i) for i in range(300)
+        ]
+
+        start = time.time()
+        for _ in range(100):
+            view = node_state(state)
+            view.errors.append('warning')
+            update = state_update(state, view, 'market_data')
+        duration = time.time() - start
+
+        # Model instances pass through without re-validation or copies
+        assert update['market_data'] is state['market_data']
+        assert update['errors'] == ['warning']
+        assert state['errors'] == []
+        assert duration < 0.1
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--cov=.", "--cov-report=html"])
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.cache import CacheManager
+from core.gemini_client import GeminiClient
+from core.llm_usage import llm_caller, usage_scope
+
+
+class StubUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel; echoes prompts and tracks concurrency."""
+
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self._lock:
+            self.calls.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            fail = self.failures > 0
+            self.failures -= fail
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise ConnectionError("transient")
+            return StubResponse(f"echo: {prompt}", StubUsage(len(prompt.split()), 2))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheManager(str(tmp_path / "llm.sqlite3"))
+
+
+def test_low_temperature_responses_are_cached(cache):
+    model = StubModel()
+    client = GeminiClient(model=model, cache=cache)
+
+    assert client.generate("price trend", temperature=0.2) == "echo: price trend"
+    assert client.generate("price trend", temperature=0.2) == "echo: price trend"
+    assert asyncio.run(client.generate_async("price trend", temperature=0.2)) == "echo: price trend"
+    assert len(model.calls) == 1
+
+    # Creative calls are never cached
+    client.generate("price trend", temperature=0.9)
+    client.generate("price trend", temperature=0.9)
+    assert len(model.calls) == 3
+
+
+def test_async_generate_keeps_cache_io_off_the_loop(cache):
+    threads = []
+    get_sync, set_sync = cache.get_sync, cache.set_sync
+    cache.get_sync = lambda key: (threads.append(threading.current_thread()), get_sync(key))[1]
+    cache.set_sync = lambda key, value, ttl=None: (threads.append(threading.current_thread()), set_sync(key, value, ttl))[1]
+    client = GeminiClient(model=StubModel(), cache=cache)
+
+    asyncio.run(client.generate_async("price trend", temperature=0.2))
+    asyncio.run(client.generate_async("price trend", temperature=0.2))
+    assert len(threads) == 3
+    assert threading.main_thread() not in threads
+
+
+def test_generate_retries_transient_errors(cache):
+    model = StubModel(failures=1)
+    client = GeminiClient(model=model, cache=cache)
+
+    assert client.generate("hello") == "echo: hello"
+    assert len(model.calls) == 2
+
+
+def test_generate_many_bounds_concurrency_and_dedupes(cache):
+    model = StubModel(delay=0.05)
+    client = GeminiClient(model=model, cache=cache, max_concurrency=3)
+    prompts = [f"item {i % 8}" for i in range(12)]
+
+    results = asyncio.run(client.generate_many(prompts, temperature=0.9))
+
+    assert results == [f"echo: {p}" for p in prompts]
+    assert len(model.calls) == 8
+    assert model.peak <= 3
+
+
+def test_usage_is_recorded_per_caller(cache):
+    model = StubModel(failures=1)
+    client = GeminiClient(model=model, cache=cache)
+
+    with usage_scope() as usage:
+        with llm_caller("price"):
+            client.generate("three word prompt", temperature=0.2)
+            client.generate("three word prompt", temperature=0.2)
+        client.generate("two words", temperature=0.9, caller="compliance")
+
+    summary = usage.summary()
+    assert summary["calls"] == 3
+    assert summary["cache_hits"] == 1
+    assert summary["retries"] == 1
+    assert summary["prompt_tokens"] == 3 + 2
+    assert summary["response_tokens"] == 2 + 2
+    assert summary["by_caller"]["price"]["calls"] == 2
+    assert summary["by_caller"]["price"]["cache_hits"] == 1
+    assert summary["by_caller"]["compliance"]["prompt_tokens"] == 2
+
+
+def test_usage_records_failures(cache):
+    model = StubModel(failures=5)
+    client = GeminiClient(model=model, cache=cache, max_attempts=2)
+
+    with usage_scope() as usage:
+        with pytest.raises(ConnectionError):
+            client.generate("hello", caller="market")
+
+    summary = usage.summary()
+    assert summary["errors"] == 1
+    assert summary["retries"] == 1
+    assert summary["by_caller"]["market"]["response_tokens"] == 0
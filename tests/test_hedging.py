@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from core.hedging import HedgeBudget, Hedger, LatencyTracker
+
+
+def warmed(hedger, host="jumia.co.ke", seconds=0.01, n=20):
+    for _ in range(n):
+        hedger.latency.record(host, seconds)
+    return hedger
+
+
+def slow(result, seconds=1.0):
+    def request():
+        time.sleep(seconds)
+        return result
+    return request
+
+
+def test_latency_tracker_p95_needs_min_samples():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for i in range(9):
+        tracker.record("kilimall.co.ke", i / 100)
+    assert tracker.p95("kilimall.co.ke") is None
+
+    for i in range(9, 100):
+        tracker.record("kilimall.co.ke", i / 100)
+    assert tracker.p95("kilimall.co.ke") == pytest.approx(0.94)
+    assert tracker.p95("jumia.co.ke") is None
+
+
+def test_hedge_budget_limits_extra_requests():
+    budget = HedgeBudget(ratio=0.1, burst=2)
+    granted = 0
+    for _ in range(100):
+        budget.deposit()
+        granted += budget.withdraw()
+    assert granted == 10
+
+    for _ in range(100):
+        budget.deposit()
+    assert budget.withdraw() and budget.withdraw() and not budget.withdraw()
+
+
+def test_backup_wins_when_primary_is_slow():
+    hedger = warmed(Hedger(enabled=True, budget_ratio=1.0, min_samples=20))
+
+    start = time.perf_counter()
+    assert hedger.call("jumia.co.ke", slow("primary"), lambda: "backup") == "backup"
+    assert time.perf_counter() - start < 0.5
+
+
+def test_failed_primary_falls_back_to_backup():
+    hedger = warmed(Hedger(enabled=True, budget_ratio=1.0, min_samples=20))
+
+    def failing():
+        time.sleep(0.05)
+        raise ConnectionError("reset")
+
+    assert hedger.call("jumia.co.ke", failing, slow("backup", 0.1)) == "backup"
+    with pytest.raises(ConnectionError):
+        hedger.call("jumia.co.ke", failing, failing)
+
+
+def test_no_hedge_without_budget_or_when_disabled():
+    backups = []
+
+    def backup():
+        backups.append(1)
+        return "backup"
+
+    no_budget = warmed(Hedger(enabled=True, budget_ratio=0.0, min_samples=20))
+    assert no_budget.call("jumia.co.ke", slow("primary", 0.1), backup) == "primary"
+
+    disabled = warmed(Hedger(enabled=False, min_samples=20))
+    assert disabled.call("jumia.co.ke", slow("primary", 0.1), backup) == "primary"
+    assert backups == []
+    assert disabled.latency.p95("jumia.co.ke") == pytest.approx(0.01)
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from core.logging import AgentLogger, LogPipeline, LogSampler, flush_logs, logger
+
+
+@pytest.fixture
+def bench_sink(tmp_path):
+    """Bound logger whose TRACE messages reach only a temp file sink"""
+    path = tmp_path / "bench.log"
+    handler_id = logger.add(
+        path, level="TRACE", format="{time} | {name}:{function}:{line} | {message}",
+        filter=lambda record: record["extra"].get("bench")
+    )
+    yield logger.bind(bench=True), path
+    logger.remove(handler_id)
+
+
+def entry(bound, message, level="TRACE", args=()):
+    return (bound, level, message, args, time.time(), __name__, "caller", 1)
+
+
+def test_pipeline_writes_in_order_with_caller_origin(bench_sink):
+    bound, path = bench_sink
+    pipeline = LogPipeline(maxsize=100)
+    for i in range(20):
+        pipeline.submit(entry(bound, f"message {i}"))
+    pipeline.flush()
+    pipeline.close()
+
+    lines = path.read_text().splitlines()
+    assert [line.rsplit("| ", 1)[1] for line in lines] == [f"message {i}" for i in range(20)]
+    assert all(f"{__name__}:caller:1" in line for line in lines)
+
+
+def test_pipeline_drops_low_levels_when_full(bench_sink, tmp_path):
+    bound, _ = bench_sink
+    slow_path = tmp_path / "slow.log"
+
+    def slow_sink(message):
+        time.sleep(0.02)
+        with open(slow_path, "a") as f:
+            f.write(message)
+
+    handler_id = logger.add(slow_sink, level="TRACE", filter=lambda r: r["extra"].get("bench"))
+    try:
+        pipeline = LogPipeline(maxsize=2, put_timeout=5)
+        for i in range(30):
+            pipeline.submit(entry(bound, f"noise {i}"))
+        pipeline.submit(entry(bound, "must keep", level="ERROR"))
+        pipeline.flush()
+        pipeline.close()
+    finally:
+        logger.remove(handler_id)
+
+    written = slow_path.read_text()
+    assert pipeline.dropped > 0
+    assert written.count("noise") == 30 - pipeline.dropped
+    assert "must keep" in written
+
+
+def test_pipeline_reports_emit_errors(bench_sink, capsys):
+    bound, path = bench_sink
+    pipeline = LogPipeline(maxsize=10)
+    pipeline.submit(entry(bound, "needs {} {} two arguments", args=("one",)))
+    pipeline.submit(entry(bound, "still written"))
+    pipeline.flush()
+    pipeline.close()
+
+    assert pipeline.errors == 1
+    assert "Log writer failed to emit a message (1 total)" in capsys.readouterr().err
+    assert "still written" in path.read_text()
+
+
+def test_sampler_thins_events_and_summarizes(tmp_path):
+    path = tmp_path / "sampled.log"
+    handler_id = logger.add(
+        path, level="DEBUG", format="{function} | {message}",
+        filter=lambda record: record["extra"].get("agent") == "sampler_test"
+    )
+    try:
+        log = AgentLogger("sampler_test")
+        sampler = LogSampler(
+            log, defaults={"cache_hit": 0.1, "muted": 0.0}, interval=3600,
+            rates={"sampler_test.cache_hit": 0.25, "other.cache_hit": 1.0}
+        )
+        for i in range(10):
+            sampler.info("cache_hit", "hit {}", i)
+            sampler.debug("muted", "never shown")
+            sampler.warning("fetch", "fetch {}", i)
+        sampler.summarize()
+        flush_logs()
+    finally:
+        logger.remove(handler_id)
+
+    lines = path.read_text().splitlines()
+    hits = [line for line in lines if line.endswith(("hit 0", "hit 4", "hit 8"))]
+    assert len([line for line in lines if " | hit " in line]) == 3 == len(hits)
+    assert all(line.startswith("test_sampler_thins_events_and_summarizes |") for line in hits)
+    assert len([line for line in lines if " | fetch " in line]) == 10
+    assert not any("never shown" in line for line in lines)
+    assert any("10 cache_hit events in last" in line and "(3 logged)" in line for line in lines)
+    assert any("10 muted events in last" in line and "(0 logged)" in line for line in lines)
+    assert not any("fetch events in last" in line for line in lines)
+
+
+def test_disabled_levels_skip_formatting():
+    class Exploding:
+        def __format__(self, spec):
+            raise AssertionError("formatted a disabled message")
+
+    assert not AgentLogger.is_enabled("TRACE")
+    AgentLogger("guard_test")._log("TRACE", "{}", (Exploding(),))
+
+
+@pytest.mark.slow
+def test_log_call_throughput_benchmark(bench_sink):
+    bound, _ = bench_sink
+    n = 5000
+
+    start = time.perf_counter()
+    for i in range(n):
+        bound.log("TRACE", f"sync {i}")
+    sync_rate = n / (time.perf_counter() - start)
+
+    pipeline = LogPipeline(maxsize=n * 2)
+    start = time.perf_counter()
+    for i in range(n):
+        pipeline.submit(entry(bound, f"async {i}"))
+    async_rate = n / (time.perf_counter() - start)
+    pipeline.flush()
+    pipeline.close()
+
+    assert async_rate > sync_rate
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from core.monitoring import MetricsCollector, MetricsRegistry, start_metrics_server
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector(MetricsRegistry())
+
+
+def test_counters_merge_thread_shards(metrics):
+    def work():
+        for _ in range(10000):
+            metrics.increment("requests")
+            metrics.increment("requests", 2, tags={"market": "jumia"})
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert metrics.get_counter("requests", tags={}) == 40000
+    assert metrics.get_counter("requests", tags={"market": "jumia"}) == 80000
+    assert metrics.get_counter("requests") == 120000
+    assert metrics.get_counter("missing") == 0
+
+
+def test_exited_thread_shards_are_retired(metrics):
+    def work():
+        metrics.increment("requests")
+        metrics.histogram("latency_ms", 3)
+
+    for _ in range(50):
+        t = threading.Thread(target=work)
+        t.start()
+        t.join()
+    metrics.increment("requests")
+
+    assert len(metrics.registry._shards) <= 2
+    assert metrics.get_counter("requests") == 51
+    assert metrics.get_histogram("latency_ms")["count"] == 50
+    assert metrics.get_histogram("latency_ms")["sum"] == 150
+
+
+def test_histogram_buckets_and_gauges(metrics):
+    for value in (0.5, 3, 3, 40, 99999):
+        metrics.histogram("latency_ms", value)
+    metrics.gauge("trust", 0.8, tags={"seller": "acme"})
+    metrics.gauge("trust", 0.6, tags={"seller": "acme"})
+
+    hist = metrics.get_histogram("latency_ms")
+    buckets = dict(hist["buckets"])
+    assert hist["count"] == 5
+    assert hist["sum"] == pytest.approx(100045.5)
+    assert buckets[1.0] == 1
+    assert buckets[5.0] == 3
+    assert buckets[50.0] == 4
+    assert buckets[float("inf")] == 5
+    assert metrics.get_gauge("trust", tags={"seller": "acme"}) == 0.6
+
+
+def test_prometheus_exposition(metrics):
+    metrics.increment("google_shopping.requests_success", tags={"region": 'ke "east"'})
+    metrics.histogram("graph.node_ms", 12, tags={"node": "market"}, buckets=(10, 100))
+    metrics.gauge("queue.depth", 7)
+
+    text = metrics.to_prometheus()
+    assert "# TYPE google_shopping_requests_success counter" in text
+    assert 'google_shopping_requests_success_total{region="ke \\"east\\""} 1' in text
+    assert 'graph_node_ms_bucket{node="market",le="10"} 0' in text
+    assert 'graph_node_ms_bucket{node="market",le="+Inf"} 1' in text
+    assert 'graph_node_ms_count{node="market"} 1' in text
+    assert "queue_depth 7" in text
+
+
+def test_metrics_server_serves_registry(metrics):
+    metrics.increment("served")
+    server = start_metrics_server(0, host="127.0.0.1", registry=metrics.registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+        assert "served_total 1" in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_health_endpoint_serves_summary(metrics):
+    server = start_metrics_server(
+        0, host="127.0.0.1", registry=metrics.registry,
+        health=lambda: {"status": "degraded", "components": {"jumia.co.ke": {"status": "unhealthy"}}}
+    )
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/health"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = json.loads(response.read().decode())
+        assert body["status"] == "degraded"
+        assert body["components"]["jumia.co.ke"]["status"] == "unhealthy"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.slow
+def test_increment_overhead_benchmark(metrics):
+    n = 200000
+    start = time.perf_counter()
+    for _ in range(n):
+        metrics.increment("hot.path")
+    per_call = (time.perf_counter() - start) / n
+
+    assert metrics.get_counter("hot.path") == n
+    assert per_call < 1e-6
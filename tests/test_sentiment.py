@@ -0,0 +1,267 @@
+"""
+Tests for review analysis: caching, seller aggregates and duplicate detection.
+"""
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache import CacheManager
+from tools.review_dedup import NearDuplicateIndex
+from tools.sentiment_tool import (
+    AnalysisEngine, LegacyReviewAnalyzer, ReviewAnalyzer, ReviewAnalysis, review_digest
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheManager(str(tmp_path / "cache.sqlite3"))
+
+
+@pytest.fixture
+def analyzer(cache):
+    return ReviewAnalyzer(cache_manager=cache, use_ml=False, duplicate_index=NearDuplicateIndex())
+
+
+class TestReviewAnalysisCache:
+    """Content-addressed, persistent review analysis cache."""
+
+    def test_digest_is_stable_and_normalized(self):
+        assert review_digest("Genuine  product\n") == review_digest("Genuine product")
+        assert review_digest("Genuine product") != review_digest("Fake product")
+
+    def test_record_round_trip(self, analyzer):
+        analysis = asyncio.run(analyzer.analyze_review("Original phone, fast delivery!"))
+        rebuilt = ReviewAnalysis.from_record(analysis.to_record())
+        assert rebuilt == analysis
+
+    def test_cache_survives_new_analyzer(self, cache, analyzer):
+        text = "Fake product, stopped working after a week. Waste of money"
+        first = asyncio.run(analyzer.analyze_review(text))
+
+        fresh = ReviewAnalyzer(cache_manager=cache, use_ml=False, duplicate_index=NearDuplicateIndex())
+        assert cache.get_sync(fresh.cache_key(text)) is not None
+
+        fresh.detector.extract_features = None  # any model work would now fail
+        second = asyncio.run(fresh.analyze_review(text))
+        assert second.to_dict() == first.to_dict()
+
+    def test_async_cache_calls_leave_loop_free(self, cache):
+        import threading
+
+        async def scenario():
+            ticks = []
+
+            async def ticker():
+                for _ in range(10):
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            held = threading.Event()
+
+            def hold_lock():
+                with cache._lock:  # a slow writer on another thread
+                    held.set()
+                    threading.Event().wait(0.2)
+
+            threading.Thread(target=hold_lock).start()
+            held.wait()
+            tick_task = asyncio.create_task(ticker())
+            await cache.set("k", {"v": 1})
+            during = len(ticks)
+            await tick_task
+            return during, await cache.get("k")
+
+        during, value = asyncio.run(scenario())
+        assert during >= 5
+        assert value == {"v": 1}
+
+
+class TestAnalysisEngine:
+    """CPU-bound analysis runs on an executor, not on the event loop."""
+
+    def test_event_loop_stays_responsive(self, analyzer):
+        import threading
+        import time
+
+        loop_threads = set()
+        original = analyzer.detector.extract_features
+
+        def slow_extract(text):
+            loop_threads.add(threading.current_thread().name)
+            time.sleep(0.05)
+            return original(text)
+
+        analyzer.detector.extract_features = slow_extract
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+
+            task = asyncio.create_task(ticker())
+            await asyncio.gather(*[analyzer.analyze_review(f"review {i} is fine") for i in range(4)])
+            task.cancel()
+            return ticks
+
+        assert asyncio.run(scenario()) > 5
+        assert all(name.startswith("review-analysis") for name in loop_threads)
+
+    def test_sync_api_works_inside_running_loop(self, cache):
+        legacy = LegacyReviewAnalyzer(cache_manager=cache, use_ml=False, duplicate_index=NearDuplicateIndex())
+
+        async def from_coroutine():
+            return legacy.analyze_seller_reviews(["Genuine and original", "Fake copy", "As described"])
+
+        result = asyncio.run(from_coroutine())
+        assert set(result) == {'trust_score', 'fake_review_percentage', 'recommendation'}
+        assert legacy.analyze_review("Genuine and original")['is_fake_suspicious'] is False
+
+    def test_invalid_mode_rejected(self, analyzer):
+        with pytest.raises(ValueError):
+            AnalysisEngine(analyzer.detector, mode="gpu")
+
+
+REVIEWS = [
+    "Genuine Samsung, original with receipt. Works perfectly",
+    "Fake! Not original, stopped working after two days",
+    "Fast delivery and good packaging, as described",
+    "Poor quality, cheap material. Waste of money",
+    "Genuine Samsung, original with receipt. Works perfectly",
+]
+
+
+class TestIncrementalSellerReports:
+    """Persistent per-seller aggregates that only fold in new reviews."""
+
+    def test_only_new_reviews_are_analyzed(self, analyzer):
+        calls = []
+        original = analyzer._analyze_review
+
+        async def counting(text, review_id=None, seller_id=None):
+            calls.append(text)
+            return await original(text, review_id, seller_id)
+
+        analyzer._analyze_review = counting
+        asyncio.run(analyzer.analyze_seller_reviews(REVIEWS[:3], seller_id="s1"))
+        assert len(calls) == 3
+
+        calls.clear()
+        report = asyncio.run(analyzer.analyze_seller_reviews(REVIEWS, seller_id="s1"))
+        assert calls == REVIEWS[3:]
+        assert report.total_reviews == len(REVIEWS)
+
+    def test_seller_locks_work_across_event_loops(self, analyzer):
+        async def contended(reviews):
+            return await asyncio.gather(*[
+                analyzer.analyze_seller_reviews(reviews, seller_id="s3") for _ in range(2)
+            ])
+
+        asyncio.run(contended(REVIEWS[:2]))
+        reports = asyncio.run(contended(REVIEWS))
+        assert all(report.total_reviews == len(REVIEWS) for report in reports)
+
+    def test_seller_state_is_not_lost_across_threads(self, analyzer, monkeypatch):
+        load = analyzer.load_seller_aggregate
+
+        async def slow_load(seller_id):
+            aggregate = await load(seller_id)
+            await asyncio.sleep(0.05)  # widen the load -> save window
+            return aggregate
+
+        monkeypatch.setattr(analyzer, "load_seller_aggregate", slow_load)
+        threads = [
+            threading.Thread(target=lambda part=part: asyncio.run(analyzer.analyze_seller_reviews(part, seller_id="s4")))
+            for part in (REVIEWS[:2], REVIEWS[2:4])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert asyncio.run(load("s4")).total == 4
+
+    def test_seen_digests_are_capped(self, analyzer, monkeypatch):
+        from tools.sentiment_tool import SellerAggregate
+
+        monkeypatch.setattr(SellerAggregate, "MAX_SEEN", 3)
+        asyncio.run(analyzer.analyze_seller_reviews(REVIEWS[:4], seller_id="s5"))
+        aggregate = asyncio.run(analyzer.load_seller_aggregate("s5"))
+        assert aggregate.total == 4
+        assert len(aggregate.seen) == 3
+
+    def test_incremental_matches_full_recompute(self, cache, analyzer):
+        asyncio.run(analyzer.analyze_seller_reviews(REVIEWS[:2], seller_id="s2"))
+        incremental = asyncio.run(analyzer.analyze_seller_reviews(REVIEWS, seller_id="s2"))
+        other = ReviewAnalyzer(cache_manager=cache, use_ml=False, duplicate_index=NearDuplicateIndex())
+        full = asyncio.run(other.analyze_seller_reviews(REVIEWS))
+
+        inc, ref = incremental.to_dict(), full.to_dict()
+        for report in (inc, ref):
+            report.pop('analyzed_at')
+            report.pop('seller_id')
+        assert inc == ref
+
+
+class TestNearDuplicateIndex:
+    """MinHash/LSH detection of review text reused across sellers."""
+
+    FARM_REVIEW = "Excellent product!!! Original and genuine, fast delivery, highly recommend this seller to everyone"
+
+    def test_near_duplicates_are_found(self):
+        index = NearDuplicateIndex()
+        index.add("a", self.FARM_REVIEW, seller_id="shop-a")
+        match = index.add("b", self.FARM_REVIEW.replace("everyone", "everyone!"), seller_id="shop-b")
+        assert match.matches == ["a"]
+        assert match.other_sellers == {"shop-a"}
+
+        unrelated = index.query("Battery died in a week and the charger was missing from the box")
+        assert unrelated.matches == []
+
+    def test_original_seller_is_flagged_once_copied(self, analyzer):
+        own = ["Battery died in a week", "Charger missing from the box", self.FARM_REVIEW]
+        first = asyncio.run(analyzer.analyze_seller_reviews(own, seller_id="shop-a"))
+        assert "near_duplicate_review_cluster" not in first.risk_factors
+
+        copied = [self.FARM_REVIEW.replace("everyone", "everyone!")]
+        copier = asyncio.run(analyzer.analyze_seller_reviews(copied, seller_id="shop-b"))
+        assert "near_duplicate_review_cluster" in copier.risk_factors
+
+        again = asyncio.run(analyzer.analyze_seller_reviews(own, seller_id="shop-a"))
+        assert "near_duplicate_review_cluster" in again.risk_factors
+
+    def test_index_is_memory_bounded_and_persists(self, tmp_path):
+        path = str(tmp_path / "index.npz")
+        index = NearDuplicateIndex(max_entries=3, path=path)
+        for i in range(5):
+            index.add(f"doc{i}", f"review number {i} " * 5, seller_id=f"s{i}")
+        assert len(index) == 3
+        assert index.indexed([f"doc{i}" for i in range(5)]) == ["doc2", "doc3", "doc4"]
+        index.save()
+
+        loaded = NearDuplicateIndex.load(path, max_entries=3)
+        assert len(loaded) == 3
+        assert loaded.query("review number 4 " * 5).matches == ["doc4"]
+
+    def test_cross_seller_duplicates_lower_authenticity(self, analyzer):
+        text = "Nice phone, arrived on time and the battery lasts all day"
+        original = asyncio.run(analyzer.analyze_review(text, seller_id="shop-a"))
+        copy = asyncio.run(analyzer.analyze_review(text, seller_id="shop-b"))
+
+        assert original.duplicate_sellers == 0
+        assert copy.duplicate_sellers == 1
+        assert copy.authenticity_score < original.authenticity_score
+        assert "near_duplicate_across_sellers" in copy.fake_indicators
+
+    def test_duplicate_cluster_reported_as_seller_risk(self, analyzer):
+        farm = [f"{self.FARM_REVIEW} {suffix}" for suffix in ("", ".", "!!", " :)")]
+        asyncio.run(analyzer.analyze_seller_reviews(farm, seller_id="shop-a"))
+        report = asyncio.run(analyzer.analyze_seller_reviews(farm, seller_id="shop-b"))
+        assert "near_duplicate_review_cluster" in report.risk_factors
@@ -1,4 +1,6 @@
-﻿def test_safety():
+﻿import pytest
+
+def test_safety():
     from core.safety import SafetyGuardrails
     assert SafetyGuardrails.validate_price(1000) == True
     assert SafetyGuardrails.validate_price(-100) == False
@@ -7,3 +9,247 @@ def test_tax():
     from tools.tax_tool import calculate_tax
     result = calculate_tax(100000, 'electronics')
     assert result['total_tax'] > 0
+
+def test_review_inference_backend_selection():
+    import pytest
+    from tools.review_inference import create_backend, InferenceBackend
+
+    with pytest.raises(ValueError):
+        create_backend("tensorrt")
+
+    class StubBackend(InferenceBackend):
+        name = "stub"
+
+        def predict(self, texts):
+            return [{"label": "POSITIVE", "score": 0.9} for _ in texts]
+
+    backend = StubBackend("tiny-model")
+    assert backend("great phone") == [{"label": "POSITIVE", "score": 0.9}]
+    assert backend.signature == "stub:tiny-model"
+
+def test_rate_limiter_is_thread_safe():
+    import time
+    import threading
+    from tools.universal_scraper import RateLimiter
+
+    limiter = RateLimiter(max_requests=5, window=0.3)
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(10)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # The second batch of five has to wait for the window to roll over
+    assert time.time() - start >= 0.25
+    assert len(limiter.requests) == 10
+
+def test_concurrent_searches_share_one_fetch():
+    import time
+    import threading
+    from tools.universal_scraper import UniversalEcommerceScraper
+
+    scraper = UniversalEcommerceScraper()
+    calls = []
+
+    def slow_search(query):
+        calls.append(query)
+        time.sleep(0.2)
+        return ['result']
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda q=q: results.append(scraper._search_shared('jumia', slow_search, q)))
+        for q in ['Maize Seeds', 'maize seeds', 'maize  seeds']
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [['result']] * 3
+
+def test_search_all_reports_markets_behind_open_circuit():
+    import time
+    from core.resilience import breaker_for_url
+    from tools.universal_scraper import UniversalEcommerceScraper
+
+    breaker = breaker_for_url('https://www.jumia.co.ke/')
+    breaker.state, breaker.last_failure_time = 'OPEN', time.time()
+    try:
+        results = UniversalEcommerceScraper().search_all(f'circuit test {time.time()}', ['jumia'])
+    finally:
+        breaker.record_success()
+
+    assert results['skipped_platforms'] == ['jumia']
+    assert results['platform_stats']['jumia']['reason'] == 'circuit_open'
+    assert results['platform_stats']['jumia']['retry_after'] > 0
+
+def test_seller_verification_is_memoized():
+    from tools.verification_tool import SellerVerificationClient, verify_seller
+
+    client = SellerVerificationClient()
+    first = verify_seller('Acme Trading', 'jumia', client=client)
+    client.verify_business = None  # would raise if called again
+    assert verify_seller('acme trading ', 'Jumia', client=client) == first
+
+def test_forecaster_serves_cached_fit_per_data_version():
+    from datetime import datetime, timedelta
+    from tools.forecast_tool import PriceForecaster
+
+    forecaster = PriceForecaster(mode='thread', workers=1)
+    start = datetime(2024, 1, 1)
+    forecaster.record('HP Laptop 15"', [(start + timedelta(days=d), 50000 - 100 * d) for d in range(20)])
+
+    # Not enough history for a fit yet -> heuristic; otherwise wait for the background fit
+    assert forecaster.forecast('unknown item', 1000)['method'] == 'heuristic'
+    fitted = forecaster.forecast('hp laptop 15', 48000, wait=True)
+    assert fitted['method'] in ('linear', 'prophet')
+    assert fitted['stale'] is False
+    assert fitted['trend'] == 'down'
+    assert abs(fitted['predicted_7d'] - (50000 - 100 * 26)) < 50
+
+    # New data bumps the version; until the refit lands the previous fit is served
+    forecaster.record('hp laptop 15', [(start + timedelta(days=21), 47900)])
+    assert forecaster.version('HP laptop 15') == 2
+    assert forecaster.forecast('hp laptop 15', 47900, wait=True)['version'] == 2
+    forecaster.shutdown()
+
+def test_forecast_wait_does_not_depend_on_the_done_callback():
+    from datetime import datetime, timedelta
+    from tools.forecast_tool import PriceForecaster
+
+    forecaster = PriceForecaster(mode='thread', workers=1)
+    forecaster._store = lambda key, version, future: None  # callback that has not run yet
+    start = datetime(2024, 1, 1)
+    forecaster.record('desk', [(start + timedelta(days=d), 9000 + 10 * d) for d in range(20)])
+
+    fitted = forecaster.forecast('desk', 9200, wait=True)
+    assert fitted['stale'] is False
+    assert forecaster.forecast('desk', 9200)['stale'] is False
+    forecaster.shutdown()
+
+def test_repeated_price_runs_fit_once(monkeypatch):
+    from datetime import datetime, timedelta
+    from agents.price_agent import PriceStrategistAgent
+    from core.models import PricePoint, SystemState
+    from tools import forecast_tool
+
+    fits = []
+    real_fit = forecast_tool.fit_forecast
+
+    def counting_fit(timestamps, prices):
+        fits.append(len(prices))
+        return real_fit(timestamps, prices)
+
+    monkeypatch.setattr(forecast_tool, 'fit_forecast', counting_fit)
+    forecaster = forecast_tool.PriceForecaster(mode='thread', workers=1)
+    start = datetime(2024, 1, 1)
+    forecaster.record('office chair', [(start + timedelta(days=d), 9000 - 10 * d) for d in range(10)])
+
+    observed_at = start + timedelta(days=10)
+    market_data = [PricePoint(platform='Jumia', seller='Acme', price_kes=8900.0, timestamp=observed_at)]
+    agent = PriceStrategistAgent(forecaster)
+    for _ in range(2):
+        agent.run(SystemState(query='Office Chair', market_data=list(market_data)))
+        forecaster.forecast('office chair', 8900.0, wait=True)
+
+    assert fits == [11]
+    assert forecaster.version('office chair') == 2
+    assert len(forecaster.history('office chair')) == 11
+    forecaster.shutdown()
+
+def test_price_history_store_partitions_and_downsamples(tmp_path):
+    from datetime import datetime, timedelta
+    from core.price_history import PriceHistoryStore, PriceRecord
+    from tools.forecast_tool import PriceForecaster
+
+    store = PriceHistoryStore(str(tmp_path / 'history.sqlite3'), flush_interval=0.05)
+    # Ten days straddling the start of last month
+    boundary = (datetime.now().replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start = boundary - timedelta(days=7)
+    records = [
+        PriceRecord.create('HP Laptop', market, 1000.0 + d, ts=start + timedelta(days=d, hours=h), seller='Acme')
+        for d in range(10) for h in (1, 13) for market in ('Jumia', 'Kilimall')
+    ]
+    # append counts every queued record; the re-appended cached results are dropped on write (40 stored)
+    assert store.append(records + records[:5]) == 45
+    store.flush()
+
+    assert store._months(start.timestamp(), (start + timedelta(days=9)).timestamp()) == [
+        start.strftime('%Y%m'), boundary.strftime('%Y%m')
+    ]
+    assert len(store.query('hp laptop')) == 40
+    jumia = store.query('HP laptop', marketplace='jumia', start=boundary)
+    assert len(jumia) == 3 * 2 and all(row[1] == 'jumia' for row in jumia)
+
+    daily = store.downsample('hp laptop', bucket_seconds=86400)
+    assert len(daily) in (10, 11)  # bucket edges are UTC days
+    assert sum(row[4] for row in daily) == 40
+
+    forecaster = PriceForecaster(mode='thread', history_store=store)
+    # Seeded from the store on first use, then fitted on the daily means
+    assert forecaster.forecast('HP laptop', 1005.0, wait=True)['method'] == 'linear'
+    assert len(forecaster.history('hp laptop')) == len(daily)
+    store.close()
+    forecaster.shutdown()
+
+def test_batch_forecast_picks_up_weekday_deals():
+    import time
+    from datetime import datetime
+    from tools.forecast_tool import PriceForecaster
+
+    forecaster = PriceForecaster(mode='thread', workers=1)
+    now = time.time()
+    for product, slope in (('maize seeds', -2.0), ('office chair', 3.0)):
+        history = []
+        for d in range(60, 0, -1):
+            ts = now - d * 86400
+            friday = datetime.utcfromtimestamp(ts).weekday() == 4
+            history.append((datetime.fromtimestamp(ts), 1000 + slope * (60 - d) - (80 if friday else 0)))
+        forecaster.record(product, history)
+    forecaster.record('single observation', [(datetime.now(), 500.0)])
+
+    results = forecaster.refresh_all(prophet_top=0)
+    assert set(results) == {'maize seeds', 'office chair'}
+    assert results['maize seeds']['trend'] == 'down'
+    assert results['office chair']['trend'] == 'up'
+    assert results['office chair']['best_buy_date'].weekday() == 4
+    assert forecaster.forecast('Office chair', 1100)['method'] == 'batch_linear'
+    forecaster.shutdown()
+
+def test_batch_forecast_skips_series_thin_inside_window():
+    import time
+    from datetime import datetime
+    from tools.forecast_tool import PriceForecaster
+
+    forecaster = PriceForecaster(mode='thread', workers=1)
+    now = time.time()
+    old = [(datetime.fromtimestamp(now - (200 + d) * 86400), 1200.0) for d in range(30)]
+    forecaster.record('desk lamp', old + [(datetime.fromtimestamp(now - 86400), 1200.0)])
+
+    assert forecaster.refresh_all(window_days=90, prophet_top=0) == {}
+    fitted = forecaster.forecast('desk lamp', 1200.0, wait=True)
+    assert fitted['method'] == 'linear'
+    assert fitted['predicted_7d'] > 0
+    forecaster.shutdown()
+
+@pytest.mark.slow
+def test_batch_forecast_benchmark_10k_series():
+    import time
+    import numpy as np
+    from tools.forecast_tool import batch_fit
+
+    rng = np.random.default_rng(7)
+    days, series = 90, 10000
+    t = np.arange(days)
+    values = 1000 + rng.normal(0, 1, series) * t[:, None] + rng.normal(0, 10, (days, series))
+    observed = rng.random((days, series)) > 0.3
+
+    start = time.perf_counter()
+    predictions, spread = batch_fit(values, observed, last_weekday=2)
+    elapsed = time.perf_counter() - start
+
+    assert predictions.shape == (30, series) and spread.shape == (series,)
+    assert elapsed < 2.0
@@ -0,0 +1,73 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from core.tracing import current_trace_id, span, start_trace, submit_in_context, to_otlp, traced
+
+
+@traced("work.leaf")
+def leaf():
+    return current_trace_id()
+
+
+def test_spans_nest_and_follow_work_into_executors(trace_file):
+    with start_trace("procurement", query="laptop") as trace:
+        with span("node.market"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                ids = [f.result() for f in [submit_in_context(executor, leaf) for _ in range(3)]]
+
+    spans = {s.name: s for s in trace.collected()}
+    assert ids == [trace.trace_id] * 3
+    assert spans["procurement"].parent_id is None
+    assert spans["node.market"].parent_id == spans["procurement"].span_id
+    assert spans["work.leaf"].parent_id == spans["node.market"].span_id
+
+    summary = trace.summary()
+    assert summary["stages"]["work.leaf"]["count"] == 3
+    assert summary["total_ms"] >= summary["stages"]["node.market"]["total_ms"]
+
+    lines = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert len(lines) == 5
+    assert {line["trace_id"] for line in lines} == {trace.trace_id}
+
+
+def test_span_is_noop_outside_trace_and_records_errors():
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert current_trace_id() is None
+
+    try:
+        with start_trace("run") as trace:
+            with span("fetch", platform="jumia"):
+                raise ConnectionError("reset")
+    except ConnectionError:
+        pass
+
+    fetch = next(s for s in trace.collected() if s.name == "fetch")
+    assert fetch.status == "error"
+    assert trace.summary()["stages"]["fetch"]["errors"] == 1
+
+    payload = to_otlp(trace.collected())
+    otlp_spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    otlp_fetch = next(s for s in otlp_spans if s["name"] == "fetch")
+    assert otlp_fetch["status"]["code"] == 2
+    assert otlp_fetch["attributes"] == [{"key": "platform", "value": {"stringValue": "jumia"}}]
+    assert len(otlp_fetch["traceId"]) == 32 and len(otlp_fetch["spanId"]) == 16
+
+
+def test_trace_file_is_sampled_and_rotated(trace_file, monkeypatch):
+    monkeypatch.setenv("TRACE_SAMPLE_RATE", "0")
+    with start_trace("dropped"):
+        pass
+    assert not trace_file.exists()
+
+    monkeypatch.setenv("TRACE_SAMPLE_RATE", "1")
+    monkeypatch.setenv("TRACE_FILE_MAX_MB", str(2000 / 1024 / 1024))
+    monkeypatch.setenv("TRACE_FILE_BACKUPS", "2")
+    for _ in range(30):
+        with start_trace("run", query="laptop"):
+            with span("node.market"):
+                pass
+
+    rotated = sorted(p.name for p in trace_file.parent.glob(trace_file.name + "*"))
+    assert rotated == [trace_file.name, trace_file.name + ".1", trace_file.name + ".2"]
+    assert all(p.stat().st_size <= 2000 for p in trace_file.parent.glob(trace_file.name + "*"))
@@ -42,12 +42,23 @@ except:
         pass
 
 try:
-    from core.exceptions import ExternalServiceError, ConfigurationError
+    from core.exceptions import ExternalServiceError, ConfigurationError, CircuitOpenError
 except:
     class ExternalServiceError(Exception):
         pass
     class ConfigurationError(Exception):
         pass
+    class CircuitOpenError(ExternalServiceError):
+        retry_after = 0.0
+
+try:
+    from core.resilience import breaker_for_url, request_timeout, stop_at_deadline
+except:
+    breaker_for_url = None
+    def request_timeout(default, what="request"):
+        return default
+    def stop_at_deadline(retry_state):
+        return False
 
 try:
     from core.cache import CacheManager
@@ -139,18 +150,25 @@ class AmazonScraper:
         }
     
     @retry(
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_at_deadline,
         wait=wait_exponential(multiplier=1, min=2, max=10),
         retry=retry_if_exception_type((httpx.RequestError, TimeoutError)),
         before_sleep=before_sleep_log(logger, logging.WARN)
     )
     async def _fetch_page(self, url: str) -> str:
-        """Fetch page with retries"""
+        """Fetch page with retries; an open circuit for the host fails fast and is not retried"""
+        breaker = breaker_for_url(url) if breaker_for_url else None
+        if breaker:
+            breaker.check("amazon")
         try:
-            response = await self.session.get(url)
+            response = await self.session.get(url, timeout=request_timeout(30.0, "fetching amazon"))
+            if breaker:
+                breaker.record_status(response.status_code)
             response.raise_for_status()
             return response.text
         except httpx.RequestError as e:
+            if breaker:
+                breaker.record_failure(e)
             logger.error("request_error", url=url, error=str(e))
             raise ExternalServiceError(f"Failed to fetch {url}: {e}")
     
@@ -397,6 +415,9 @@ async def search_amazon_products(
         async with AmazonScraper() as scraper:
             products = await scraper.search_amazon(query, region_enum, max_results)
             return [p.to_dict() for p in products]
+    except CircuitOpenError:
+        # Let callers report Amazon as skipped rather than as an empty result
+        raise
     except Exception as e:
         logger.error("search_error", query=query, error=str(e))
         return []
@@ -0,0 +1,427 @@
+"""
+Price forecasting subsystem.
+
+Price history is kept per normalized product name; every batch of new
+observations bumps the product's data version. Models are fitted lazily on a
+background pool (a process pool by default, so Prophet never loads on the
+request path) and the resulting forecast is cached by (product, data version).
+Requests are always answered from cache: the forecast for the current
+version if it is ready, otherwise the last fitted one, otherwise a heuristic.
+
+For nightly refreshes over thousands of products, ``refresh_all`` fits a
+linear trend plus weekday effects to every series at once in NumPy and only
+sends the most-observed products to Prophet.
+"""
+import importlib.util
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import Settings
+from core.logging import get_logger
+from core.price_history import PriceHistoryStore, get_price_history, normalize_product
+
+logger = get_logger('forecast_tool')
+
+HORIZON_DAYS = 30
+PROPHET_MIN_POINTS = 30
+LINEAR_MIN_POINTS = 3
+# Extrapolating days ahead from minutes of history is noise; wait for a day
+MIN_SPAN_SECONDS = 86400
+# How much stored history seeds a product's series the first time it is seen
+HYDRATE_DAYS = 365
+
+
+def heuristic_forecast(current_price: float, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Rule-of-thumb forecast used until a model is fitted: prices dip into Friday deals"""
+    now = now or datetime.now()
+    return {
+        'method': 'heuristic',
+        'predicted_7d': current_price * 0.95,
+        'predicted_30d': current_price * 0.90,
+        'lower': current_price * 0.9,
+        'upper': current_price * 1.1,
+        'trend': 'down',
+        'best_buy_date': now + timedelta(days=(4 - now.weekday()) % 7),
+        'savings_potential': current_price * 0.12,
+    }
+
+
+def _fit_linear(t_days: np.ndarray, prices: np.ndarray) -> Tuple[np.ndarray, float]:
+    slope, intercept = np.polyfit(t_days, prices, 1)
+    future = t_days[-1] + np.arange(1, HORIZON_DAYS + 1)
+    residual_std = float(np.std(prices - (slope * t_days + intercept)))
+    return slope * future + intercept, residual_std
+
+
+def _fit_prophet(timestamps: List[float], prices: np.ndarray) -> Tuple[np.ndarray, float]:
+    # Imported here so only pool workers ever pay for Prophet
+    import pandas as pd
+    from prophet import Prophet
+
+    frame = pd.DataFrame({'ds': pd.to_datetime(timestamps, unit='s'), 'y': prices})
+    model = Prophet(daily_seasonality=False, yearly_seasonality=False, weekly_seasonality=True)
+    model.fit(frame)
+    future = model.make_future_dataframe(periods=HORIZON_DAYS, include_history=False)
+    predicted = model.predict(future)
+    band = float((predicted['yhat_upper'] - predicted['yhat_lower']).mean() / (2 * 1.96))
+    return predicted['yhat'].to_numpy(), band
+
+
+def fit_forecast(timestamps: List[float], prices: List[float]) -> Dict[str, Any]:
+    """
+    Fit one product's history and return a serializable forecast.
+    Runs inside pool workers; Prophet is used when installed and there is
+    enough history, otherwise a least-squares linear trend.
+    """
+    prices_arr = np.asarray(prices, dtype=float)
+    t_days = (np.asarray(timestamps, dtype=float) - timestamps[0]) / 86400.0
+
+    method = 'linear'
+    daily, spread = None, 0.0
+    if len(prices_arr) >= PROPHET_MIN_POINTS:
+        try:
+            daily, spread = _fit_prophet(timestamps, prices_arr)
+            method = 'prophet'
+        except ImportError:
+            pass
+    if daily is None:
+        daily, spread = _fit_linear(t_days, prices_arr)
+
+    return _summarize(
+        np.maximum(daily, 0.0), spread, float(prices_arr[-1]),
+        datetime.fromtimestamp(timestamps[-1]), method, len(prices_arr)
+    )
+
+
+def _summarize(daily: np.ndarray, spread: float, current: float, last: datetime,
+               method: str, points: int) -> Dict[str, Any]:
+    best = int(np.argmin(daily))
+    change = (daily[-1] - current) / current if current else 0.0
+    return {
+        'method': method,
+        'predicted_7d': float(daily[6]),
+        'predicted_30d': float(daily[-1]),
+        'lower': float(daily[6] - 1.96 * spread),
+        'upper': float(daily[6] + 1.96 * spread),
+        'trend': 'up' if change > 0.02 else 'down' if change < -0.02 else 'stable',
+        'best_buy_date': last + timedelta(days=best + 1),
+        'savings_potential': max(0.0, current - float(daily[best])),
+        'points': points,
+    }
+
+
+def _design(t: np.ndarray, weekdays: np.ndarray) -> np.ndarray:
+    """Columns: intercept, trend (days), one dummy per weekday Tue..Sun (Monday baseline)"""
+    dummies = (weekdays[:, None] == np.arange(1, 7)[None, :]).astype(float)
+    return np.column_stack([np.ones_like(t, dtype=float), t.astype(float), dummies])
+
+
+def batch_fit(values: np.ndarray, observed: np.ndarray, last_weekday: int,
+              horizon: int = HORIZON_DAYS, weekday_ridge: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit ``price = level + slope * t + weekday effect`` to N daily series at once.
+
+    ``values`` and ``observed`` are (T, N): daily prices and a mask of days with
+    data, the last row being a day with weekday ``last_weekday``. Each series
+    gets its own masked least-squares fit; the N small normal-equation systems
+    are built with two matrix products and solved in one batched call. Weekday
+    effects are ridge-shrunk so sparse series fall back to a plain trend.
+
+    Returns (horizon, N) predictions for the following days and the (N,)
+    residual standard deviation of each fit.
+    """
+    T, N = values.shape
+    t = np.arange(T) - (T - 1)
+    X = _design(t, (last_weekday + t) % 7)
+    k = X.shape[1]
+
+    W = observed.astype(float)
+    Y = np.where(observed, values, 0.0)
+
+    # Per-series X'WX (N, k, k) and X'Wy (N, k)
+    xtwx = (W.T @ (X[:, :, None] * X[:, None, :]).reshape(T, k * k)).reshape(N, k, k)
+    xtwy = Y.T @ X
+    ridge = np.diag([1e-9, 1e-9] + [weekday_ridge] * (k - 2))
+    coef = np.linalg.solve(xtwx + ridge, xtwy[:, :, None])[:, :, 0]
+
+    residuals = (Y - X @ coef.T) * W
+    dof = np.maximum(W.sum(axis=0) - 2, 1)
+    spread = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+
+    tf = np.arange(1, horizon + 1)
+    predictions = _design(tf, (last_weekday + tf) % 7) @ coef.T
+    return np.maximum(predictions, 0.0), spread
+
+
+def daily_matrix(histories: List[List[Tuple[float, float]]], window_days: int,
+                 end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Bucket (ts, price) histories into a (window_days, N) matrix of daily means (UTC days)"""
+    end_day = int((end if end is not None else time.time()) // 86400)
+    first_day = end_day - window_days + 1
+    rows, cols, prices = [], [], []
+    for col, history in enumerate(histories):
+        if not history:
+            continue
+        arr = np.asarray(history, dtype=float)
+        day = (arr[:, 0] // 86400).astype(int) - first_day
+        keep = (day >= 0) & (day < window_days)
+        rows.append(day[keep])
+        cols.append(np.full(int(keep.sum()), col))
+        prices.append(arr[keep, 1])
+
+    sums = np.zeros((window_days, len(histories)))
+    counts = np.zeros_like(sums)
+    if rows:
+        index = (np.concatenate(rows), np.concatenate(cols))
+        np.add.at(sums, index, np.concatenate(prices))
+        np.add.at(counts, index, 1)
+    observed = counts > 0
+    values = np.divide(sums, counts, out=np.zeros_like(sums), where=observed)
+    return values, observed, end_day
+
+
+class PriceForecaster:
+    """Per-product price history with background model fitting and a forecast cache."""
+
+    MODES = ('thread', 'process')
+    MAX_POINTS_PER_PRODUCT = 5000
+    MAX_CACHED_MODELS = 20000
+
+    def __init__(self, mode: Optional[str] = None, workers: Optional[int] = None,
+                 history_store: Optional[PriceHistoryStore] = None):
+        settings = Settings()
+        self.mode = (mode or settings.forecast_executor).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown forecast executor '{self.mode}'. Choose from: {self.MODES}")
+        self.workers = workers or settings.forecast_workers
+
+        self._history: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._models: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple[str, int], Future] = {}
+        self.history_store = history_store
+        self._hydrated: set = set()
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='forecast')
+                logger.info(f'Forecast pool started ({self.mode}, {self.workers} workers)')
+            return self._executor
+
+    def _hydrate(self, key: str):
+        """Seed a product's series with daily mean prices from the history store (once)"""
+        if self.history_store is None or key in self._hydrated:
+            return
+        with self._lock:
+            if key in self._hydrated:
+                return
+            self._hydrated.add(key)
+        try:
+            rows = self.history_store.downsample(key, start=time.time() - HYDRATE_DAYS * 86400)
+        except Exception as e:
+            logger.warning(f'Could not load price history for {key}: {e}')
+            return
+        if not rows:
+            return
+        stored = [(float(bucket), float(mean)) for bucket, _, mean, _, _ in rows]
+        with self._lock:
+            history = self._history.get(key, ())
+            merged = sorted(list(history) + stored)
+            self._history[key] = deque(merged, maxlen=self.MAX_POINTS_PER_PRODUCT)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, product: str) -> int:
+        return self._versions.get(normalize_product(product), 0)
+
+    def record(self, product: str, observations: Iterable[Tuple[datetime, float]]) -> int:
+        """
+        Append (timestamp, price) observations; returns the data version.
+        Points already in the history (re-runs over cached market data) are
+        ignored, and the version only moves when something new was added.
+        """
+        key = normalize_product(product)
+        self._hydrate(key)
+        points = sorted({(ts.timestamp(), float(price)) for ts, price in observations if price and price > 0})
+        with self._lock:
+            history = self._history.get(key)
+            if points and history and history[-1][0] >= points[0][0]:
+                # Overlaps the stored series: drop points already recorded
+                known = set(history)
+                points = [point for point in points if point not in known]
+            if not points:
+                return self._versions.get(key, 0)
+            if history is None:
+                history = self._history[key] = deque(maxlen=self.MAX_POINTS_PER_PRODUCT)
+            in_order = not history or history[-1][0] <= points[0][0]
+            history.extend(points)
+            if not in_order:
+                self._history[key] = deque(sorted(history), maxlen=self.MAX_POINTS_PER_PRODUCT)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def history(self, product: str) -> List[Tuple[float, float]]:
+        with self._lock:
+            return list(self._history.get(normalize_product(product), ()))
+
+    def _schedule(self, key: str, version: int, force: bool = False) -> Optional[Future]:
+        """Submit a fit for (key, version) unless it is cached (or `force`) or already running"""
+        executor = self.executor
+        with self._lock:
+            if (key, version) in self._models and not force:
+                return None
+            future = self._pending.get((key, version))
+            if future is not None:
+                return future
+            history = self._history.get(key, ())
+            if len(history) < LINEAR_MIN_POINTS or history[-1][0] - history[0][0] < MIN_SPAN_SECONDS:
+                return None
+            timestamps = [ts for ts, _ in history]
+            prices = [price for _, price in history]
+            future = executor.submit(fit_forecast, timestamps, prices)
+            self._pending[(key, version)] = future
+        future.add_done_callback(lambda f: self._store(key, version, f))
+        return future
+
+    def _store(self, key: str, version: int, future: Future):
+        with self._lock:
+            self._pending.pop((key, version), None)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f'Forecast fit failed for {key} v{version}: {e}')
+                return
+            self._remember(key, version, result)
+
+    def _remember(self, key: str, version: int, result: Dict[str, Any]):
+        """Cache a fitted forecast; caller holds the lock"""
+        self._models[(key, version)] = result
+        self._models.move_to_end((key, version))
+        while len(self._models) > self.MAX_CACHED_MODELS:
+            self._models.popitem(last=False)
+        latest = self._latest.get(key)
+        if latest is None or latest['version'] <= version:
+            self._latest[key] = {**result, 'version': version}
+
+    def refresh_all(self, products: Optional[Iterable[str]] = None, window_days: int = 90,
+                    prophet_top: int = 20) -> Dict[str, Dict[str, Any]]:
+        """
+        Batch refresh (e.g. nightly) of every known product, or `products`.
+
+        All series with enough days inside the window are fitted together
+        with `batch_fit` and cached for their current data version; the rest
+        get an individual fit over their whole history in the background.
+        The `prophet_top` products with the most history
+        are then refitted with Prophet in the background when it is installed.
+        """
+        keys = [normalize_product(p) for p in products] if products is not None else list(self._history)
+        for key in keys:
+            self._hydrate(key)
+
+        with self._lock:
+            snapshot = {key: (self._versions.get(key, 0), list(self._history.get(key, ()))) for key in keys}
+        eligible = [
+            key for key, (_, history) in snapshot.items()
+            if len(history) >= LINEAR_MIN_POINTS and history[-1][0] - history[0][0] >= MIN_SPAN_SECONDS
+        ]
+        if not eligible:
+            return {}
+
+        start = time.perf_counter()
+        values, observed, end_day = daily_matrix([snapshot[k][1] for k in eligible], window_days)
+
+        # The fit only sees the window: judge points and span on the days inside it
+        points = observed.sum(axis=0)
+        first_row = np.argmax(observed, axis=0)
+        last_row = observed.shape[0] - 1 - np.argmax(observed[::-1], axis=0)
+        fits = (points >= LINEAR_MIN_POINTS) & ((last_row - first_row) * 86400 >= MIN_SPAN_SECONDS)
+        for i in np.flatnonzero(~fits):
+            self._schedule(eligible[i], snapshot[eligible[i]][0])
+        eligible = [key for key, keep in zip(eligible, fits) if keep]
+        if not eligible:
+            return {}
+        values, observed = values[:, fits], observed[:, fits]
+        points, last_row = points[fits], last_row[fits]
+
+        # Daily buckets are UTC days
+        last_day = datetime.fromtimestamp(end_day * 86400, timezone.utc).replace(tzinfo=None)
+        predictions, spread = batch_fit(values, observed, last_day.weekday())
+        current = values[last_row, np.arange(len(eligible))]
+
+        results = {}
+        with self._lock:
+            for i, key in enumerate(eligible):
+                result = _summarize(predictions[:, i], float(spread[i]), float(current[i]),
+                                    last_day, 'batch_linear', int(points[i]))
+                self._remember(key, snapshot[key][0], result)
+                results[key] = result
+        logger.info(f'Batch forecast refreshed {len(eligible)} products in {time.perf_counter() - start:.2f}s')
+
+        if prophet_top and importlib.util.find_spec('prophet') is not None:
+            ranked = sorted(eligible, key=lambda k: len(snapshot[k][1]), reverse=True)
+            for key in ranked[:prophet_top]:
+                if len(snapshot[key][1]) >= PROPHET_MIN_POINTS:
+                    self._schedule(key, snapshot[key][0], force=True)
+        return results
+
+    def forecast(self, product: str, current_price: float, wait: bool = False,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Forecast from cache. A fit for the current data version is scheduled
+        in the background if needed; with `wait=True` the call blocks for it.
+        """
+        key = normalize_product(product)
+        self._hydrate(key)
+        version = self._versions.get(key, 0)
+        future = self._schedule(key, version)
+        fitted = None
+        if wait and future is not None:
+            try:
+                fitted = future.result(timeout)
+            except Exception:
+                pass
+
+        with self._lock:
+            model = self._models.get((key, version))
+            if model is None and fitted is not None:
+                # The done-callback may not have run yet: store the fit we waited for
+                self._remember(key, version, fitted)
+                model = fitted
+            if model is not None:
+                return {**model, 'version': version, 'stale': False}
+            latest = self._latest.get(key)
+        if latest is not None:
+            return {**latest, 'stale': True}
+        return {**heuristic_forecast(current_price), 'version': version, 'stale': True}
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+_forecaster: Optional[PriceForecaster] = None
+_forecaster_lock = threading.Lock()
+
+
+def get_forecaster() -> PriceForecaster:
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = PriceForecaster(history_store=get_price_history())
+    return _forecaster
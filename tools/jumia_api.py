@@ -12,8 +12,10 @@ from datetime import datetime, timedelta
 import requests
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+from core.exceptions import CircuitOpenError, DeadlineExceeded
 from core.logging import get_logger
+from core.resilience import breaker_for_url, check_deadline, deadline_sleep, request_timeout, stop_at_deadline
 from core.safety import SafetyGuardrails
 
 logger = get_logger("jumia_tool")
@@ -55,16 +57,20 @@ class JumiaClient:
         }
     
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_not_exception_type((CircuitOpenError, DeadlineExceeded))
     )
     def search_products(self, query: str, max_results: int = 10) -> List[Dict]:
-        """Search for products on Jumia Kenya."""
+        """Search for products on Jumia Kenya. Raises CircuitOpenError while Jumia is marked down."""
+        search_url = f"{self.config.base_url}/catalog/"
+        breaker = breaker_for_url(search_url)
+        breaker.check("jumia")
+        
         logger.info(f"Searching Jumia for: {query}")
         
-        time.sleep(self.config.request_delay + random.uniform(0, 1))
+        deadline_sleep(self.config.request_delay + random.uniform(0, 1), "Jumia search")
         
-        search_url = f"{self.config.base_url}/catalog/"
         params = {'q': query}
         
         try:
@@ -72,8 +78,9 @@ class JumiaClient:
                 search_url,
                 params=params,
                 headers=self._get_headers(),
-                timeout=30
+                timeout=request_timeout(30, "Jumia search")
             )
+            breaker.record_status(response.status_code)
             response.raise_for_status()
             
             products = self._parse_search_results(response.text, max_results)
@@ -81,6 +88,9 @@ class JumiaClient:
             return products
             
         except requests.RequestException as e:
+            check_deadline("Jumia search")
+            if not isinstance(e, requests.HTTPError):
+                breaker.record_failure(e)
             logger.error(f"Jumia search failed: {e}")
             return []
     
@@ -0,0 +1,265 @@
+"""
+Near-duplicate review detection across sellers.
+
+Reviews are shingled into character 5-grams and summarized with MinHash
+signatures. Locality-sensitive hashing over signature bands finds candidate
+near-duplicates without scanning the whole index; candidates are confirmed
+with the estimated Jaccard similarity. The index is LRU-bounded and can be
+persisted to a compressed ``.npz`` file.
+"""
+import os
+import json
+import atexit
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import structlog
+
+from core.config import Settings
+
+logger = structlog.get_logger("review_dedup")
+
+# Mersenne prime 2^31 - 1: keeps a * x + b inside uint64 without overflow
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+@dataclass
+class DuplicateMatch:
+    """Near-duplicate cluster signal for one review"""
+    doc_id: str
+    matches: List[str] = field(default_factory=list)
+    other_sellers: Set[str] = field(default_factory=set)
+
+    @property
+    def cluster_size(self) -> int:
+        return len(self.matches) + 1
+
+
+@dataclass
+class _Entry:
+    signature: np.ndarray
+    sellers: Set[str] = field(default_factory=set)
+
+
+class NearDuplicateIndex:
+    """Thread-safe MinHash + LSH index over analyzed reviews."""
+
+    MAX_SELLERS_PER_ENTRY = 32
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        threshold: float = 0.7,
+        shingle_size: int = 5,
+        max_entries: int = 50000,
+        path: Optional[str] = None,
+        seed: int = 7
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.path = path
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -- hashing -----------------------------------------------------------------
+
+    def _shingles(self, text: str) -> np.ndarray:
+        normalized = " ".join(text.lower().split())
+        k = self.shingle_size
+        if len(normalized) <= k:
+            grams = {normalized}
+        else:
+            grams = {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of a review"""
+        hashed = self._shingles(text) % _PRIME
+        permuted = (self._a[:, None] * hashed[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    # -- index operations --------------------------------------------------------
+
+    def _candidates(self, band_keys: List[int]) -> Set[str]:
+        found: Set[str] = set()
+        for band, key in enumerate(band_keys):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def _match(self, doc_id: str, signature: np.ndarray, band_keys: List[int]) -> List[str]:
+        matches = []
+        for candidate in self._candidates(band_keys):
+            if candidate == doc_id:
+                continue
+            similarity = float(np.mean(self._entries[candidate].signature == signature))
+            if similarity >= self.threshold:
+                matches.append(candidate)
+        return matches
+
+    def query(self, text: str, doc_id: str = "", seller_id: Optional[str] = None) -> DuplicateMatch:
+        """Look up near-duplicates of a review without adding it"""
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            return self._build_match(doc_id, signature, band_keys, seller_id)
+
+    def indexed(self, doc_ids: Iterable[str]) -> List[str]:
+        """The given review ids that are still in the index"""
+        with self._lock:
+            return [doc_id for doc_id in doc_ids if doc_id in self._entries]
+
+    def query_id(self, doc_id: str, seller_id: Optional[str] = None) -> Optional[DuplicateMatch]:
+        """Current cluster of an indexed review, from its stored signature (None once evicted)"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                return None
+            return self._build_match(doc_id, entry.signature, self._band_keys(entry.signature), seller_id)
+
+    def _build_match(self, doc_id: str, signature: np.ndarray, band_keys: List[int],
+                     seller_id: Optional[str]) -> DuplicateMatch:
+        matches = self._match(doc_id, signature, band_keys)
+        sellers: Set[str] = set()
+        for other in matches:
+            sellers.update(self._entries[other].sellers)
+        if doc_id in self._entries:
+            sellers.update(self._entries[doc_id].sellers)
+        sellers.discard(seller_id)
+        return DuplicateMatch(doc_id=doc_id, matches=matches, other_sellers=sellers)
+
+    def add(self, doc_id: str, text: str, seller_id: Optional[str] = None) -> DuplicateMatch:
+        """Insert a review (idempotent per doc_id) and return its duplicate cluster"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+        signature = entry.signature if entry is not None else self.signature(text)
+        band_keys = self._band_keys(signature)
+
+        with self._lock:
+            match = self._build_match(doc_id, signature, band_keys, seller_id)
+
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                entry = _Entry(signature=signature)
+                self._entries[doc_id] = entry
+                for band, key in enumerate(band_keys):
+                    self._buckets[band].setdefault(key, set()).add(doc_id)
+                self._evict()
+            else:
+                self._entries.move_to_end(doc_id)
+
+            if seller_id and seller_id not in entry.sellers and len(entry.sellers) < self.MAX_SELLERS_PER_ENTRY:
+                entry.sellers.add(seller_id)
+            self._dirty = True
+        return match
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            doc_id, entry = self._entries.popitem(last=False)
+            for band, key in enumerate(self._band_keys(entry.signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+
+    # -- persistence -------------------------------------------------------------
+
+    def _params(self) -> Dict[str, int]:
+        return {'num_perm': self.num_perm, 'bands': self.bands, 'shingle_size': self.shingle_size, 'seed': self.seed}
+
+    def save(self, path: Optional[str] = None):
+        """Write signatures and seller sets to disk (buckets are rebuilt on load)"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            ids = list(self._entries.keys())
+            signatures = (np.stack([e.signature for e in self._entries.values()])
+                          if ids else np.zeros((0, self.num_perm), dtype=np.uint32))
+            sellers = [sorted(e.sellers) for e in self._entries.values()]
+            self._dirty = False
+            self._last_save = time.time()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            ids=np.array(ids, dtype=str),
+            signatures=signatures,
+            sellers=np.array(json.dumps(sellers)),
+            params=np.array(json.dumps(self._params()))
+        )
+        os.replace(tmp_path, path)
+        logger.debug("duplicate_index_saved", path=path, entries=len(ids))
+
+    def save_if_due(self, min_interval: float = 60.0):
+        if self._dirty and time.time() - self._last_save >= min_interval:
+            self.save()
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "NearDuplicateIndex":
+        """Load a saved index, or return an empty one bound to `path`"""
+        index = cls(path=path, **kwargs)
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if json.loads(str(data['params'])) != index._params():
+                    logger.warning("duplicate_index_params_changed", path=path)
+                    return index
+                sellers = json.loads(str(data['sellers']))
+                for doc_id, signature, doc_sellers in zip(data['ids'], data['signatures'], sellers):
+                    doc_id = str(doc_id)
+                    index._entries[doc_id] = _Entry(signature=signature.astype(np.uint32), sellers=set(doc_sellers))
+                    for band, key in enumerate(index._band_keys(signature.astype(np.uint32))):
+                        index._buckets[band].setdefault(key, set()).add(doc_id)
+            index._evict()
+            logger.info("duplicate_index_loaded", path=path, entries=len(index))
+        except Exception as e:
+            logger.warning("duplicate_index_load_failed", path=path, error=str(e))
+        return index
+
+
+_index_instance: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_duplicate_index() -> NearDuplicateIndex:
+    """Process-wide index loaded from Settings.duplicate_index_path"""
+    global _index_instance
+    with _index_lock:
+        if _index_instance is None:
+            settings = Settings()
+            _index_instance = NearDuplicateIndex.load(
+                settings.duplicate_index_path,
+                max_entries=settings.duplicate_index_max_entries
+            )
+            atexit.register(_index_instance.save)
+    return _index_instance
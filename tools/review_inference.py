@@ -0,0 +1,275 @@
+"""
+Pluggable inference backends for the review classifier.
+
+The PyTorch backend wraps the transformers pipeline. The ONNX backend exports
+the same model once to ONNX, optionally applies dynamic int8 quantization and
+serves it with ONNX Runtime on CPU. Both return pipeline-style predictions
+(``[{'label': 'POSITIVE', 'score': 0.98}]``) so callers can swap them freely.
+"""
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import structlog
+
+from core.config import Settings
+from core.exceptions import MLModelError
+
+try:
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+logger = structlog.get_logger("review_inference")
+
+Texts = Union[str, List[str]]
+
+
+class InferenceBackend:
+    """Base class for review classification backends."""
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def __call__(self, texts: Texts) -> List[Dict[str, Any]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        return self.predict(texts)
+
+    @property
+    def signature(self) -> str:
+        """Identifier of the model and runtime producing the scores."""
+        return f"{self.name}:{self.model_name}"
+
+
+class PyTorchBackend(InferenceBackend):
+    """Full-precision transformers pipeline on CPU."""
+
+    name = "pytorch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        if not TRANSFORMERS_AVAILABLE:
+            raise MLModelError("transformers is not installed")
+        self.pipeline = pipeline(
+            "sentiment-analysis",
+            model=model_name,
+            tokenizer=model_name,
+            device=-1  # CPU
+        )
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        return self.pipeline(texts, truncation=True)
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime backend with one-time export and dynamic int8 quantization."""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        quantize: bool = True,
+        max_length: int = 512,
+        intra_op_threads: Optional[int] = None
+    ):
+        super().__init__(model_name)
+        if not (TRANSFORMERS_AVAILABLE and ONNXRUNTIME_AVAILABLE):
+            raise MLModelError("onnx backend requires transformers and onnxruntime")
+
+        self.quantize = quantize
+        self.max_length = max_length
+        self.export_dir = os.path.join(cache_dir, model_name.replace("/", "--"))
+        model_path = self._ensure_exported()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(self.export_dir)
+        with open(os.path.join(self.export_dir, "labels.json"), "r", encoding="utf-8") as f:
+            self.id2label = {int(k): v for k, v in json.load(f).items()}
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}{'-int8' if self.quantize else ''}:{self.model_name}"
+
+    @property
+    def _fp32_path(self) -> str:
+        return os.path.join(self.export_dir, "model.onnx")
+
+    @property
+    def _int8_path(self) -> str:
+        return os.path.join(self.export_dir, "model.int8.onnx")
+
+    def _ensure_exported(self) -> str:
+        """Export (and quantize) the model on first use; reuse the files afterwards."""
+        target = self._int8_path if self.quantize else self._fp32_path
+        if os.path.exists(target):
+            return target
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        if not os.path.exists(self._fp32_path):
+            self._export_fp32()
+
+        if self.quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(self._fp32_path, self._int8_path, weight_type=QuantType.QInt8)
+            logger.info("onnx_model_quantized", path=self._int8_path)
+
+        return target
+
+    def _export_fp32(self):
+        import torch
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+
+        sample = tokenizer("export sample", return_tensors="pt")
+        dynamic_axes = {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        }
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                self._fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        tokenizer.save_pretrained(self.export_dir)
+        with open(os.path.join(self.export_dir, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(model.config.id2label, f)
+        logger.info("onnx_model_exported", model=self.model_name, path=self._fp32_path)
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        logits = self.session.run(["logits"], feeds)[0]
+
+        # Softmax over classes
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        best = probs.argmax(axis=1)
+        return [
+            {"label": self.id2label[int(idx)], "score": float(probs[row, idx])}
+            for row, idx in enumerate(best)
+        ]
+
+
+BACKENDS = {
+    PyTorchBackend.name: PyTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(
+    name: Optional[str] = None,
+    model_name: Optional[str] = None,
+    settings: Optional[Settings] = None
+) -> InferenceBackend:
+    """Build the configured inference backend (defaults come from Settings)."""
+    settings = settings or Settings()
+    name = (name or settings.review_inference_backend).lower()
+    model_name = model_name or settings.review_model_name
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: {sorted(BACKENDS)}")
+
+    if name == OnnxBackend.name:
+        return OnnxBackend(model_name, cache_dir=settings.onnx_cache_dir, quantize=settings.onnx_quantize)
+    return PyTorchBackend(model_name)
+
+
+def compare_backends(
+    texts: List[str],
+    candidate: Optional[InferenceBackend] = None,
+    reference: Optional[InferenceBackend] = None,
+    repeats: int = 3
+) -> Dict[str, Any]:
+    """
+    Check a candidate backend (ONNX by default) against the PyTorch reference.
+
+    Returns label agreement, the largest probability drift and the per-review
+    latency of both backends.
+    """
+    if not texts:
+        raise ValueError("compare_backends needs at least one text")
+
+    reference = reference or create_backend(PyTorchBackend.name)
+    candidate = candidate or create_backend(OnnxBackend.name)
+
+    def _timed(backend: InferenceBackend) -> Tuple[List[Dict[str, Any]], float]:
+        backend(texts[:1])  # warm-up
+        best = float("inf")
+        predictions = []
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            predictions = [backend(t)[0] for t in texts]
+            best = min(best, time.perf_counter() - start)
+        return predictions, best * 1000 / len(texts)
+
+    ref_preds, ref_ms = _timed(reference)
+    cand_preds, cand_ms = _timed(candidate)
+
+    def _positive_prob(p: Dict[str, Any]) -> float:
+        return p["score"] if p["label"].upper() == "POSITIVE" else 1 - p["score"]
+
+    agreement = sum(r["label"] == c["label"] for r, c in zip(ref_preds, cand_preds)) / len(texts)
+    max_drift = max(abs(_positive_prob(r) - _positive_prob(c)) for r, c in zip(ref_preds, cand_preds))
+
+    report = {
+        "reference": reference.signature,
+        "candidate": candidate.signature,
+        "samples": len(texts),
+        "label_agreement": round(agreement, 4),
+        "max_probability_drift": round(max_drift, 4),
+        "reference_ms_per_review": round(ref_ms, 3),
+        "candidate_ms_per_review": round(cand_ms, 3),
+        "speedup": round(ref_ms / cand_ms, 2) if cand_ms > 0 else None,
+    }
+    logger.info("inference_backend_comparison", **report)
+    return report
+
+
+if __name__ == "__main__":
+    samples = [
+        "Genuine product, fast delivery and works perfectly.",
+        "Fake! Stopped working after two days, total waste of money.",
+        "Original Samsung with receipt, warranty valid.",
+        "Poor quality, cheap material, not as described.",
+    ]
+    print(json.dumps(compare_backends(samples), indent=2))
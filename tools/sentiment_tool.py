@@ -1,13 +1,19 @@
 ﻿import re
 import json
 import asyncio
+import hashlib
+import threading
+import unicodedata
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from typing import List, Dict, Optional, Set, Tuple, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict, replace
 from datetime import datetime
 from enum import Enum
 from collections import Counter
 import numpy as np
 from functools import lru_cache
+from contextlib import asynccontextmanager, nullcontext
 
 # ML/NLP imports (install: pip install transformers scikit-learn)
 try:
@@ -26,10 +32,26 @@ import structlog
 from core.config import Settings
 from core.cache import CacheManager
 from core.monitoring import MetricsCollector
+from core.tracing import span
 from core.exceptions import MLModelError
+from tools.review_inference import create_backend
+from tools.review_dedup import NearDuplicateIndex, get_duplicate_index
 
 logger = structlog.get_logger("sentiment_analyzer")
 
+# Bump when the analysis logic changes in a way the pattern tables don't capture
+ANALYSIS_VERSION = "2"
+
+
+def normalize_review_text(text: str) -> str:
+    """Canonical form of a review used for content addressing"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def review_digest(text: str) -> str:
+    """Stable (process-independent) digest of a review's normalized text"""
+    return hashlib.sha256(normalize_review_text(text).encode("utf-8")).hexdigest()
+
 
 class ReviewAuthenticity(Enum):
     GENUINE = "genuine"
@@ -77,6 +99,27 @@ class ReviewAnalysis:
     authentic_indicators: List[str] = field(default_factory=list)
     confidence: float = 0.0
     processing_time_ms: float = 0.0
+    ml_score: Optional[float] = None
+    duplicate_sellers: int = 0  # other sellers posting near-identical text
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Full JSON-serializable form; inverse of from_record"""
+        record = asdict(self)
+        record['authenticity_label'] = self.authenticity_label.value
+        timestamp = self.features.timestamp
+        record['features']['timestamp'] = timestamp.isoformat() if timestamp else None
+        return record
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'ReviewAnalysis':
+        """Rebuild an analysis stored with to_record"""
+        data = dict(record)
+        features = dict(data['features'])
+        if features.get('timestamp'):
+            features['timestamp'] = datetime.fromisoformat(features['timestamp'])
+        data['features'] = ReviewFeatures(**features)
+        data['authenticity_label'] = ReviewAuthenticity(data['authenticity_label'])
+        return cls(**data)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -128,6 +171,78 @@ class SellerTrustReport:
         }
 
 
+@dataclass
+class SellerAggregate:
+    """
+    Running per-seller totals that trust reports are derived from.
+    Reviews are folded in once; `seen` remembers how many copies of each
+    review digest were already counted so refreshes only analyze new ones.
+    It keeps the MAX_SEEN most recently added digests: a review older than
+    that is counted again if it comes back.
+    """
+    MAX_SEEN = 5000
+
+    seller_id: Optional[str] = None
+    total: int = 0
+    authenticity_counts: Dict[str, int] = field(default_factory=dict)
+    sentiment_counts: Dict[str, int] = field(default_factory=dict)
+    sentiment_sum: float = 0.0
+    weight_sum: float = 0.0
+    risk_counts: Dict[str, int] = field(default_factory=dict)
+    seen: Dict[str, int] = field(default_factory=dict)
+    
+    @staticmethod
+    def _seen_key(review_text: str) -> str:
+        return review_digest(review_text or "")[:16]
+    
+    def pending(self, reviews: List[str]) -> List[int]:
+        """Indexes of reviews (counting duplicates) not folded in yet"""
+        occurrences: Counter = Counter()
+        pending = []
+        for i, text in enumerate(reviews):
+            key = self._seen_key(text)
+            occurrences[key] += 1
+            if occurrences[key] > self.seen.get(key, 0):
+                pending.append(i)
+        return pending
+    
+    def fold(self, review_text: str, analysis: 'ReviewAnalysis', weight: float = 1.0):
+        """Add one analyzed review to the running totals"""
+        key = self._seen_key(review_text)
+        self.seen[key] = self.seen.get(key, 0) + 1
+        if len(self.seen) > self.MAX_SEEN:
+            del self.seen[next(iter(self.seen))]
+        self.total += 1
+        
+        label = analysis.authenticity_label.value
+        self.authenticity_counts[label] = self.authenticity_counts.get(label, 0) + 1
+        self.sentiment_counts[analysis.sentiment_label] = self.sentiment_counts.get(analysis.sentiment_label, 0) + 1
+        self.sentiment_sum += analysis.sentiment_score * weight
+        self.weight_sum += weight
+        
+        if analysis.features.has_url:
+            self.risk_counts['has_url'] = self.risk_counts.get('has_url', 0) + 1
+        if analysis.duplicate_sellers:
+            self.risk_counts['near_duplicate'] = self.risk_counts.get('near_duplicate', 0) + 1
+        for indicator in analysis.fake_indicators:
+            key = f"indicator:{indicator}"
+            self.risk_counts[key] = self.risk_counts.get(key, 0) + 1
+    
+    def percentage(self, label: 'ReviewAuthenticity') -> float:
+        return (self.authenticity_counts.get(label.value, 0) / self.total) * 100 if self.total else 0.0
+    
+    @property
+    def average_sentiment(self) -> float:
+        return self.sentiment_sum / self.weight_sum if self.weight_sum else 0.0
+    
+    def to_record(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'SellerAggregate':
+        return cls(**record)
+
+
 class FakeReviewDetector:
     """
     Advanced fake review detection using linguistic patterns,
@@ -171,6 +286,8 @@ class FakeReviewDetector:
         'original kenya': 2, 'authorized dealer': 3, 'with receipt': 2,
     }
     
+    NEAR_DUPLICATE_INDICATOR = 'near_duplicate_across_sellers'
+    
     # Behavioral fake indicators
     SUSPICIOUS_BEHAVIORS = [
         r'\b\d{1,2}\s*stars?\b',  # Rating mentioned in text
@@ -181,8 +298,9 @@ class FakeReviewDetector:
         r'\b\d{3,}\s*(ksh|kes|kshs)\b',  # Specific price mentions
     ]
     
-    def __init__(self, use_ml: bool = True):
+    def __init__(self, use_ml: bool = True, backend: Optional[str] = None):
         self.use_ml = use_ml and TRANSFORMERS_AVAILABLE
+        self.backend = backend
         self.ml_pipeline = None
         self.nlp = None
         
@@ -198,18 +316,26 @@ class FakeReviewDetector:
         self.behavioral_patterns = [re.compile(p, re.IGNORECASE) for p in self.SUSPICIOUS_BEHAVIORS]
         logger.info("fake_review_detector_initialized", ml_enabled=self.use_ml)
 
+    @property
+    def signature(self) -> str:
+        """Digest of everything that determines a review's analysis"""
+        model = self.ml_pipeline.signature if (self.use_ml and self.ml_pipeline) else "heuristic"
+        payload = json.dumps({
+            'version': ANALYSIS_VERSION,
+            'fake': self.FAKE_PATTERNS,
+            'authentic': self.AUTHENTIC_PATTERNS,
+            'behaviors': self.SUSPICIOUS_BEHAVIORS,
+            'model': model,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
     def _load_ml_model(self):
-        """Load pre-trained fake review detection model"""
+        """Load pre-trained fake review detection model on the configured backend"""
         try:
-            # Using a sentiment model as proxy; ideally use fine-tuned fake review detector
-            model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-            self.ml_pipeline = pipeline(
-                "sentiment-analysis",
-                model=model_name,
-                tokenizer=model_name,
-                device=-1  # CPU
-            )
-            logger.info("ml_model_loaded", model=model_name)
+            # Using a sentiment model as proxy; ideally use fine-tuned fake review detector.
+            # REVIEW_INFERENCE_BACKEND selects PyTorch or quantized ONNX Runtime.
+            self.ml_pipeline = create_backend(self.backend)
+            logger.info("ml_model_loaded", backend=self.ml_pipeline.signature)
         except Exception as e:
             logger.error("ml_model_load_failed", error=str(e))
             self.use_ml = False
@@ -269,10 +395,13 @@ class FakeReviewDetector:
     def calculate_authenticity_score(
         self, 
         text: str, 
-        features: ReviewFeatures
+        features: ReviewFeatures,
+        duplicate_sellers: int = 0
     ) -> Tuple[float, List[str], List[str]]:
         """
         Calculate authenticity score (0-1, higher = more genuine)
+        `duplicate_sellers` is the number of other sellers with near-identical
+        review text (cross-seller review farm signal from NearDuplicateIndex).
         Returns: (score, fake_indicators_found, authentic_indicators_found)
         """
         text_lower = text.lower()
@@ -304,13 +433,19 @@ class FakeReviewDetector:
         if features.exclamation_count > 3:
             feature_risk += 0.5
         
+        # Near-duplicate text posted under other sellers
+        duplicate_penalty = 0.0
+        if duplicate_sellers > 0:
+            fake_indicators.append(self.NEAR_DUPLICATE_INDICATOR)
+            duplicate_penalty = min(0.3, 0.1 * duplicate_sellers)
+        
         # Calculate final score
         base_score = 0.5  # Neutral starting point
         indicator_impact = (authentic_score - fake_score) * 0.1
         behavioral_penalty = behavioral_flags * 0.05
         feature_penalty = feature_risk * 0.05
         
-        authenticity = base_score + indicator_impact - behavioral_penalty - feature_penalty
+        authenticity = base_score + indicator_impact - behavioral_penalty - feature_penalty - duplicate_penalty
         authenticity = max(0.0, min(1.0, authenticity))  # Clamp to 0-1
         
         return authenticity, fake_indicators, authentic_indicators
@@ -332,6 +467,111 @@ class FakeReviewDetector:
             return None
 
 
+# Per-process detector used by AnalysisEngine's process pool workers
+_worker_detector: Optional[FakeReviewDetector] = None
+
+
+def _init_process_worker(use_ml: bool, backend: Optional[str]):
+    global _worker_detector
+    _worker_detector = FakeReviewDetector(use_ml=use_ml, backend=backend)
+
+
+def _extract_signals(detector: FakeReviewDetector, text: str) -> Tuple[ReviewFeatures, Optional[float]]:
+    """CPU-bound part of an analysis: features (regexes, TextBlob) and model score"""
+    return detector.extract_features(text), detector.ml_predict(text)
+
+
+def _extract_signals_in_worker(text: str) -> Tuple[ReviewFeatures, Optional[float]]:
+    return _extract_signals(_worker_detector, text)
+
+
+class AnalysisEngine:
+    """
+    Runs CPU-bound review analysis on a thread or process pool so async
+    callers (Gradio, the agents) never block their event loop on it.
+    
+    Thread mode shares the caller's detector; process mode gives every
+    worker its own detector (and model) for true parallelism.
+    """
+    
+    MODES = ('thread', 'process')
+    
+    def __init__(
+        self,
+        detector: FakeReviewDetector,
+        mode: Optional[str] = None,
+        workers: Optional[int] = None
+    ):
+        settings = Settings()
+        self.mode = (mode or settings.review_executor).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown review executor '{self.mode}'. Choose from: {self.MODES}")
+        self.workers = workers or settings.review_workers
+        self.detector = detector
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_init_process_worker,
+                        initargs=(self.detector.use_ml, self.detector.backend)
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="review-analysis"
+                    )
+                logger.info("analysis_engine_started", mode=self.mode, workers=self.workers)
+            return self._executor
+    
+    async def extract(self, text: str) -> Tuple[ReviewFeatures, Optional[float]]:
+        loop = asyncio.get_running_loop()
+        if self.mode == 'process':
+            return await loop.run_in_executor(self.executor, _extract_signals_in_worker, text)
+        return await loop.run_in_executor(self.executor, _extract_signals, self.detector, text)
+    
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+class _BackgroundLoop:
+    """One long-lived event loop thread that sync callers submit coroutines to"""
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="review-analysis-loop", daemon=True)
+        self._thread.start()
+    
+    def run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+_background_loop: Optional[_BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """
+    Run an analysis coroutine from synchronous code. Reuses one background
+    loop instead of creating a new one per call, and does not fail when the
+    caller is itself running inside an event loop, but it blocks that loop
+    until the result is ready: async code should await the coroutine.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = _BackgroundLoop()
+    return _background_loop.run(coro, timeout)
+
+
 class ReviewAnalyzer:
     """
     Production-ready review analysis engine with caching,
@@ -342,12 +582,18 @@ class ReviewAnalyzer:
         self,
         cache_manager: Optional[CacheManager] = None,
         metrics: Optional[MetricsCollector] = None,
-        use_ml: bool = True
+        use_ml: bool = True,
+        duplicate_index: Optional[NearDuplicateIndex] = None,
+        engine: Optional[AnalysisEngine] = None
     ):
         self.detector = FakeReviewDetector(use_ml=use_ml)
+        self.engine = engine or AnalysisEngine(self.detector)
         self.cache = cache_manager or CacheManager()
         self.metrics = metrics or MetricsCollector()
         self.settings = Settings()
+        self.duplicate_index = duplicate_index
+        if self.duplicate_index is None and self.settings.duplicate_detection:
+            self.duplicate_index = get_duplicate_index()
         
         # Analysis thresholds
         self.SENTIMENT_THRESHOLDS = {
@@ -362,6 +608,25 @@ class ReviewAnalyzer:
             'suspicious': 0.4,
             'fake': 0.0
         }
+        
+        self.cache_ttl = self.settings.review_cache_ttl
+        self._cache_namespace = self._build_cache_namespace()
+        # asyncio locks belong to one event loop (run_sync, asyncio.run and callers' loops differ)
+        self._seller_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._seller_locks_guard = threading.Lock()
+        # ...so loops in different threads are serialized per seller by a thread lock
+        self._seller_thread_locks: Dict[str, threading.Lock] = {}
+
+    def _build_cache_namespace(self) -> str:
+        thresholds = json.dumps([self.SENTIMENT_THRESHOLDS, self.AUTHENTICITY_THRESHOLDS], sort_keys=True)
+        threshold_digest = hashlib.sha256(thresholds.encode("utf-8")).hexdigest()[:8]
+        return f"review_analysis:{self.detector.signature}{threshold_digest}"
+
+    def cache_key(self, review_text: str) -> str:
+        """Content-addressed cache key: normalized text digest + analysis version"""
+        return f"{self._cache_namespace}:{review_digest(review_text)}"
 
     def _get_sentiment_label(self, score: float) -> str:
         """Convert numeric sentiment to label"""
@@ -385,32 +650,75 @@ class ReviewAnalyzer:
             return ReviewAuthenticity.FAKE
         return ReviewAuthenticity.UNCERTAIN
 
-    async def analyze_review(self, review_text: str, review_id: Optional[str] = None) -> ReviewAnalysis:
+    async def analyze_review(
+        self,
+        review_text: str,
+        review_id: Optional[str] = None,
+        seller_id: Optional[str] = None
+    ) -> ReviewAnalysis:
         """
         Comprehensive single review analysis with caching.
+        
+        The cached analysis depends on the text alone; the cross-seller
+        near-duplicate signal is applied on top of it because it changes
+        as the duplicate index grows. Feature extraction and inference run
+        on the AnalysisEngine executor, not on the event loop.
         """
+        return await self._analyze_review(review_text, review_id, seller_id)
+
+    async def _analyze_review(
+        self,
+        review_text: str,
+        review_id: Optional[str] = None,
+        seller_id: Optional[str] = None
+    ) -> ReviewAnalysis:
         if not review_text or not review_text.strip():
             return self._empty_analysis(review_text or "")
         
         # Check cache
-        cache_key = f"review_analysis:{hash(review_text)}"
-        cached = await self.cache.get(cache_key)
+        cache_key = self.cache_key(review_text)
+        with span('review_cache.get') as cache_span:
+            cached = await self.cache.get(cache_key)
+            if cache_span:
+                cache_span.set(hit=bool(cached))
         if cached:
             self.metrics.increment("review_analysis.cache_hit")
-            return ReviewAnalysis(**cached)
+            result = ReviewAnalysis.from_record(cached)
+        else:
+            with span('review.inference'):
+                result = await self._compute_analysis(review_text)
+            
+            # Cache and metrics
+            await self.cache.set(cache_key, result.to_record(), ttl=self.cache_ttl)
+            self.metrics.histogram("review_analysis.latency_ms", result.processing_time_ms)
+            self.metrics.increment(f"review_analysis.authenticity.{result.authenticity_label.value}")
         
+        return self._apply_duplicate_signal(review_text, result, seller_id)
+
+    async def _compute_analysis(self, review_text: str) -> ReviewAnalysis:
+        """Feature extraction and model inference (the expensive, cacheable part)"""
         start_time = datetime.now()
         
-        # Feature extraction
-        features = self.detector.extract_features(review_text)
+        # Feature extraction and ML enhancement, off the event loop
+        features, ml_score = await self.engine.extract(review_text)
         
+        result = self._score(review_text, features, ml_score)
+        result.processing_time_ms = (datetime.now() - start_time).total_seconds() * 1000
+        return result
+
+    def _score(
+        self,
+        review_text: str,
+        features: ReviewFeatures,
+        ml_score: Optional[float],
+        duplicate_sellers: int = 0
+    ) -> ReviewAnalysis:
+        """Combine heuristic, ML and duplicate signals into a ReviewAnalysis"""
         # Authenticity analysis
         auth_score, fake_inds, auth_inds = self.detector.calculate_authenticity_score(
-            review_text, features
+            review_text, features, duplicate_sellers=duplicate_sellers
         )
         
-        # ML enhancement
-        ml_score = self.detector.ml_predict(review_text)
         if ml_score is not None:
             # Weighted combination: 70% heuristic, 30% ML
             auth_score = (auth_score * 0.7) + (ml_score * 0.3)
@@ -425,9 +733,7 @@ class ReviewAnalyzer:
         # Confidence based on text length and indicator strength
         confidence = min(1.0, (len(review_text) / 100) * 0.5 + abs(auth_score - 0.5) * 0.5)
         
-        processing_time = (datetime.now() - start_time).total_seconds() * 1000
-        
-        result = ReviewAnalysis(
+        return ReviewAnalysis(
             original_text=review_text[:500],  # Truncate for storage
             sentiment_score=sentiment,
             sentiment_label=sentiment_label,
@@ -437,15 +743,27 @@ class ReviewAnalyzer:
             fake_indicators=fake_inds,
             authentic_indicators=auth_inds,
             confidence=confidence,
-            processing_time_ms=processing_time
+            ml_score=ml_score,
+            duplicate_sellers=duplicate_sellers
         )
+
+    def _apply_duplicate_signal(
+        self,
+        review_text: str,
+        analysis: ReviewAnalysis,
+        seller_id: Optional[str]
+    ) -> ReviewAnalysis:
+        """Index the review and re-score it if other sellers posted near-identical text"""
+        if self.duplicate_index is None:
+            return analysis
         
-        # Cache and metrics
-        await self.cache.set(cache_key, result.to_dict(), ttl=86400)  # 24h
-        self.metrics.histogram("review_analysis.latency_ms", processing_time)
-        self.metrics.increment(f"review_analysis.authenticity.{auth_label.value}")
+        match = self.duplicate_index.add(review_digest(review_text)[:16], review_text, seller_id)
+        if not match.other_sellers:
+            return analysis
         
-        return result
+        self.metrics.increment("review_analysis.near_duplicate")
+        flagged = self._score(review_text, analysis.features, analysis.ml_score, len(match.other_sellers))
+        return replace(flagged, processing_time_ms=analysis.processing_time_ms)
 
     def _empty_analysis(self, text: str) -> ReviewAnalysis:
         """Return empty analysis for invalid input"""
@@ -459,48 +777,114 @@ class ReviewAnalyzer:
             confidence=0.0
         )
 
+    def _seller_lock(self, seller_id: str) -> asyncio.Lock:
+        """Per-seller lock for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._seller_locks_guard:
+            locks = self._seller_locks.get(loop)
+            if locks is None:
+                locks = self._seller_locks[loop] = {}
+            return locks.setdefault(seller_id, asyncio.Lock())
+
+    @asynccontextmanager
+    async def _seller_guard(self, seller_id: str):
+        """
+        Hold a seller's aggregate for load/fold/save: the per-loop asyncio lock
+        queues this loop's tasks, the thread lock excludes other loops. The
+        thread lock is waited for in a worker thread so the loop keeps running.
+        """
+        async with self._seller_lock(seller_id):
+            with self._seller_locks_guard:
+                thread_lock = self._seller_thread_locks.setdefault(seller_id, threading.Lock())
+            if not thread_lock.acquire(blocking=False):
+                acquiring = asyncio.ensure_future(asyncio.to_thread(thread_lock.acquire))
+                try:
+                    await asyncio.shield(acquiring)
+                except asyncio.CancelledError:
+                    # The worker thread still takes the lock: give it back once it has
+                    acquiring.add_done_callback(lambda _: thread_lock.release())
+                    raise
+            try:
+                yield
+            finally:
+                thread_lock.release()
+
+    def _seller_state_key(self, seller_id: str) -> str:
+        return f"seller_state:{self._cache_namespace}:{seller_id}"
+
+    async def load_seller_aggregate(self, seller_id: Optional[str]) -> SellerAggregate:
+        """Persisted aggregate for a seller (empty for unknown or anonymous sellers)"""
+        if seller_id:
+            record = await self.cache.get(self._seller_state_key(seller_id))
+            if record:
+                return SellerAggregate.from_record(record)
+        return SellerAggregate(seller_id=seller_id)
+
+    async def save_seller_aggregate(self, aggregate: SellerAggregate):
+        if aggregate.seller_id:
+            await self.cache.set(self._seller_state_key(aggregate.seller_id), aggregate.to_record())
+
     async def analyze_seller_reviews(
         self,
         reviews: List[str],
         seller_id: Optional[str] = None,
-        weights: Optional[List[float]] = None
+        weights: Optional[List[float]] = None,
+        analyses: Optional[List[ReviewAnalysis]] = None
     ) -> SellerTrustReport:
         """
         Comprehensive seller trust analysis with weighted reviews.
-        """
-        if not reviews:
-            return SellerTrustReport(
-                seller_id=seller_id,
-                total_reviews=0,
-                genuine_percentage=0.0,
-                suspicious_percentage=0.0,
-                fake_percentage=0.0,
-                average_sentiment=0.0,
-                sentiment_distribution={},
-                trust_score=0.5,
-                recommendation=SellerRecommendation.INSUFFICIENT_DATA,
-                risk_factors=["insufficient_review_data"]
-            )
-        
-        # Analyze all reviews concurrently
-        analyses = await asyncio.gather(*[
-            self.analyze_review(r) for r in reviews
-        ])
         
-        # Calculate distributions
-        total = len(analyses)
-        sentiment_dist = Counter(a.sentiment_label for a in analyses)
+        With a seller_id the running aggregate is persisted, and only reviews
+        not seen on earlier calls are analyzed and folded in. Pre-computed
+        `analyses` (aligned with `reviews`) are used instead of re-analyzing.
+        """
+        guard = self._seller_guard(seller_id) if seller_id else nullcontext()
+        async with guard:
+            aggregate = await self.load_seller_aggregate(seller_id)
+            
+            if not reviews and aggregate.total == 0:
+                return SellerTrustReport(
+                    seller_id=seller_id,
+                    total_reviews=0,
+                    genuine_percentage=0.0,
+                    suspicious_percentage=0.0,
+                    fake_percentage=0.0,
+                    average_sentiment=0.0,
+                    sentiment_distribution={},
+                    trust_score=0.5,
+                    recommendation=SellerRecommendation.INSUFFICIENT_DATA,
+                    risk_factors=["insufficient_review_data"]
+                )
+            
+            pending = aggregate.pending(reviews)
+            if analyses is not None:
+                new_analyses = [analyses[i] for i in pending]
+            else:
+                # Analyze only the new reviews concurrently
+                new_analyses = await asyncio.gather(*[
+                    self._analyze_review(reviews[i], seller_id=seller_id) for i in pending
+                ])
+            
+            for i, analysis in zip(pending, new_analyses):
+                aggregate.fold(reviews[i], analysis, weights[i] if weights else 1.0)
+            
+            if pending:
+                await self.save_seller_aggregate(aggregate)
         
-        authenticity_counts = Counter(a.authenticity_label for a in analyses)
-        genuine_pct = (authenticity_counts[ReviewAuthenticity.GENUINE] / total) * 100
-        suspicious_pct = (authenticity_counts[ReviewAuthenticity.SUSPICIOUS] / total) * 100
-        fake_pct = (authenticity_counts[ReviewAuthenticity.FAKE] / total) * 100
+        if self.duplicate_index is not None:
+            self.duplicate_index.save_if_due()
         
-        # Weighted average sentiment
-        if weights:
-            avg_sentiment = np.average([a.sentiment_score for a in analyses], weights=weights)
-        else:
-            avg_sentiment = np.mean([a.sentiment_score for a in analyses])
+        report = self.build_seller_report(aggregate)
+        self.metrics.gauge("seller_trust.score", report.trust_score, tags={"seller": seller_id})
+        return report
+
+    def build_seller_report(self, aggregate: SellerAggregate) -> SellerTrustReport:
+        """Derive the trust report from aggregate counts (no review is re-analyzed)"""
+        total = aggregate.total
+        genuine_pct = aggregate.percentage(ReviewAuthenticity.GENUINE)
+        suspicious_pct = aggregate.percentage(ReviewAuthenticity.SUSPICIOUS)
+        fake_pct = aggregate.percentage(ReviewAuthenticity.FAKE)
+        avg_sentiment = aggregate.average_sentiment
         
         # Trust score calculation
         # Factors: authenticity (60%), sentiment (25%), volume (15%)
@@ -522,8 +906,10 @@ class ReviewAnalyzer:
             risk_factors.append("predominantly_negative_sentiment")
         if total < 5:
             risk_factors.append("low_review_volume")
-        if any(a.features.has_url for a in analyses):
+        if aggregate.risk_counts.get('has_url'):
             risk_factors.append("reviews_contain_urls")
+        if total and self._near_duplicate_count(aggregate) / total >= 0.1:
+            risk_factors.append("near_duplicate_review_cluster")
         
         # Recommendation logic
         if total < 3:
@@ -537,29 +923,41 @@ class ReviewAnalyzer:
         else:
             recommendation = SellerRecommendation.RECOMMENDED
         
-        report = SellerTrustReport(
-            seller_id=seller_id,
+        return SellerTrustReport(
+            seller_id=aggregate.seller_id,
             total_reviews=total,
             genuine_percentage=genuine_pct,
             suspicious_percentage=suspicious_pct,
             fake_percentage=fake_pct,
             average_sentiment=avg_sentiment,
-            sentiment_distribution=dict(sentiment_dist),
+            sentiment_distribution=dict(aggregate.sentiment_counts),
             trust_score=trust_score,
             recommendation=recommendation,
             risk_factors=risk_factors
         )
-        
-        self.metrics.gauge("seller_trust.score", trust_score, tags={"seller": seller_id})
-        
-        return report
+
+    def _near_duplicate_count(self, aggregate: SellerAggregate) -> int:
+        """
+        Reviews of the seller that are now part of a cross-seller cluster.
+        The flag folded in at analysis time misses copies posted later by
+        other sellers, so the clusters are looked up again by digest.
+        """
+        folded = aggregate.risk_counts.get('near_duplicate', 0)
+        if self.duplicate_index is None or not aggregate.seller_id:
+            return folded
+        current = 0
+        for key in self.duplicate_index.indexed(aggregate.seen):
+            match = self.duplicate_index.query_id(key, aggregate.seller_id)
+            if match is not None and match.other_sellers:
+                current += aggregate.seen[key]
+        return max(folded, current)
 
     def batch_analyze(self, reviews: List[str]) -> List[Dict]:
         """Synchronous batch analysis for legacy compatibility"""
-        return asyncio.run(self._batch_analyze_async(reviews))
+        return run_sync(self._batch_analyze_async(reviews))
 
     async def _batch_analyze_async(self, reviews: List[str]) -> List[Dict]:
-        results = await asyncio.gather(*[self.analyze_review(r) for r in reviews])
+        results = await asyncio.gather(*[self._analyze_review(r) for r in reviews])
         return [r.to_dict() for r in results]
 
 
@@ -591,26 +989,29 @@ async def analyze_reviews(
         Seller trust report dictionary
     """
     analyzer = get_analyzer()
-    report = await analyzer.analyze_seller_reviews(reviews, seller_id)
-    
-    result = report.to_dict()
     
     if detailed:
+        # Analyze once and reuse the results for the seller report
         individual = await asyncio.gather(*[
-            analyzer.analyze_review(r) for r in reviews
+            analyzer.analyze_review(r, seller_id=seller_id) for r in reviews
         ])
+        report = await analyzer.analyze_seller_reviews(reviews, seller_id, analyses=individual)
+        result = report.to_dict()
         result['individual_reviews'] = [r.to_dict() for r in individual]
+        return result
     
-    return result
+    report = await analyzer.analyze_seller_reviews(reviews, seller_id)
+    return report.to_dict()
 
 
 def quick_sentiment_check(text: str) -> Dict[str, Any]:
     """
     Fast synchronous sentiment check for single reviews.
+    Blocks the caller; from async code await `analyze_review` instead.
     """
     analyzer = get_analyzer(use_ml=False)  # Faster without ML
-    # Run async in sync context
-    result = asyncio.run(analyzer.analyze_review(text))
+    # Runs on the shared background loop; a calling event loop is blocked until it returns
+    result = run_sync(analyzer.analyze_review(text))
     return result.to_dict()
 
 
@@ -623,7 +1024,7 @@ class LegacyReviewAnalyzer(ReviewAnalyzer):
     
     def analyze_review(self, review_text: str) -> Dict:
         """Legacy single review analysis"""
-        result = asyncio.run(super().analyze_review(review_text))
+        result = run_sync(self._analyze_review(review_text))
         return {
             'sentiment': result.sentiment_score,
             'is_fake_suspicious': result.authenticity_label in [ReviewAuthenticity.SUSPICIOUS, ReviewAuthenticity.FAKE],
@@ -632,7 +1033,7 @@ class LegacyReviewAnalyzer(ReviewAnalyzer):
     
     def analyze_seller_reviews(self, reviews: List[str]) -> Dict:
         """Legacy seller analysis"""
-        report = asyncio.run(super().analyze_seller_reviews(reviews))
+        report = run_sync(super().analyze_seller_reviews(reviews))
         return {
             'trust_score': report.trust_score,
             'fake_review_percentage': report.fake_percentage,
@@ -8,15 +8,40 @@ import os
 import re
 from datetime import datetime, timedelta
 from urllib.parse import quote_plus, urljoin
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError
 from dataclasses import dataclass, asdict
 from typing import List, Optional, Dict, Any, Callable
+import functools
 from functools import wraps
 import random
 import asyncio
-from core.logging import get_logger
+import threading
+from core.exceptions import CircuitOpenError, DeadlineExceeded
+from core.hedging import hedged
+from core.logging import LogSampler, get_logger
+from core.price_history import record_prices
+from core.config import Settings
+from core.resilience import (
+    breaker_for_url, check_deadline, deadline_sleep, health_monitor, host_of, http_probe,
+    remaining_time, request_timeout
+)
+from core.tracing import span, submit_in_context, traced
 
 logger = get_logger('universal_scraper')
+# Per-request events are sampled; override with LOG_SAMPLE_RATES=universal_scraper.<key>=<rate>
+sampled = LogSampler(logger, defaults={
+    'cache_hit': 0.05,
+    'cache_expired': 0.05,
+    'cache_saved': 0.05,
+    'parse_error': 0.05,
+    'search': 0.2,
+    'results': 0.2,
+    'rate_limited': 0.2,
+    'amazon_fallback': 0.05,
+    'circuit_open': 0.1,
+    'pending': 0.2,
+    'unhealthy': 0.1,
+})
 
 @dataclass
 class Product:
@@ -45,24 +70,31 @@ class Product:
         return asdict(self)
 
 class RateLimiter:
-    """Token bucket rate limiter for respectful scraping"""
+    """Thread-safe sliding-window rate limiter for respectful scraping"""
     def __init__(self, max_requests: int = 10, window: int = 60):
         self.max_requests = max_requests
         self.window = window
         self.requests = []
-        self._lock = False
+        self._lock = threading.Lock()
     
     def acquire(self):
-        now = time.time()
-        self.requests = [req for req in self.requests if now - req < self.window]
-        
-        if len(self.requests) >= self.max_requests:
-            sleep_time = self.window - (now - self.requests[0])
-            if sleep_time > 0:
-                logger.warning(f"Rate limit hit, sleeping for {sleep_time:.2f}s")
-                time.sleep(sleep_time)
+        # Reserve a slot under the lock, sleep until it opens outside of it
+        with self._lock:
+            now = time.time()
+            self.requests = [req for req in self.requests if now - req < self.window]
+            
+            slot = now
+            if len(self.requests) >= self.max_requests:
+                slot = self.requests[-self.max_requests] + self.window
+            if self.requests:
+                slot = max(slot, self.requests[-1])
+            self.requests.append(slot)
         
-        self.requests.append(now)
+        sleep_time = slot - now
+        if sleep_time > 0:
+            sampled.warning('rate_limited', 'Rate limit hit, sleeping for {:.2f}s', sleep_time)
+            with span('rate_limit.wait', seconds=round(sleep_time, 3)):
+                deadline_sleep(sleep_time, 'rate limit wait')
     
     def __enter__(self):
         self.acquire()
@@ -88,6 +120,7 @@ class CacheManager:
     def _get_filepath(self, key: str) -> str:
         return os.path.join(self.cache_dir, f'{key}.json')
     
+    @traced('scrape_cache.get')
     def get(self, query: str, platform: str, max_age_minutes: Optional[int] = None) -> Optional[List[Dict]]:
         if max_age_minutes is None:
             max_age_minutes = self.default_ttl
@@ -106,10 +139,10 @@ class CacheManager:
             age = datetime.now() - cached_time
             
             if age > timedelta(minutes=max_age_minutes):
-                logger.debug(f'Cache expired for {platform}:{query}')
+                sampled.debug('cache_expired', 'Cache expired for {}:{}', platform, query)
                 return None
             
-            logger.info(f'✅ Cache hit for {platform}:{query} (age: {age.seconds//60}m)')
+            sampled.info('cache_hit', '✅ Cache hit for {}:{} (age: {}m)', platform, query, age.seconds // 60)
             return data['results']
             
         except (json.JSONDecodeError, KeyError, IOError) as e:
@@ -128,7 +161,7 @@ class CacheManager:
                     'platform': platform,
                     'query': query
                 }, f, indent=2, default=str)
-            logger.debug(f'Cache saved: {platform}:{query}')
+            sampled.debug('cache_saved', 'Cache saved: {}:{}', platform, query)
         except IOError as e:
             logger.error(f'Cache write error: {e}')
     
@@ -146,7 +179,7 @@ class CacheManager:
                     cached_time = datetime.fromisoformat(data['timestamp'])
                     if datetime.now() - cached_time > timedelta(hours=24):
                         os.remove(filepath)
-                        logger.debug(f'Cleaned expired cache: {filename}')
+                        logger.debug('Cleaned expired cache: {}', filename)
                 except Exception:
                     continue
         except Exception as e:
@@ -170,6 +203,8 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0, backoff: float =
             while retries < max_retries:
                 try:
                     return func(*args, **kwargs)
+                except DeadlineExceeded:
+                    raise
                 except (requests.RequestException, TimeoutError) as e:
                     retries += 1
                     if retries >= max_retries:
@@ -177,13 +212,28 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0, backoff: float =
                         raise
                     
                     logger.warning(f'Attempt {retries} failed for {func.__name__}, retrying in {current_delay}s...')
-                    time.sleep(current_delay)
+                    deadline_sleep(current_delay, func.__name__)
                     current_delay *= backoff
             
             return None
         return wrapper
     return decorator
 
+# Long-lived pool for platform searches: a search still running when search_all
+# returns at its deadline keeps going and caches its results for the next caller
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+def _search_pool() -> ThreadPoolExecutor:
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=Settings().search_pool_workers, thread_name_prefix='platform-search'
+                )
+    return _search_executor
+
 class UniversalEcommerceScraper:
     """Enterprise-grade multi-platform e-commerce scraper"""
     
@@ -233,6 +283,10 @@ class UniversalEcommerceScraper:
         self.rate_limiter = RateLimiter(max_requests=20, window=60)
         self.respect_robots = respect_robots
         self.delay_range = delay_range
+        # In-flight platform searches, so concurrent callers share one fetch
+        self._inflight: Dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.health_routing = Settings().health_routing
         self._setup_session()
         
     def _setup_session(self):
@@ -251,6 +305,33 @@ class UniversalEcommerceScraper:
             'Cache-Control': 'max-age=0'
         })
     
+    def register_health_probes(self, monitor=health_monitor):
+        """Probe each platform's robots.txt through this scraper's pooled session"""
+        for config in self.PLATFORM_CONFIG.values():
+            base_url = config['base_url']
+            monitor.register_component(host_of(base_url), http_probe(self.session, f'{base_url}/robots.txt'))
+    
+    def _route(self, query: str, platforms: List[str], platform_stats: Dict[str, Any]) -> List[str]:
+        """
+        Order platforms by last known health. Failing ones are searched last
+        ('deprioritize') or not at all ('skip', unless the answer is cached).
+        """
+        if self.health_routing == 'off':
+            return platforms
+        unhealthy = [
+            p for p in platforms
+            if p in self.PLATFORM_CONFIG
+            and health_monitor.is_healthy(host_of(self.PLATFORM_CONFIG[p]['base_url'])) is False
+        ]
+        if not unhealthy:
+            return platforms
+        if self.health_routing == 'skip':
+            for p in unhealthy:
+                if self.cache.get(query, p) is None:
+                    sampled.warning('unhealthy', '🩺 Skipping {}: failing health checks', p)
+                    platform_stats[p] = {'count': 0, 'status': 'skipped', 'reason': 'unhealthy'}
+        return [p for p in platforms if p not in unhealthy] + [p for p in unhealthy if p not in platform_stats]
+    
     def _rotate_user_agent(self):
         """Rotate User-Agent to avoid detection"""
         self.session.headers['User-Agent'] = self.ua.random
@@ -281,26 +362,48 @@ class UniversalEcommerceScraper:
     
     @retry_on_failure(max_retries=3, delay=1.0)
     def _fetch_page(self, url: str, platform: str) -> Optional[BeautifulSoup]:
-        """Fetch and parse page with error handling"""
+        """Fetch and parse page with error handling; fails fast when the host's circuit is open"""
+        breaker = breaker_for_url(url)
+        breaker.check(platform)
+        check_deadline(f'fetching {platform}')
         with self.rate_limiter:
             try:
                 config = self.PLATFORM_CONFIG.get(platform, {})
                 headers = {**self.session.headers, **config.get('headers', {})}
                 
-                response = self.session.get(
-                    url, 
-                    headers=headers, 
-                    timeout=15,
-                    allow_redirects=True
-                )
-                response.raise_for_status()
+                with span('fetch', platform=platform):
+                    response = hedged(
+                        host_of(url),
+                        lambda: self.session.get(
+                            url, 
+                            headers=headers, 
+                            timeout=request_timeout(15, f'fetching {platform}'),
+                            allow_redirects=True
+                        ),
+                        # Backup: fresh connection, different User-Agent
+                        lambda: requests.get(
+                            url,
+                            headers={**headers, 'User-Agent': self.ua.random},
+                            timeout=request_timeout(15, f'fetching {platform}'),
+                            allow_redirects=True
+                        )
+                    )
+                    breaker.record_status(response.status_code)
+                    response.raise_for_status()
                 
                 # Random delay between requests
-                time.sleep(random.uniform(*self.delay_range))
+                with span('politeness_delay', platform=platform):
+                    time.sleep(remaining_time(random.uniform(*self.delay_range)))
                 
-                return BeautifulSoup(response.content, 'lxml')
+                check_deadline(f'parsing {platform}')
+                with span('parse', platform=platform):
+                    return BeautifulSoup(response.content, 'lxml')
                 
             except requests.RequestException as e:
+                # A timeout cut short by our own budget says nothing about the host
+                check_deadline(f'fetching {platform}')
+                if not isinstance(e, requests.HTTPError):
+                    breaker.record_failure(e)
                 logger.error(f'Fetch error for {platform}: {e}')
                 return None
     
@@ -310,7 +413,7 @@ class UniversalEcommerceScraper:
         if cached:
             return [Product(**p) for p in cached]
         
-        logger.info(f'🔍 Searching Jumia for: {query}')
+        sampled.info('search', '🔍 Searching Jumia for: {}', query)
         products = []
         
         try:
@@ -372,13 +475,15 @@ class UniversalEcommerceScraper:
                         products.append(product)
                         
                 except Exception as e:
-                    logger.debug(f'Parse error for item: {e}')
+                    sampled.debug('parse_error', 'Parse error for Jumia item: {}', e)
                     continue
             
             # Cache results
             self.cache.set(query, 'jumia', [p.to_dict() for p in products])
-            logger.info(f'✅ Found {len(products)} products on Jumia')
+            sampled.info('results', '✅ Found {} products on Jumia', len(products))
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f'Jumia search error: {e}')
         
@@ -390,7 +495,7 @@ class UniversalEcommerceScraper:
         if cached:
             return [Product(**p) for p in cached]
         
-        logger.info(f'🔍 Searching Kilimall for: {query}')
+        sampled.info('search', '🔍 Searching Kilimall for: {}', query)
         products = []
         
         try:
@@ -428,12 +533,14 @@ class UniversalEcommerceScraper:
                         ))
                         
                 except Exception as e:
-                    logger.debug(f'Parse error: {e}')
+                    sampled.debug('parse_error', 'Parse error for Kilimall item: {}', e)
                     continue
             
             self.cache.set(query, 'kilimall', [p.to_dict() for p in products])
-            logger.info(f'✅ Found {len(products)} products on Kilimall')
+            sampled.info('results', '✅ Found {} products on Kilimall', len(products))
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f'Kilimall search error: {e}')
         
@@ -445,7 +552,7 @@ class UniversalEcommerceScraper:
         if cached:
             return [Product(**p) for p in cached]
         
-        logger.info(f'🔍 Searching Amazon for: {query}')
+        sampled.info('search', '🔍 Searching Amazon for: {}', query)
         
         try:
             # Import and use the dedicated Amazon scraper
@@ -483,12 +590,14 @@ class UniversalEcommerceScraper:
             if products:
                 self.cache.set(query, 'amazon', [p.to_dict() for p in products], ttl=3600)
             
-            logger.info(f'✓ Found {len(products)} products on Amazon')
+            sampled.info('results', '✓ Found {} products on Amazon', len(products))
             return products
             
         except ImportError:
-            logger.warning('amazon_scraper module not available, falling back to direct scraping')
+            sampled.warning('amazon_fallback', 'amazon_scraper module not available, falling back to direct scraping')
             return self._search_amazon_fallback(query, max_results)
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f'Amazon search failed: {str(e)}')
             return self._search_amazon_fallback(query, max_results)
@@ -509,8 +618,16 @@ class UniversalEcommerceScraper:
                 'Referer': 'https://www.amazon.com/'
             }
             
+            breaker = breaker_for_url(url)
+            breaker.check('amazon')
             with self.rate_limiter:
-                response = self.session.get(url, headers=headers, timeout=20)
+                try:
+                    response = self.session.get(url, headers=headers, timeout=request_timeout(20, 'fetching amazon'))
+                except requests.RequestException as e:
+                    check_deadline('fetching amazon')
+                    breaker.record_failure(e)
+                    raise
+                breaker.record_status(response.status_code)
                 
                 if response.status_code == 503:
                     logger.warning('Amazon blocked request (503), returning empty')
@@ -579,15 +696,52 @@ class UniversalEcommerceScraper:
                         continue
                 
                 self.cache.set(query, 'amazon', [p.to_dict() for p in products])
-                logger.info(f'✅ Found {len(products)} products on Amazon')
+                sampled.info('results', '✅ Found {} products on Amazon', len(products))
                 
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f'Amazon search error: {e}')
         
         return products
     
+    def _search_shared(self, platform: str, search: Callable[[str], List[Product]], query: str) -> List[Product]:
+        """Run a platform search, joining an identical one already in flight"""
+        key = (platform, ' '.join(query.lower().split()))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not leader:
+            logger.debug('Joining in-flight search for {}:{}', platform, query)
+            with span(f'search.{platform}', joined=True):
+                return list(future.result())
+        
+        try:
+            with span(f'search.{platform}'):
+                results = search(query)
+            future.set_result(results)
+            return results
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def _late_arrival(self, query: str, platform: str, future: Future):
+        """Searches that missed search_all's deadline still cache their results; keep their prices too"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        results = future.result()
+        logger.debug('Late results for {}:{} ({} products) cached', platform, query, len(results))
+        record_prices(query, results, marketplace_attr='platform')
+    
     def search_all(self, query: str, platforms: Optional[List[str]] = None, 
-                   preference: str = 'cheapest', max_workers: int = 3) -> Dict[str, Any]:
+                   preference: str = 'cheapest', deadline_ms: Optional[int] = None) -> Dict[str, Any]:
         """
         Parallel search across multiple platforms with intelligent aggregation
         
@@ -595,7 +749,9 @@ class UniversalEcommerceScraper:
             query: Search term
             platforms: List of platforms to search (default: all available)
             preference: Sorting preference ('cheapest', 'expensive', 'rating', 'newest')
-            max_workers: Max concurrent threads
+            deadline_ms: Return after this long with the platforms finished so far. The rest
+                are reported as 'pending' and keep running in the background, so their
+                results are cached for the next search. The run deadline (if any) also applies.
         """
         if platforms is None:
             platforms = list(self.PLATFORM_CONFIG.keys())
@@ -613,29 +769,44 @@ class UniversalEcommerceScraper:
             'amazon': self.search_amazon
         }
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            
-            for platform in platforms:
-                if platform in search_methods:
-                    future = executor.submit(search_methods[platform], query)
-                    futures[future] = platform
-            
-            for future in as_completed(futures):
+        # Workers inherit the run deadline and stop at it; deadline_ms only bounds how long we wait
+        wait_seconds = remaining_time(deadline_ms / 1000 if deadline_ms is not None else None)
+        futures = {}
+        for platform in self._route(query, platforms, platform_stats):
+            if platform in search_methods:
+                future = submit_in_context(_search_pool(), self._search_shared, platform, search_methods[platform], query)
+                futures[future] = platform
+        
+        try:
+            for future in as_completed(futures, timeout=wait_seconds):
                 platform = futures[future]
                 try:
-                    results = future.result(timeout=30)
+                    results = future.result()
                     all_products.extend(results)
                     platform_stats[platform] = {
                         'count': len(results),
                         'status': 'success'
                     }
+                except CircuitOpenError as e:
+                    sampled.warning('circuit_open', '⛔ Skipping {}: {}', platform, e)
+                    platform_stats[platform] = {
+                        'count': 0,
+                        'status': 'skipped',
+                        'reason': 'circuit_open',
+                        'retry_after': round(e.retry_after, 1)
+                    }
                 except TimeoutError:
                     logger.error(f'⏱️ Timeout for {platform}')
                     platform_stats[platform] = {'count': 0, 'status': 'timeout'}
                 except Exception as e:
                     logger.error(f'❌ Error on {platform}: {e}')
                     platform_stats[platform] = {'count': 0, 'status': 'error', 'message': str(e)}
+        except TimeoutError:
+            for future, platform in futures.items():
+                if platform not in platform_stats:
+                    sampled.warning('pending', '⏱️ Deadline reached before {} finished, caching it in the background', platform)
+                    platform_stats[platform] = {'count': 0, 'status': 'pending'}
+                    future.add_done_callback(functools.partial(self._late_arrival, query, platform))
         
         # Sort based on preference
         sort_key = {
@@ -647,6 +818,9 @@ class UniversalEcommerceScraper:
         
         all_products.sort(key=sort_key)
         
+        # Keep every observed price for forecasting (written in the background)
+        record_prices(query, all_products, marketplace_attr='platform')
+        
         # Calculate statistics
         if all_products:
             prices = [p.price for p in all_products]
@@ -667,6 +841,8 @@ class UniversalEcommerceScraper:
             'query': query,
             'platforms_searched': platforms,
             'platform_stats': platform_stats,
+            'skipped_platforms': [p for p, stats in platform_stats.items() if stats['status'] == 'skipped'],
+            'pending_platforms': [p for p, stats in platform_stats.items() if stats['status'] == 'pending'],
             'total_results': len(all_products),
             'execution_time': round(execution_time, 2),
             'price_stats': {
@@ -680,16 +856,31 @@ class UniversalEcommerceScraper:
             'timestamp': datetime.now().isoformat()
         }
 
+_scraper: Optional[UniversalEcommerceScraper] = None
+_scraper_lock = threading.Lock()
+
+def get_scraper() -> UniversalEcommerceScraper:
+    """Process-wide scraper: one HTTP session, rate limiter and cache for all callers"""
+    global _scraper
+    if _scraper is None:
+        with _scraper_lock:
+            if _scraper is None:
+                _scraper = UniversalEcommerceScraper()
+                _scraper.register_health_probes()
+    return _scraper
+
 def search_products(query: str, preference: str = 'cheapest', 
-                   platforms: Optional[List[str]] = None) -> Dict[str, Any]:
+                   platforms: Optional[List[str]] = None,
+                   scraper: Optional[UniversalEcommerceScraper] = None,
+                   deadline_ms: Optional[int] = None) -> Dict[str, Any]:
     """
     Convenience function for searching products
     
     Example:
         results = search_products("iphone 13", preference="cheapest", platforms=["jumia", "kilimall"])
     """
-    scraper = UniversalEcommerceScraper()
-    return scraper.search_all(query, platforms, preference)
+    scraper = scraper or get_scraper()
+    return scraper.search_all(query, platforms, preference, deadline_ms=deadline_ms)
 
 # Advanced usage example
 if __name__ == "__main__":
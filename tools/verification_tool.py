@@ -1,13 +1,37 @@
 ﻿import os
+import time
+import threading
 from typing import Dict, Optional
 from core.logging import get_logger
+from core.tracing import traced
 
 logger = get_logger("verification_tool")
 
 class SellerVerificationClient:
+    RESULT_TTL = 3600
+    MAX_CACHED_RESULTS = 10000
+
     def __init__(self):
         self.ecitizen_api_key = os.getenv("ECITIZEN_API_KEY")
         self.fallback_mode = not bool(self.ecitizen_api_key)
+        # Verdicts shared across procurement items that list the same seller
+        self._results: Dict[tuple, tuple] = {}
+        self._results_lock = threading.Lock()
+
+    def cached_result(self, seller_name: str, platform: str) -> Optional[Dict]:
+        key = (seller_name.strip().lower(), platform.lower())
+        with self._results_lock:
+            entry = self._results.get(key)
+        if entry and entry[0] > time.time():
+            return entry[1]
+        return None
+
+    def store_result(self, seller_name: str, platform: str, result: Dict):
+        key = (seller_name.strip().lower(), platform.lower())
+        with self._results_lock:
+            if len(self._results) >= self.MAX_CACHED_RESULTS:
+                self._results.clear()
+            self._results[key] = (time.time() + self.RESULT_TTL, result)
 
     def verify_business(self, business_name: str, registration_number: Optional[str] = None) -> Dict:
         if not self.fallback_mode and registration_number:
@@ -40,16 +64,35 @@ class SellerVerificationClient:
         is_bad = any(b in seller_name.lower() for b in known_bad)
         return {'is_blacklisted': is_bad, 'action': 'reject' if is_bad else 'proceed'}
 
-def verify_seller(seller_name: str, platform: str = "unknown") -> Dict:
-    v = SellerVerificationClient()
+_client: Optional[SellerVerificationClient] = None
+_client_lock = threading.Lock()
+
+def get_verification_client() -> SellerVerificationClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SellerVerificationClient()
+    return _client
+
+@traced('verify_seller')
+def verify_seller(seller_name: str, platform: str = "unknown",
+                  client: Optional[SellerVerificationClient] = None) -> Dict:
+    v = client or get_verification_client()
+    cached = v.cached_result(seller_name, platform)
+    if cached is not None:
+        return dict(cached)
+
     business = v.verify_business(seller_name)
     blacklist = v.check_seller_blacklist(seller_name)
     
     is_safe = not blacklist['is_blacklisted'] and business.get('risk_level') != 'high'
     
-    return {
+    result = {
         'seller_name': seller_name,
         'is_verified': business.get('verified', False),
         'is_safe': is_safe,
         'recommendation': 'approve' if is_safe else 'reject' if blacklist['is_blacklisted'] else 'review'
     }
+    v.store_result(seller_name, platform, result)
+    return dict(result)
@@ -22,20 +22,40 @@ HEADERS = {
 
 from urllib.parse import urljoin, quote_plus
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 import re
 import time
 import random
+import threading
 import hashlib
 import json
 import os
 from functools import wraps, lru_cache
 import streamlit as st
+from core.exceptions import CircuitOpenError, DeadlineExceeded
+from core.hedging import hedged
+from core.logging import LogSampler, get_logger
+from core.price_history import record_prices
+from core.config import Settings
+from core.resilience import (
+    breaker_for_url, check_deadline, deadline_sleep, health_monitor, host_of, http_probe, remaining_time,
+    request_timeout
+)
+from core.tracing import span, submit_in_context, traced
 
-# Configure logging
-import logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = get_logger('world_scraper')
+# Per-market events are sampled; override with LOG_SAMPLE_RATES=world_scraper.<key>=<rate>
+sampled = LogSampler(logger, defaults={
+    'cache_hit': 0.05,
+    'parse_error': 0.05,
+    'search': 0.2,
+    'results': 0.2,
+    'mock': 0.2,
+    'stats': 0.05,
+    'circuit_open': 0.1,
+    'pending': 0.2,
+    'unhealthy': 0.1,
+})
 
 @dataclass
 class Product:
@@ -92,6 +112,7 @@ class CacheManager:
             f"{marketplace}:{query.lower().strip()}".encode()
         ).hexdigest()[:16]
     
+    @traced('scrape_cache.get')
     def get(self, query: str, marketplace: str) -> Optional[List[Dict]]:
         key = self._get_key(query, marketplace)
         filepath = os.path.join(self.cache_dir, f"{key}.json")
@@ -108,7 +129,7 @@ class CacheManager:
                 os.remove(filepath)
                 return None
             
-            logger.info(f"💾 Cache hit: {marketplace}")
+            sampled.info('cache_hit', "💾 Cache hit: {}", marketplace)
             return data['products']
             
         except Exception as e:
@@ -163,7 +184,7 @@ def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0):
                     
                     delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                     logger.warning(f"Attempt {attempt + 1} failed, retrying in {delay:.1f}s...")
-                    time.sleep(delay)
+                    deadline_sleep(delay, func.__name__)
             return None
         return wrapper
     return decorator
@@ -247,19 +268,43 @@ class BaseScraper(ABC):
 
     @retry_with_backoff(max_retries=3, base_delay=1.0)
     def fetch(self, url: str) -> Optional[BeautifulSoup]:
-        """Fetch page with retry logic"""
+        """Fetch page with retry logic; raises CircuitOpenError while the host's circuit is open"""
+        breaker = breaker_for_url(url)
+        breaker.check(self.marketplace)
         try:
-            time.sleep(random.uniform(0.5, 1.5))  # Respectful delay
-            response = self.session.get(url, timeout=20, allow_redirects=True)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, 'lxml')
+            with span('politeness_delay', platform=self.marketplace):
+                time.sleep(remaining_time(random.uniform(0.5, 1.5)))  # Respectful delay
+            with span('fetch', platform=self.marketplace):
+                try:
+                    response = hedged(
+                        host_of(url),
+                        lambda: self.session.get(
+                            url, timeout=request_timeout(20, f"fetching {self.marketplace}"), allow_redirects=True
+                        ),
+                        # Backup: fresh connection, different User-Agent
+                        lambda: requests.get(
+                            url, headers={**self.session.headers, "User-Agent": self.ua.random},
+                            timeout=request_timeout(20, f"fetching {self.marketplace}"), allow_redirects=True
+                        )
+                    )
+                except requests.RequestException as e:
+                    check_deadline(f"fetching {self.marketplace}")
+                    breaker.record_failure(e)
+                    raise
+                breaker.record_status(response.status_code)
+                response.raise_for_status()
+            check_deadline(f"parsing {self.marketplace}")
+            with span('parse', platform=self.marketplace):
+                return BeautifulSoup(response.content, 'lxml')
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Fetch error for {self.marketplace}: {e}")
             return None
     
     def search(self, query: str, max_results: int = 10) -> List[Product]:
         """Execute search with error handling"""
-        logger.info(f"🔍 Searching {self.marketplace} for: {query}")
+        sampled.info('search', "🔍 Searching {} for: {}", self.marketplace, query)
         
         url = self.build_url(query)
         soup = self.fetch(url)
@@ -280,10 +325,10 @@ class BaseScraper(ABC):
                         product.query = query
                         products.append(product)
                 except Exception as e:
-                    logger.debug(f"Parse error in {self.marketplace}: {e}")
+                    sampled.debug('parse_error', "Parse error in {}: {}", self.marketplace, e)
                     continue
             
-            logger.info(f"✅ {self.marketplace}: Found {len(products)} products")
+            sampled.info('results', "✅ {}: Found {} products", self.marketplace, len(products))
             return products
             
         except Exception as e:
@@ -573,7 +618,7 @@ class MockScraper(BaseScraper):
     
     def search(self, query: str, max_results: int = 5) -> List[Product]:
         """Generate mock products"""
-        logger.info(f"🎭 Generating mock data for {self.marketplace}")
+        sampled.info('mock', "🎭 Generating mock data for {}", self.marketplace)
         
         products = []
         query_clean = query[:20]
@@ -606,6 +651,21 @@ class MockScraper(BaseScraper):
         }
         return colors.get(self.marketplace, "666666")
 
+# Long-lived pool for market searches: searches still running when search_all
+# returns at its deadline finish in the background and fill the cache
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+def _search_pool() -> ThreadPoolExecutor:
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=Settings().search_pool_workers, thread_name_prefix='market-search'
+                )
+    return _search_executor
+
 class WorldScraper:
     """Unified scraper orchestrator with caching and parallel execution"""
     
@@ -618,18 +678,47 @@ class WorldScraper:
     
     MOCK_MARKETS = ["eBay", "Alibaba", "AliExpress"]
     
-    def __init__(self, use_cache: bool = True, max_workers: int = 4):
+    # Hosts whose health probes (core.resilience.health_monitor) drive routing
+    MARKET_HOSTS = {
+        "Kilimall": "kilimall.co.ke",
+        "Jumia": "jumia.co.ke",
+        "Masoko": "masoko.com",
+        "Amazon": "amazon.com",
+    }
+    
+    # The first scraper of the process registers the market probes
+    _probes_registered = False
+    _probes_lock = threading.Lock()
+    
+    def __init__(self, use_cache: bool = True):
         self.cache = CacheManager() if use_cache else None
-        self.max_workers = max_workers
+        self.health_routing = Settings().health_routing
+        with WorldScraper._probes_lock:
+            if not WorldScraper._probes_registered:
+                self.register_health_probes()
+                WorldScraper._probes_registered = True
         self.stats = {
             'total_requests': 0,
             'successful': 0,
             'failed': 0,
-            'cached': 0
+            'cached': 0,
+            'skipped': 0
         }
     
-    def search_market(self, marketplace: str, query: str) -> List[Product]:
-        """Search single marketplace with caching"""
+    def register_health_probes(self, monitor=health_monitor):
+        """Probe each market host's robots.txt through a session of its scraper"""
+        for market, host in self.MARKET_HOSTS.items():
+            session = self.SCRAPER_MAP[market]().session
+            monitor.register_component(host, http_probe(session, f"https://www.{host}/robots.txt"))
+    
+    def search_market(self, marketplace: str, query: str,
+                      skipped: Optional[Dict[str, float]] = None) -> List[Product]:
+        """Search single marketplace with caching; an open circuit is noted in `skipped` (seconds to retry)"""
+        with span(f'search.{marketplace}'):
+            return self._search_market(marketplace, query, skipped)
+    
+    def _search_market(self, marketplace: str, query: str,
+                       skipped: Optional[Dict[str, float]] = None) -> List[Product]:
         # Check cache
         if self.cache:
             cached = self.cache.get(query, marketplace)
@@ -656,8 +745,23 @@ class WorldScraper:
             if self.cache and products:
                 self.cache.set(query, marketplace, [p.to_dict() for p in products])
             
+            # Mock markets are synthetic; only real observations go into price history
+            if marketplace not in self.MOCK_MARKETS:
+                record_prices(query, products, seller_attr='marketplace')
+            
             return products
             
+        except CircuitOpenError as e:
+            # Known-down host: fail fast, no mock data standing in for real prices
+            self.stats['skipped'] += 1
+            if skipped is not None:
+                skipped[marketplace] = e.retry_after
+            sampled.warning('circuit_open', "⛔ Skipping {}: {}", marketplace, e)
+            return []
+        except DeadlineExceeded:
+            # Out of time: no mock fallback, search_all reports the market as timed out
+            self.stats['failed'] += 1
+            raise
         except Exception as e:
             self.stats['failed'] += 1
             logger.error(f"Search failed for {marketplace}: {e}")
@@ -669,51 +773,98 @@ class WorldScraper:
                 return mock.search(query)
             return []
     
-    def search_all(self, query: str, markets: List[str]) -> List[Product]:
-        """Parallel search across all markets"""
+    def _route(self, query: str, markets: List[str], platform_stats: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Unhealthy markets go last ('deprioritize') or are skipped unless cached ('skip')"""
+        if self.health_routing == 'off':
+            return markets
+        unhealthy = [
+            m for m in markets
+            if m in self.MARKET_HOSTS and health_monitor.is_healthy(self.MARKET_HOSTS[m]) is False
+        ]
+        if self.health_routing == 'skip':
+            for market in unhealthy:
+                if not (self.cache and self.cache.get(query, market)):
+                    sampled.warning('unhealthy', "🩺 Skipping {}: failing health checks", market)
+                    platform_stats[market] = {'count': 0, 'status': 'skipped', 'reason': 'unhealthy'}
+        healthy = [m for m in markets if m not in unhealthy]
+        return healthy + [m for m in unhealthy if m not in platform_stats]
+    
+    def search_all(self, query: str, markets: List[str], deadline_ms: Optional[int] = None) -> List[Product]:
+        """Parallel search across all markets; see `search_with_stats` for per-market outcomes"""
+        return self.search_with_stats(query, markets, deadline_ms)['products']
+    
+    def search_with_stats(self, query: str, markets: List[str],
+                          deadline_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Parallel search across all markets.
+        
+        Returns {'products', 'platform_stats', 'skipped_markets'}: products sorted
+        by price; per market {'count', 'status'} with status success, skipped,
+        error or pending; and markets behind an open circuit -> seconds until retry.
+        With `deadline_ms`, returns after that long with the markets finished so
+        far; the others are 'pending' and keep running in the background,
+        caching their results for the next search.
+        """
         logger.info(f"🚀 Starting global search: '{query}' on {markets}")
         start_time = time.time()
         
         all_products = []
-        
-        # Use ThreadPoolExecutor for parallel scraping
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_market = {
-                executor.submit(self.search_market, market, query): market 
-                for market in markets
-            }
-            
-            for future in as_completed(future_to_market):
+        skipped_markets: Dict[str, float] = {}
+        platform_stats: Dict[str, Dict[str, Any]] = {}
+        
+        # Workers inherit the run deadline and stop at it; deadline_ms only bounds how long we wait
+        wait_seconds = remaining_time(deadline_ms / 1000 if deadline_ms is not None else None)
+        future_to_market = {
+            submit_in_context(_search_pool(), self.search_market, market, query, skipped_markets): market 
+            for market in self._route(query, markets, platform_stats)
+        }
+        try:
+            for future in as_completed(future_to_market, timeout=wait_seconds):
                 market = future_to_market[future]
                 try:
-                    products = future.result(timeout=30)
+                    products = future.result()
                     all_products.extend(products)
+                    status = 'skipped' if market in skipped_markets else 'success'
+                    platform_stats[market] = {'count': len(products), 'status': status}
                     
                     # Streamlit feedback
                     if st._is_running_with_streamlit:
-                        st.success(f"✅ {market}: {len(products)} products")
+                        if market in skipped_markets:
+                            st.warning(f"⛔ {market}: temporarily unavailable, skipped")
+                        else:
+                            st.success(f"✅ {market}: {len(products)} products")
                         
                 except Exception as e:
                     logger.error(f"Error retrieving {market} results: {e}")
+                    platform_stats[market] = {'count': 0, 'status': 'error', 'message': str(e)}
                     if st._is_running_with_streamlit:
                         st.error(f"❌ {market}: Failed")
+        except TimeoutError:
+            pending = [m for m in future_to_market.values() if m not in platform_stats]
+            sampled.warning('pending', "⏱️ Deadline reached before {} finished, caching them in the background", pending)
+            for market in pending:
+                platform_stats[market] = {'count': 0, 'status': 'pending'}
+                if st._is_running_with_streamlit:
+                    st.info(f"⏳ {market}: still searching, results will be cached")
         
         # Sort by price
         all_products.sort(key=lambda x: x.price)
         
         duration = time.time() - start_time
         logger.info(f"✨ Search complete: {len(all_products)} products in {duration:.2f}s")
-        logger.info(f"📊 Stats: {self.stats}")
+        sampled.debug('stats', "📊 Stats: {}", dict(self.stats))
         
-        return all_products
+        return {'products': all_products, 'platform_stats': platform_stats, 'skipped_markets': skipped_markets}
 
-def search_products(query: str, markets: Optional[List[str]] = None) -> List[Dict]:
+def search_products(query: str, markets: Optional[List[str]] = None,
+                    deadline_ms: Optional[int] = None) -> List[Dict]:
     """
     Main entry point for product search
     
     Args:
         query: Search term
         markets: List of marketplaces (default: all)
+        deadline_ms: Return what has been found after this long (see WorldScraper.search_all)
     
     Returns:
         List of product dictionaries
@@ -726,14 +877,14 @@ def search_products(query: str, markets: Optional[List[str]] = None) -> List[Dic
         st.info(f"🔍 Searching worldwide for: **{query}**")
         progress_bar = st.progress(0)
     
-    scraper = WorldScraper(use_cache=True, max_workers=4)
+    scraper = WorldScraper(use_cache=True)
     
     # Update progress
     if st._is_running_with_streamlit:
         for i, _ in enumerate(markets):
             progress_bar.progress((i + 1) / len(markets))
     
-    products = scraper.search_all(query, markets)
+    products = scraper.search_all(query, markets, deadline_ms=deadline_ms)
     
     if st._is_running_with_streamlit:
         progress_bar.empty()
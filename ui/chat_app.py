@@ -13,6 +13,14 @@ import uuid
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from tools.world_scraper import search_products
+from core.config import Settings
+from core.resilience import health_monitor
+
+# Market health probes run in the background so routing never waits on them. The
+# first WorldScraper registers them; start() is a no-op on Streamlit reruns
+settings = Settings()
+if settings.health_check_interval > 0:
+    health_monitor.start(settings.health_check_interval)
 
 # Page configuration
 st.set_page_config(
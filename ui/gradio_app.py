@@ -11,12 +11,17 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.supervisor import run_procurement
+from agents.market_agent import SKIPPED_PREFIX
 from core.safety import SafetyGuardrails
 from core.logging import get_logger
+from core.config import Settings
+from core.monitoring import start_metrics_server
+from core.resilience import health_monitor
+from tools.universal_scraper import get_scraper
 
 logger = get_logger("ui")
 
-def analyze_product(product_query: str, category: str, progress=gr.Progress()):
+def analyze_product(product_query: str, category: str, fresh: bool = False, progress=gr.Progress()):
     """Main analysis function with progress tracking."""
     
     # Validate input
@@ -44,7 +49,7 @@ def analyze_product(product_query: str, category: str, progress=gr.Progress()):
         progress(0.6, desc="📊 Analyzing prices and forecasts...")
         
         # Run procurement workflow
-        result = run_procurement(sanitized_query, category)
+        result = run_procurement(sanitized_query, category, fresh=fresh)
         
         progress(0.9, desc="✅ Finalizing recommendations...")
         
@@ -52,6 +57,9 @@ def analyze_product(product_query: str, category: str, progress=gr.Progress()):
         
         # Format output
         output = format_results(rec, sanitized_query)
+        skipped = [e[len(SKIPPED_PREFIX):] for e in result.get('errors', []) if e.startswith(SKIPPED_PREFIX)]
+        if skipped:
+            output["summary"] += "\n**⛔ Markets skipped:** " + "; ".join(skipped) + "\n"
         
         progress(1.0, desc="✅ Complete!")
         
@@ -181,6 +189,11 @@ with gr.Blocks(title="Kenya Smart Procurement AI") as app:
                 value="electronics"
             )
             
+            fresh_input = gr.Checkbox(
+                label="Fetch fresh data (ignore cached results)",
+                value=False
+            )
+            
             analyze_btn = gr.Button("🔍 Analyze Market", variant="primary", size="lg")
             
             gr.Markdown("""
@@ -216,8 +229,8 @@ with gr.Blocks(title="Kenya Smart Procurement AI") as app:
             export_file = gr.File(label="Download")
     
     # Event handlers
-    def handle_analysis(product, category):
-        result = analyze_product(product, category)
+    def handle_analysis(product, category, fresh):
+        result = analyze_product(product, category, fresh)
         
         if result.get("status") == "error":
             return (
@@ -237,7 +250,7 @@ with gr.Blocks(title="Kenya Smart Procurement AI") as app:
     
     analyze_btn.click(
         fn=handle_analysis,
-        inputs=[product_input, category_input],
+        inputs=[product_input, category_input, fresh_input],
         outputs=[
             summary_output,
             best_option_output,
@@ -270,6 +283,14 @@ with gr.Blocks(title="Kenya Smart Procurement AI") as app:
 
 
 if __name__ == "__main__":
+    settings = Settings()
+    # Marketplace probes run in the background so routing never waits on them
+    get_scraper()
+    if settings.health_check_interval > 0:
+        health_monitor.start(settings.health_check_interval)
+    if settings.metrics_port:
+        start_metrics_server(settings.metrics_port, health=health_monitor.summary)
+        logger.info(f"Metrics and health available on :{settings.metrics_port}/metrics and /health")
     app.launch(
         server_name="127.0.0.1",
         server_port=7861,